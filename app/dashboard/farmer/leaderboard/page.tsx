@@ -33,7 +33,13 @@ export default function LeaderboardPage() {
         const fetchLeaderboard = async () => {
             try {
                 const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-                const res = await fetch(`${apiUrl}/api/leaderboard`);
+                // Logged-in farmer's id, set at login; their own rank comes back as user_rank
+                const userId = document.cookie
+                    .split('; ')
+                    .find((cookie) => cookie.startsWith('user='))
+                    ?.slice('user='.length);
+                const query = userId ? `?user_id=${userId}` : '';
+                const res = await fetch(`${apiUrl}/api/leaderboard${query}`);
                 if (res.ok) {
                     const data = await res.json();
                     setLeaderboard(data.leaderboard);
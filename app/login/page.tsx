@@ -74,6 +74,8 @@ function LoginForm() {
                 console.log("OTP Verified! Setting cookie and redirecting...");
                 // Set mock auth cookie
                 document.cookie = `auth_role=${activeRole}; path=/; max-age=86400`; // 1 day
+                // The phone number identifies the user (e.g. their leaderboard row)
+                document.cookie = `user=${encodeURIComponent(phone)}; path=/; max-age=86400`;
 
                 // Force hard navigation to ensure middleware sees the cookie
                 if (activeRole === 'farmer') {
@@ -0,0 +1,174 @@
+"""
+Inference backends for WasteClassifier.
+
+A backend turns a preprocessed float32 batch of shape (N, 224, 224, 3) into
+class probabilities of shape (N, num_classes). Preprocessing and output
+formatting stay in WasteClassifier, so every backend returns the same schema.
+
+- keras: the full Keras graph (default)
+- tflite: a TensorFlow Lite flatbuffer exported by train_model.py
+  (float, dynamic-range or full-int8 quantized)
+- onnx: an ONNX model produced by convert_onnx.py, run with ONNX Runtime
+
+Backends with ``fork_safe = True`` can be loaded in a parent process and
+used by forked workers after calling ``after_fork()`` in the child.
+TensorFlow's runtime is not fork-safe, so the keras backend must be loaded
+in each worker.
+"""
+
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class KerasBackend:
+    """Runs a loaded Keras model."""
+
+    name = "keras"
+    fork_safe = False
+
+    def __init__(self, model):
+        self.model = model
+
+    def after_fork(self):
+        raise RuntimeError("The keras backend cannot be used across fork()")
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """Runs a TensorFlow Lite model through the TFLite interpreter."""
+
+    name = "tflite"
+    fork_safe = True
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        """
+        Load a .tflite model.
+
+        Args:
+            model_path: Path to the .tflite file
+            num_threads: Interpreter CPU threads (None lets TFLite decide)
+        """
+        # Prefer the standalone runtimes, which avoid importing TensorFlow
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                try:
+                    import tensorflow as tf
+                    Interpreter = tf.lite.Interpreter
+                except ImportError:
+                    raise ImportError(
+                        "The tflite backend requires ai-edge-litert, tflite-runtime "
+                        "or TensorFlow. Install with: pip install ai-edge-litert"
+                    )
+
+        logger.info(f"Loading TFLite model from {model_path}")
+        with open(model_path, 'rb') as f:
+            # Kept in memory so forked workers share the weights pages
+            self._model_content = f.read()
+        self._interpreter_cls = Interpreter
+        self._num_threads = num_threads
+        self._create_interpreter()
+
+    def _create_interpreter(self):
+        self.interpreter = self._interpreter_cls(
+            model_content=self._model_content,
+            num_threads=self._num_threads
+        )
+        self.interpreter.allocate_tensors()
+
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        """
+        Rebuild the interpreter in a forked child.
+
+        The parent's CPU thread pool does not survive fork(), so the child
+        needs its own interpreter. It is built from the in-memory model
+        bytes, which stay shared copy-on-write with the parent.
+        """
+        self._create_interpreter()
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(dtype)
+        quantized = np.round(batch / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, output: np.ndarray) -> np.ndarray:
+        if output.dtype == np.float32:
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input['index'], self._quantize(batch))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+        return self._dequantize(output)
+
+
+class OnnxBackend:
+    """Runs an ONNX model with ONNX Runtime on CPU."""
+
+    name = "onnx"
+    fork_safe = True
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        """
+        Create an inference session.
+
+        Args:
+            model_path: Path to the .onnx file
+            num_threads: Intra-op threads per session (None lets ORT decide)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError(
+                "The onnx backend requires ONNX Runtime. Install with: pip install onnxruntime"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        logger.info(f"Loading ONNX model from {model_path}")
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def after_fork(self):
+        # ONNX Runtime sessions keep working in forked children
+        pass
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # InferenceSession.run is thread-safe
+        return self.session.run(
+            None, {self._input_name: batch.astype(np.float32, copy=False)}
+        )[0]
@@ -0,0 +1,263 @@
+"""
+Batch classification for aggregators submitting many photos at once.
+
+Images (individual uploads or members of a zip archive) are decoded in
+parallel, run through the classifier in fixed-size batches with one forward
+pass per batch, and streamed back as NDJSON, one line per image, as each
+batch completes. A final summary line closes the stream.
+"""
+
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+from .inference_pool import InferencePool, InferencePoolSaturated
+from .metrics import stage
+from .prediction import summarize, with_suggestions
+from .result_cache import ResultCache
+from .upload import MAX_UPLOAD_BYTES, UploadRejected, validate_image_bytes
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get('BATCH_CLASSIFY_SIZE', '16'))
+MAX_BATCH_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '500'))
+MAX_BATCH_BYTES = int(os.environ.get('BATCH_MAX_BYTES', str(256 * 1024 * 1024)))
+DECODE_WORKERS = int(os.environ.get('BATCH_DECODE_WORKERS', str(os.cpu_count() or 4)))
+
+# Zip members expanding more than this are treated as zip bombs
+MAX_COMPRESSION_RATIO = 100
+# Attempts to get an inference slot before failing a batch
+SATURATED_RETRIES = 10
+
+_decode_executor = ThreadPoolExecutor(
+    max_workers=DECODE_WORKERS,
+    thread_name_prefix="batch-decode"
+)
+
+
+class TooManyImages(Exception):
+    """Raised when an archive holds more images than the batch has room for."""
+
+
+class BatchItem(NamedTuple):
+    """One image of a batch request, or the reason it was rejected."""
+    filename: str
+    image_bytes: Optional[bytes] = None
+    error: Optional[str] = None
+
+
+def is_zip_upload(filename: Optional[str], content_type: Optional[str]) -> bool:
+    """Whether an upload should be treated as an archive of images."""
+    if content_type in ('application/zip', 'application/x-zip-compressed'):
+        return True
+    return bool(filename) and filename.lower().endswith('.zip')
+
+
+def extract_archive_images(archive_bytes: bytes, max_items: int) -> List[BatchItem]:
+    """
+    Pull image files out of a zip archive.
+
+    Members are checked against the per-image size limit and compression
+    ratio before they are decompressed, and their headers are validated
+    after. Directories and macOS resource forks are skipped.
+
+    Args:
+        archive_bytes: Raw zip file
+        max_items: Maximum number of members the batch has room for
+
+    Returns:
+        List of BatchItem, with per-member errors filled in
+
+    Raises:
+        UploadRejected: If the archive cannot be read
+        TooManyImages: If it has more than max_items members; checked
+                       from the directory, before anything is decompressed
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(archive_bytes))
+    except zipfile.BadZipFile:
+        raise UploadRejected(400, "Invalid zip archive.")
+
+    items = []
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not (info.is_dir() or info.filename.startswith('__MACOSX/')
+                    or os.path.basename(info.filename).startswith('.'))
+        ]
+        if len(members) > max_items:
+            raise TooManyImages(f"Archive has {len(members)} images; the batch has room for {max_items}.")
+
+        for info in members:
+            name = info.filename
+            if info.file_size > MAX_UPLOAD_BYTES:
+                items.append(BatchItem(name, error="File too large."))
+                continue
+            if info.compress_size and info.file_size / info.compress_size > MAX_COMPRESSION_RATIO:
+                items.append(BatchItem(name, error="Suspicious compression ratio."))
+                continue
+
+            try:
+                data = archive.read(info)
+                validate_image_bytes(data)
+            except UploadRejected as e:
+                items.append(BatchItem(name, error=e.detail))
+                continue
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                items.append(BatchItem(name, error=f"Could not extract: {e}"))
+                continue
+
+            items.append(BatchItem(name, data))
+
+    return items
+
+
+def _safe_preprocess(preprocess: Callable, image_bytes: bytes):
+    """Preprocess one image, returning the exception instead of raising."""
+    try:
+        return preprocess(image_bytes)
+    except Exception as e:
+        return e
+
+
+def classify_chunk(classifier, items: List[BatchItem], k: int = 3) -> List[dict]:
+    """
+    Classify one fixed-size chunk of images with a single forward pass.
+
+    Cached results are reused; the remaining images are decoded in
+    parallel on the decode pool and scored together.
+
+    Args:
+        classifier: WasteClassifier or SimpleWasteClassifier
+        items: Images to classify
+        k: Number of top predictions per image
+
+    Returns:
+        One result dict per item, in order
+    """
+    cache = getattr(classifier, 'result_cache', None)
+    probabilities: List[Optional[np.ndarray]] = [None] * len(items)
+    errors: List[Optional[str]] = [item.error for item in items]
+    cache_keys: List[Optional[str]] = [None] * len(items)
+
+    pending = []
+    for i, item in enumerate(items):
+        if errors[i] is not None:
+            continue
+        if cache is not None:
+            cache_keys[i] = ResultCache.make_key(item.image_bytes, classifier.model_version)
+            cached = cache.get(cache_keys[i])
+            if cached is not None:
+                probabilities[i] = cached
+                continue
+        pending.append(i)
+
+    # Decode in parallel (PIL releases the GIL while decoding); each job
+    # carries a copy of the request context so its stage timings count
+    decoded = [
+        future.result() for future in [
+            _decode_executor.submit(
+                contextvars.copy_context().run,
+                _safe_preprocess, classifier.preprocess_image, items[i].image_bytes
+            )
+            for i in pending
+        ]
+    ]
+
+    to_score = []
+    arrays = []
+    for i, result in zip(pending, decoded):
+        if isinstance(result, Exception):
+            errors[i] = f"Could not decode image: {result}"
+        else:
+            to_score.append(i)
+            arrays.append(result)
+
+    if arrays:
+        with stage("inference"):
+            if getattr(classifier, 'embedding_cache', None) is not None:
+                # Lets the classifier store each upload's backbone embedding
+                scores = classifier.predict_preprocessed(
+                    arrays, image_bytes=[items[i].image_bytes for i in to_score]
+                )
+            else:
+                scores = classifier.predict_preprocessed(arrays)
+        for i, row in zip(to_score, scores):
+            probabilities[i] = row
+            if cache_keys[i] is not None:
+                cache.put(cache_keys[i], row)
+
+    results = []
+    for i, item in enumerate(items):
+        if errors[i] is not None:
+            results.append({"filename": item.filename, "error": errors[i]})
+        else:
+            summary = summarize(classifier.CLASS_LABELS, probabilities[i], k)
+            results.append({"filename": item.filename, **with_suggestions(summary)})
+    return results
+
+
+async def stream_batch_results(
+    items: List[BatchItem],
+    get_classifier: Callable,
+    pool: InferencePool,
+    k: int = 3,
+    batch_size: int = BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Classify items batch by batch and yield NDJSON lines as they complete.
+
+    Each line carries the item's index and filename plus either the
+    /api/classify-waste payload or an error. The last line is a summary.
+    """
+    succeeded = 0
+    failed = 0
+
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+
+        results = None
+        for attempt in range(SATURATED_RETRIES):
+            try:
+                results = await pool.run(lambda: classify_chunk(get_classifier(), chunk, k))
+                break
+            except InferencePoolSaturated as e:
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                logger.error(f"Error classifying batch at {start}: {str(e)}")
+                results = [
+                    {"filename": item.filename, "error": f"Error processing image: {str(e)}"}
+                    for item in chunk
+                ]
+                break
+
+        if results is None:
+            results = [
+                {"filename": item.filename, "error": "Classifier is busy. Please retry."}
+                for item in chunk
+            ]
+
+        lines = []
+        with stage("serialize"):
+            for offset, result in enumerate(results):
+                if "error" in result:
+                    failed += 1
+                else:
+                    succeeded += 1
+                lines.append(json.dumps({"index": start + offset, **result}))
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+    yield (json.dumps({
+        "done": True,
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": failed
+    }) + "\n").encode('utf-8')
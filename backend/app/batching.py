@@ -0,0 +1,193 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent callers submit single inputs; a background worker collects them
+into one batch (up to ``max_batch_size`` items, waiting at most
+``max_wait_ms`` after the first item arrived) and runs a single batched
+forward pass. Each caller gets its own result back through a Future.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """A single queued inference request."""
+
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batched calls of ``batch_fn``."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher"
+    ):
+        """
+        Start the batching worker.
+
+        Args:
+            batch_fn: Callable taking a list of inputs and returning a
+                      sequence of results in the same order
+            max_batch_size: Maximum number of requests per batch
+            max_wait_ms: Maximum time to hold the first request of a batch
+                         while waiting for more requests to arrive
+            name: Name of the worker thread (used in logs)
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        # Metrics
+        self._num_batches = 0
+        self._num_requests = 0
+        self._batch_size_counts: Dict[int, int] = {}
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an input for the next batch.
+
+        Returns:
+            Future resolving to the result for this input
+        """
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        request = _Request(item)
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, item: Any) -> Any:
+        """Submit an input and block until its result is ready."""
+        return self.submit(item).result()
+
+    def close(self):
+        """Stop accepting requests and let the worker drain the queue."""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect_batch(self, first: _Request) -> List[_Request]:
+        """Gather up to max_batch_size requests, bounded by max_wait."""
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    request = self._queue.get(timeout=timeout)
+                else:
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Shutdown sentinel: finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run(self):
+        """Worker loop: collect a batch, run it, resolve the futures."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            started_at = time.perf_counter()
+            self._record_batch(batch, started_at)
+
+            try:
+                results = self.batch_fn([request.item for request in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(results)} results "
+                        f"for {len(batch)} inputs"
+                    )
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+            logger.debug(
+                f"{self.name}: ran batch of {len(batch)} in "
+                f"{(time.perf_counter() - started_at) * 1000:.1f}ms"
+            )
+
+    def _record_batch(self, batch: List[_Request], started_at: float):
+        """Update batch-size and queue-wait metrics."""
+        with self._stats_lock:
+            self._num_batches += 1
+            self._num_requests += len(batch)
+            size = len(batch)
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            for request in batch:
+                wait = started_at - request.enqueued_at
+                self._queue_wait_total += wait
+                if wait > self._queue_wait_max:
+                    self._queue_wait_max = wait
+
+    def stats(self) -> Dict:
+        """
+        Get batching metrics.
+
+        Returns:
+            Dictionary containing:
+                - batches: Number of batches run
+                - requests: Number of requests served
+                - mean_batch_size: Average requests per batch
+                - batch_size_counts: Histogram of batch sizes
+                - mean_queue_wait_ms: Average time a request waited for its batch
+                - max_queue_wait_ms: Longest time a request waited for its batch
+                - queue_depth: Requests currently waiting
+        """
+        with self._stats_lock:
+            batches = self._num_batches
+            requests = self._num_requests
+            return {
+                "batches": batches,
+                "requests": requests,
+                "mean_batch_size": requests / batches if batches else 0.0,
+                "batch_size_counts": dict(sorted(self._batch_size_counts.items())),
+                "mean_queue_wait_ms": (
+                    self._queue_wait_total / requests * 1000 if requests else 0.0
+                ),
+                "max_queue_wait_ms": self._queue_wait_max * 1000,
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
@@ -0,0 +1,407 @@
+"""
+End-to-end performance benchmarks for the backend.
+
+Measures, on synthetic images of realistic sizes (12MP and 1080p phone
+JPEGs, a PNG screenshot):
+
+- image decode + resize (image_io.decode_image)
+- SimpleWasteClassifier.predict
+- WasteClassifier forward passes at several batch sizes (--model)
+- predict_price
+- the FastAPI endpoints, called in-process through the ASGI app
+
+Each benchmark reports p50/p95/p99 latency and throughput; the process's
+peak RSS is reported once per run, since it only ever grows and cannot be
+split between benchmarks sharing the process. Results are written as JSON;
+pass --baseline to flag regressions against a stored run, or --compare to
+diff two saved runs.
+
+Usage (from the backend directory):
+    python -m app.benchmark --output bench.json
+    python -m app.benchmark --model models/waste_classifier/model_final.onnx --backend onnx
+    python -m app.benchmark --output bench.json --baseline benchmark_baseline.json
+    python -m app.benchmark --compare benchmark_baseline.json bench.json
+"""
+
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Benchmark the full pipeline, not result-cache hits
+os.environ.setdefault('RESULT_CACHE_MAX_MB', '0')
+# Load the classifier on first use rather than in a background thread
+os.environ.setdefault('WARMUP_ON_STARTUP', '0')
+
+from PIL import Image
+
+# (name, width, height, format)
+IMAGE_SPECS = [
+    ("jpeg_12mp", 4032, 3024, "JPEG"),
+    ("jpeg_1080p", 1920, 1080, "JPEG"),
+    ("png_1024", 1024, 768, "PNG"),
+]
+
+BATCH_SIZES = (1, 4, 8, 16)
+
+# Per-benchmark metrics where a higher value is a regression
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms")
+
+# Latency changes smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+
+def synthetic_image(width: int, height: int, fmt: str = "JPEG", seed: int = 0) -> bytes:
+    """
+    Encode a straw-coloured synthetic photo.
+
+    Smooth colour fields plus sensor-like noise give file sizes close to
+    real phone photos; pure noise would compress far worse, flat colour
+    far better.
+    """
+    rng = np.random.default_rng(seed)
+    # Upsample a coarse random field for low-frequency structure
+    coarse = rng.uniform(60, 200, (height // 64 + 2, width // 64 + 2, 3)).astype(np.float32)
+    coarse[..., 2] *= 0.6
+    field = np.asarray(
+        Image.fromarray(coarse.astype(np.uint8)).resize((width, height), Image.BILINEAR),
+        dtype=np.float32
+    )
+    field += rng.normal(0, 6, (height, width, 1)).astype(np.float32)
+    pixels = np.clip(field, 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    else:
+        Image.fromarray(pixels).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (over its whole lifetime)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(
+    fn: Callable[[], object],
+    iterations: int = 50,
+    warmup: int = 3,
+    items_per_call: int = 1
+) -> Dict:
+    """
+    Time repeated calls of fn.
+
+    Args:
+        fn: Zero-argument callable to benchmark
+        iterations: Timed calls
+        warmup: Untimed calls first (lazy loading, graph tracing)
+        items_per_call: Items (e.g. images in a batch) processed per call
+
+    Returns:
+        Latency percentiles in ms and throughput in items/sec
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = np.empty(iterations, dtype=np.float64)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "iterations": iterations,
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(latencies.mean() * 1000), 4),
+        "throughput_per_sec": round(float(iterations * items_per_call / latencies.sum()), 2),
+    }
+
+
+def bench_decode(images: Dict[str, bytes], iterations: int) -> Dict[str, Dict]:
+    from .image_io import decode_image
+
+    return {
+        f"decode_resize/{name}": measure(lambda data=data: decode_image(data, (224, 224)), iterations)
+        for name, data in images.items()
+    }
+
+
+def bench_simple_classifier(images: Dict[str, bytes], iterations: int) -> Dict[str, Dict]:
+    from .simple_classifier import SimpleWasteClassifier
+
+    classifier = SimpleWasteClassifier(result_cache=None)
+    return {
+        f"simple_classifier.predict/{name}": measure(lambda data=data: classifier.predict(data), iterations)
+        for name, data in images.items()
+    }
+
+
+def bench_waste_classifier(
+    image: bytes,
+    model_path: str,
+    backend: str,
+    iterations: int,
+    batch_sizes: Tuple[int, ...] = BATCH_SIZES
+) -> Dict[str, Dict]:
+    from .waste_classifier import WasteClassifier
+
+    classifier = WasteClassifier(model_path, backend=backend, result_cache=None)
+    results = {
+        f"waste_classifier.predict/{backend}": measure(lambda: classifier.predict(image), iterations)
+    }
+    processed = classifier.preprocess_image(image)
+    for batch_size in batch_sizes:
+        batch = [processed] * batch_size
+        results[f"waste_classifier.forward/{backend}/batch_{batch_size}"] = measure(
+            lambda batch=batch: classifier.predict_preprocessed(batch),
+            iterations,
+            items_per_call=batch_size
+        )
+    return results
+
+
+def bench_predict_price(iterations: int) -> Dict[str, Dict]:
+    from .main import WasteItem, predict_price
+
+    from .pricing import value_lots
+    from .geo import get_location_service
+    from .matching import match_listings
+
+    item = WasteItem(waste_type="rice_straw", quantity=25, location_pincode="141001")
+    rng = np.random.default_rng(0)
+    waste_types = rng.choice(["rice_straw", "wheat_stubble", "sugarcane_trash", "other"], 1000).tolist()
+    quantities = rng.uniform(1, 40, 1000).tolist()
+    results = {
+        "predict_price": measure(lambda: predict_price(item), iterations * 20),
+        "value_lots/1000": measure(lambda: value_lots(waste_types, quantities), iterations, items_per_call=1000),
+    }
+
+    service = get_location_service()
+    if service is not None:
+        # Listings spread over every known pincode, about 5x the buyers' capacity
+        pincodes = rng.choice(list(service.directory.coordinates), 10000).tolist()
+        listing_types = rng.choice(["rice_straw", "wheat_stubble", "sugarcane_trash", "corn_husk"], 10000).tolist()
+        listing_tons = np.round(rng.uniform(1, 30, 10000)).tolist()
+        results["match_listings/10000"] = measure(
+            lambda: match_listings(listing_types, listing_tons, pincodes, service.index, service.directory),
+            max(1, iterations // 5),
+            items_per_call=10000
+        )
+    return results
+
+
+def bench_endpoints(image: bytes, iterations: int) -> Dict[str, Dict]:
+    from fastapi.testclient import TestClient
+
+    from .main import app
+
+    results = {}
+    with TestClient(app) as client:
+        def call(method: str, path: str, **kwargs):
+            def run():
+                response = client.request(method, path, **kwargs)
+                response.raise_for_status()
+            return run
+
+        endpoints = [
+            ("GET /api/health", call("GET", "/api/health")),
+            ("GET /api/leaderboard", call("GET", "/api/leaderboard")),
+            ("POST /api/predict-price", call(
+                "POST", "/api/predict-price",
+                json={"waste_type": "wheat_stubble", "quantity": 12, "location_pincode": "141001"}
+            )),
+            ("POST /api/classify-waste", call(
+                "POST", "/api/classify-waste",
+                files={"file": ("field.jpg", image, "image/jpeg")}
+            )),
+        ]
+        for name, fn in endpoints:
+            results[f"endpoint/{name}"] = measure(fn, iterations)
+    return results
+
+
+def run_benchmarks(
+    iterations: int = 50,
+    model_path: Optional[str] = None,
+    backend: str = "keras",
+    only: Optional[List[str]] = None
+) -> Dict:
+    """
+    Run the benchmark groups and collect their results.
+
+    Args:
+        iterations: Timed calls per benchmark
+        model_path: Trained model for the WasteClassifier benchmarks
+                    (skipped when None)
+        backend: WasteClassifier backend for model_path
+        only: Restrict to these groups: decode, simple, waste, price, endpoints
+    """
+    images = {name: synthetic_image(w, h, fmt) for name, w, h, fmt in IMAGE_SPECS}
+    photo = images["jpeg_1080p"]
+    groups = {
+        "decode": lambda: bench_decode(images, iterations),
+        "simple": lambda: bench_simple_classifier(images, iterations),
+        "waste": lambda: bench_waste_classifier(photo, model_path, backend, iterations),
+        "price": lambda: bench_predict_price(iterations),
+        "endpoints": lambda: bench_endpoints(photo, iterations),
+    }
+    if model_path is None:
+        groups.pop("waste")
+
+    results = {}
+    for group, run in groups.items():
+        if only and group not in only:
+            continue
+        print(f"Running {group} benchmarks...")
+        for name, stats in run().items():
+            results[name] = stats
+            print(f"  {name:<48} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                  f"p99 {stats['p99_ms']:>9.2f}ms  {stats['throughput_per_sec']:>9.1f}/s")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": iterations,
+            "backend": backend if model_path else None,
+            "image_sizes_bytes": {name: len(data) for name, data in images.items()},
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.2) -> List[Dict]:
+    """
+    Diff two runs and flag regressions.
+
+    A benchmark regresses when a latency percentile grows, or throughput
+    drops, by more than threshold (a fraction) against the baseline.
+    Latency changes under NOISE_FLOOR_MS never count. Benchmarks missing
+    from either run are skipped. The run's peak RSS (from meta) is
+    compared as one more row, benchmark "process".
+
+    Returns:
+        One row per (benchmark, metric) with both values, the relative
+        change and whether it is a regression
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric in LOWER_IS_BETTER + ("throughput_per_sec",):
+            old, new = base.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change if metric in LOWER_IS_BETTER else -change
+            if metric.endswith("_ms") and abs(new - old) < NOISE_FLOOR_MS:
+                worse = 0.0
+            rows.append({
+                "benchmark": name,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            })
+
+    old, new = baseline["meta"].get("peak_rss_mb"), current["meta"].get("peak_rss_mb")
+    if old and new is not None:
+        change = (new - old) / old
+        rows.append({
+            "benchmark": "process",
+            "metric": "peak_rss_mb",
+            "baseline": old,
+            "current": new,
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict]) -> int:
+    """Print the diff table and return the number of regressions."""
+    print(f"\n{'Benchmark':<48} {'Metric':<19} {'Baseline':>10} {'Current':>10} {'Change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<48} {row['metric']:<19} {row['baseline']:>10} "
+              f"{row['current']:>10} {row['change']:>+8.1%}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n{regressions} regression(s)")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the StubbleX backend")
+    parser.add_argument('--output', type=str, help='Write results JSON here')
+    parser.add_argument('--iterations', type=int, default=50, help='Timed calls per benchmark')
+    parser.add_argument('--model', type=str, help='Trained model for the WasteClassifier benchmarks')
+    parser.add_argument(
+        '--backend',
+        type=str,
+        default='keras',
+        choices=['keras', 'tflite', 'onnx'],
+        help='WasteClassifier backend for --model'
+    )
+    parser.add_argument(
+        '--only',
+        type=str,
+        nargs='+',
+        choices=['decode', 'simple', 'waste', 'price', 'endpoints'],
+        help='Run only these benchmark groups'
+    )
+    parser.add_argument('--baseline', type=str, help='Stored run to check for regressions')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.2,
+        help='Relative change counted as a regression (0.2 = 20%%)'
+    )
+    parser.add_argument(
+        '--compare',
+        type=str,
+        nargs=2,
+        metavar=('BASELINE', 'CURRENT'),
+        help='Diff two saved runs without benchmarking'
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    if args.compare:
+        runs = []
+        for path in args.compare:
+            with open(path) as f:
+                runs.append(json.load(f))
+        sys.exit(1 if print_comparison(compare(*runs, threshold=args.threshold)) else 0)
+
+    report = run_benchmarks(args.iterations, args.model, args.backend, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.exit(1 if print_comparison(compare(baseline, report, args.threshold)) else 0)
@@ -0,0 +1,169 @@
+"""
+Convert a trained Keras waste classifier to ONNX for the onnx backend.
+
+The converted model is checked against the Keras model on random inputs in
+the MobileNetV2 preprocessing range before the script reports success.
+"""
+
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import tensorflow as tf
+from tensorflow import keras
+
+INPUT_SHAPE = (224, 224, 3)
+
+
+def convert_to_onnx(model_path: str, output_path: str, opset: int = 13) -> str:
+    """
+    Convert a saved Keras model to ONNX.
+
+    Args:
+        model_path: Path to the trained model (e.g. model_final.h5)
+        output_path: Where to write the .onnx file
+        opset: ONNX opset version
+
+    Returns:
+        Path to the written ONNX model
+    """
+    model = keras.models.load_model(model_path)
+    input_signature = [
+        tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name='input')
+    ]
+
+    if hasattr(model, 'export'):
+        # Keras 3: the model must have been called once before export
+        model.predict_on_batch(np.zeros((1,) + INPUT_SHAPE, dtype=np.float32))
+        model.export(
+            output_path,
+            format='onnx',
+            input_signature=input_signature,
+            opset_version=opset
+        )
+    else:
+        try:
+            import tf2onnx
+        except ImportError:
+            raise ImportError(
+                "tf2onnx is required for conversion. Install with: pip install tf2onnx"
+            )
+        tf2onnx.convert.from_keras(
+            model,
+            input_signature=input_signature,
+            opset=opset,
+            output_path=output_path
+        )
+
+    print(f"ONNX model saved to: {output_path}")
+    return output_path
+
+
+def verify_parity(
+    model_path: str,
+    onnx_path: str,
+    num_samples: int = 16,
+    atol: float = 1e-4,
+    seed: int = 0
+) -> dict:
+    """
+    Compare Keras and ONNX Runtime outputs on the same inputs.
+
+    Args:
+        model_path: Path to the Keras model
+        onnx_path: Path to the converted ONNX model
+        num_samples: Number of random inputs to compare
+        atol: Largest allowed absolute difference in any probability
+        seed: Random seed for the inputs
+
+    Returns:
+        Parity report with max_abs_diff, argmax_agreement and latencies
+
+    Raises:
+        AssertionError: If outputs differ by more than atol or the
+                        predicted classes disagree
+    """
+    import onnxruntime as ort
+
+    rng = np.random.default_rng(seed)
+    # MobileNetV2 preprocess_input maps pixels to [-1, 1]
+    inputs = rng.uniform(-1.0, 1.0, (num_samples,) + INPUT_SHAPE).astype(np.float32)
+
+    model = keras.models.load_model(model_path)
+    model.predict_on_batch(inputs[:1])
+    start = time.perf_counter()
+    keras_out = np.asarray(model.predict_on_batch(inputs))
+    keras_ms = (time.perf_counter() - start) * 1000
+
+    session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    session.run(None, {input_name: inputs[:1]})
+    start = time.perf_counter()
+    onnx_out = session.run(None, {input_name: inputs})[0]
+    onnx_ms = (time.perf_counter() - start) * 1000
+
+    report = {
+        "num_samples": num_samples,
+        "max_abs_diff": float(np.max(np.abs(keras_out - onnx_out))),
+        "argmax_agreement": float(np.mean(
+            np.argmax(keras_out, axis=1) == np.argmax(onnx_out, axis=1)
+        )),
+        "keras_batch_ms": round(keras_ms, 2),
+        "onnx_batch_ms": round(onnx_ms, 2)
+    }
+
+    print(f"Max abs difference: {report['max_abs_diff']:.2e}")
+    print(f"Argmax agreement: {report['argmax_agreement']:.2%}")
+    print(f"Batch of {num_samples}: keras {keras_ms:.1f}ms, onnx {onnx_ms:.1f}ms")
+
+    assert report["max_abs_diff"] <= atol, (
+        f"ONNX outputs differ from Keras by {report['max_abs_diff']:.2e} (> {atol})"
+    )
+    assert report["argmax_agreement"] == 1.0, "ONNX and Keras predicted classes differ"
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert the waste classification model to ONNX"
+    )
+    parser.add_argument(
+        '--model',
+        type=str,
+        default='models/waste_classifier/model_final.h5',
+        help='Path to the trained Keras model'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        help='Path for the ONNX model (default: next to --model with .onnx)'
+    )
+    parser.add_argument(
+        '--opset',
+        type=int,
+        default=13,
+        help='ONNX opset version'
+    )
+    parser.add_argument(
+        '--atol',
+        type=float,
+        default=1e-4,
+        help='Allowed absolute difference in the parity check'
+    )
+    parser.add_argument(
+        '--skip-verify',
+        action='store_true',
+        help='Skip the Keras/ONNX parity check'
+    )
+
+    args = parser.parse_args()
+    output = args.output or os.path.splitext(args.model)[0] + '.onnx'
+
+    convert_to_onnx(args.model, output, opset=args.opset)
+    if not args.skip_verify:
+        verify_parity(args.model, output, atol=args.atol)
@@ -0,0 +1,427 @@
+"""
+Backbone embeddings and a persistent embedding cache.
+
+The classifier is a frozen MobileNetV2 backbone followed by a small Dense
+head (see train_model.create_model). The backbone's GlobalAveragePooling
+output (a 1280-d embedding) is what every retrain reuses, so the Keras model
+is split there: the backbone runs as a Keras model and the head is compiled
+to a few NumPy matrix operations.
+
+Embeddings of uploaded images are appended to an on-disk, memory-mapped
+store keyed by the SHA-256 of the upload. A newly trained head can then
+re-score every historical upload without running a single convolution:
+
+    python -m app.embeddings --cache-dir /var/cache/stubblex/embeddings \\
+        --model models/waste_classifier/model_final.h5 --output scores.npz
+
+The store has one directory per backbone fingerprint, so embeddings from a
+different (e.g. fine-tuned) backbone are never mixed.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 1280
+DIGEST_SIZE = 32
+
+_ACTIVATIONS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+_ACTIVATIONS["softmax"] = _softmax
+
+
+def _activation(name: str) -> Callable[[np.ndarray], np.ndarray]:
+    if name not in _ACTIVATIONS:
+        raise ValueError(f"Unsupported head activation: {name}")
+    return _ACTIVATIONS[name]
+
+
+class DenseHead:
+    """
+    Inference-only NumPy version of a Keras classification head.
+
+    Supports the layers train_model.create_model uses after the backbone:
+    Dense, BatchNormalization (folded to a per-feature affine), Dropout
+    (a no-op at inference) and Activation.
+    """
+
+    def __init__(self, ops: List[Tuple[str, tuple]]):
+        self._ops = ops
+
+    @classmethod
+    def from_keras_layers(cls, layers) -> "DenseHead":
+        """
+        Compile Keras head layers into NumPy operations.
+
+        Raises:
+            ValueError: If a layer type is not supported
+        """
+        ops = []
+        for layer in layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            if kind == "Dense":
+                weights = layer.get_weights()
+                kernel = weights[0].astype(np.float32)
+                bias = weights[1].astype(np.float32) if config.get("use_bias", True) else None
+                ops.append(("dense", (kernel, bias, _activation(config["activation"]))))
+            elif kind == "BatchNormalization":
+                weights = iter(layer.get_weights())
+                gamma = next(weights) if config.get("scale", True) else 1.0
+                beta = next(weights) if config.get("center", True) else 0.0
+                mean, variance = next(weights), next(weights)
+                scale = (gamma / np.sqrt(variance + config["epsilon"])).astype(np.float32)
+                shift = (beta - mean * scale).astype(np.float32)
+                ops.append(("affine", (scale, shift)))
+            elif kind == "Activation":
+                ops.append(("activation", (_activation(config["activation"]),)))
+            elif kind == "Dropout":
+                continue
+            else:
+                raise ValueError(f"Unsupported head layer: {kind}")
+        return cls(ops)
+
+    def __call__(self, embeddings: np.ndarray) -> np.ndarray:
+        """Map embeddings (N, 1280) to class probabilities (N, num_classes)."""
+        x = np.asarray(embeddings, dtype=np.float32)
+        for kind, params in self._ops:
+            if kind == "dense":
+                kernel, bias, activation = params
+                x = x @ kernel
+                if bias is not None:
+                    x += bias
+                x = activation(x)
+            elif kind == "affine":
+                scale, shift = params
+                x = x * scale + shift
+            else:
+                x = params[0](x)
+        return x
+
+
+def split_keras_model(model):
+    """
+    Split a classifier at its GlobalAveragePooling2D layer.
+
+    Args:
+        model: Sequential model as built by train_model.create_model
+
+    Returns:
+        (backbone, head): a Keras model producing the pooled embedding, and
+        a callable mapping embeddings to probabilities (a DenseHead, or the
+        Keras head layers if they cannot be compiled to NumPy)
+
+    Raises:
+        ValueError: If the model has no top-level GlobalAveragePooling2D
+    """
+    from tensorflow import keras
+
+    layers = model.layers
+    pool_index = next(
+        (i for i, layer in enumerate(layers) if type(layer).__name__ == "GlobalAveragePooling2D"),
+        None
+    )
+    if pool_index is None:
+        raise ValueError("Model has no GlobalAveragePooling2D layer to split at")
+
+    # Shares weights with the original model
+    backbone = keras.Sequential(layers[:pool_index + 1])
+    head_layers = layers[pool_index + 1:]
+    try:
+        head = DenseHead.from_keras_layers(head_layers)
+    except ValueError as e:
+        logger.info(f"Running the head in Keras: {str(e)}")
+        embedding_dim = backbone.output_shape[-1]
+        keras_head = keras.Sequential([keras.Input((embedding_dim,))] + list(head_layers))
+        head = lambda embeddings: np.asarray(keras_head.predict_on_batch(embeddings))
+    return backbone, head
+
+
+def backbone_fingerprint(backbone) -> str:
+    """Hash the backbone weights, so embeddings from another backbone are kept apart."""
+    digest = hashlib.sha256()
+    for weights in backbone.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class EmbeddingCache:
+    """
+    Append-only, memory-mapped store of float16 embeddings keyed by content hash.
+
+    Rows live in ``embeddings.f16`` and their SHA-256 digests at the same
+    row index in ``keys.bin``. A row's embedding is written before its key,
+    so a crash never leaves a key pointing at a partial row. Appends take a
+    POSIX lock on the key file, so several worker processes can share one
+    directory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int = EMBEDDING_DIM,
+        max_entries: int = 1_000_000
+    ):
+        """
+        Open (or create) a store.
+
+        Args:
+            directory: Directory holding the store files
+            dim: Embedding dimension
+            max_entries: Stop storing new embeddings beyond this many rows
+        """
+        self.directory = directory
+        self.dim = dim
+        self.max_entries = max_entries
+        self._row_bytes = dim * np.dtype(np.float16).itemsize
+
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != dim:
+                raise ValueError(f"Embedding store {directory} has dim {meta['dim']}, expected {dim}")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "dtype": "float16"}, f)
+
+        self._emb_path = os.path.join(directory, "embeddings.f16")
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._emb_fd = os.open(self._emb_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._keys_fd = os.open(self._keys_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._count = 0
+        self._mmap: Optional[np.memmap] = None
+
+        self.hits = 0
+        self.misses = 0
+
+        with self._lock:
+            fcntl.lockf(self._keys_fd, fcntl.LOCK_EX)
+            try:
+                self._sync()
+                # Drop rows of an append interrupted before its key was written
+                if os.fstat(self._emb_fd).st_size > self._count * self._row_bytes:
+                    os.ftruncate(self._emb_fd, self._count * self._row_bytes)
+            finally:
+                fcntl.lockf(self._keys_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def make_key(image_bytes: bytes) -> bytes:
+        """Content hash used as the cache key."""
+        return hashlib.sha256(image_bytes).digest()
+
+    def _sync(self):
+        """Pick up rows appended since the last sync (possibly by other processes)."""
+        count = os.fstat(self._keys_fd).st_size // DIGEST_SIZE
+        if count <= self._count:
+            return
+        data = os.pread(
+            self._keys_fd,
+            (count - self._count) * DIGEST_SIZE,
+            self._count * DIGEST_SIZE
+        )
+        for offset in range(0, len(data), DIGEST_SIZE):
+            self._index.setdefault(data[offset:offset + DIGEST_SIZE], self._count)
+            self._count += 1
+
+    def _rows(self) -> np.ndarray:
+        """Memory-mapped view of all stored rows, remapped as the file grows."""
+        if self._count == 0:
+            return np.empty((0, self.dim), dtype=np.float16)
+        if self._mmap is None or self._mmap.shape[0] < self._count:
+            self._mmap = np.memmap(
+                self._emb_path, dtype=np.float16, mode="r",
+                shape=(self._count, self.dim)
+            )
+        return self._mmap[:self._count]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._count
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """
+        Look up an embedding.
+
+        Returns:
+            float32 embedding of shape (dim,), or None if not stored
+        """
+        with self._lock:
+            row = self._index.get(key)
+            if row is None:
+                self._sync()
+                row = self._index.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._rows()[row].astype(np.float32)
+
+    def put(self, key: bytes, embedding: np.ndarray) -> bool:
+        """
+        Append an embedding unless it is already stored.
+
+        Returns:
+            False if the store is full, True otherwise
+        """
+        row_bytes = np.asarray(embedding, dtype=np.float16).reshape(self.dim).tobytes()
+        with self._lock:
+            if key in self._index:
+                return True
+            fcntl.lockf(self._keys_fd, fcntl.LOCK_EX)
+            try:
+                self._sync()
+                if key in self._index:
+                    return True
+                if self._count >= self.max_entries:
+                    return False
+                row = self._count
+                os.pwrite(self._emb_fd, row_bytes, row * self._row_bytes)
+                os.pwrite(self._keys_fd, key, row * DIGEST_SIZE)
+                self._index[key] = row
+                self._count += 1
+            finally:
+                fcntl.lockf(self._keys_fd, fcntl.LOCK_UN)
+        return True
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """
+        All stored rows, without copying the embeddings.
+
+        Returns:
+            (keys, embeddings): hex digests and a read-only float16 memmap
+            of shape (len(keys), dim)
+        """
+        with self._lock:
+            self._sync()
+            count = self._count
+            keys_data = os.pread(self._keys_fd, count * DIGEST_SIZE, 0)
+            rows = self._rows()
+        keys = [
+            keys_data[offset:offset + DIGEST_SIZE].hex()
+            for offset in range(0, len(keys_data), DIGEST_SIZE)
+        ]
+        return keys, rows
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "disk_bytes": self._count * (self._row_bytes + DIGEST_SIZE),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        self._mmap = None
+        os.close(self._emb_fd)
+        os.close(self._keys_fd)
+
+
+def rescore_corpus(
+    cache: EmbeddingCache,
+    head: Callable[[np.ndarray], np.ndarray],
+    chunk_size: int = 8192
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Score every stored embedding with a classification head.
+
+    Args:
+        cache: Embedding store to read
+        head: Callable mapping (N, dim) embeddings to (N, num_classes)
+        chunk_size: Rows converted to float32 at a time
+
+    Returns:
+        (keys, probabilities) in store order
+    """
+    keys, rows = cache.snapshot()
+    outputs = [
+        head(rows[start:start + chunk_size].astype(np.float32))
+        for start in range(0, len(keys), chunk_size)
+    ]
+    if not outputs:
+        return keys, np.empty((0, 0), dtype=np.float32)
+    return keys, np.concatenate(outputs).astype(np.float32)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .waste_classifier import WasteClassifier
+
+    parser = argparse.ArgumentParser(
+        description="Re-score all cached upload embeddings with a newly trained model"
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=os.environ.get('EMBEDDING_CACHE_DIR'),
+        help='Embedding cache root (EMBEDDING_CACHE_DIR)'
+    )
+    parser.add_argument(
+        '--model',
+        type=str,
+        required=True,
+        help='Newly trained Keras model whose head is used for scoring'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default='rescored.npz',
+        help='Where to write keys, probabilities and predicted classes'
+    )
+    args = parser.parse_args()
+    if not args.cache_dir:
+        parser.error("--cache-dir (or EMBEDDING_CACHE_DIR) is required")
+
+    from tensorflow import keras
+
+    backbone, head = split_keras_model(keras.models.load_model(args.model))
+    store_dir = os.path.join(args.cache_dir, backbone_fingerprint(backbone))
+    if not os.path.exists(os.path.join(store_dir, "keys.bin")):
+        raise SystemExit(
+            f"No embeddings for this model's backbone in {args.cache_dir}. "
+            "Its backbone differs from the one that served the uploads "
+            "(e.g. after fine-tuning), so the embeddings must be recomputed."
+        )
+
+    cache = EmbeddingCache(store_dir)
+    start = time.perf_counter()
+    keys, probabilities = rescore_corpus(cache, head)
+    elapsed = time.perf_counter() - start
+
+    labels = np.array(WasteClassifier.CLASS_LABELS)
+    predicted = labels[probabilities.argmax(axis=1)] if len(keys) else np.array([], dtype=labels.dtype)
+    np.savez(args.output, keys=np.array(keys), probabilities=probabilities, predicted_class=predicted)
+
+    print(f"Re-scored {len(keys)} uploads in {elapsed:.2f}s -> {args.output}")
+    for label in labels:
+        print(f"  {label}: {int(np.sum(predicted == label))}")
@@ -0,0 +1,290 @@
+"""
+Pincode geolocation and nearest-industry lookup.
+
+Pincodes are placed with a local coordinate table; pincodes missing from
+it fall back to the centroid of their 3-digit sorting district, then of
+their 2-digit postal region. Industries (mills, power plants, feed
+producers) are indexed in KD-trees of 3D unit vectors. The straight-line
+chord between two unit vectors grows with the great-circle distance, so
+a plain Euclidean KD-tree returns true geographic nearest neighbours. One
+tree covers every industry, and one per waste type covers only those that
+buy it.
+
+Nearest-industry results are memoized per (pincode, waste type, k): a
+lot's location only ever needs one tree query.
+
+Data files (CSV, in GEO_DATA_DIR, default backend/data):
+
+    pincodes.csv     pincode,latitude,longitude,district,state
+    industries.csv   id,name,industry,pincode,latitude,longitude,accepts,capacity_tons_per_month
+                     (accepts: waste types separated by ';')
+
+The files shipped with the repo are demo data for the stubble-burning
+belt; replace them with the India Post directory and real buyer lists.
+"""
+
+import csv
+import logging
+import math
+import os
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Waste type names used by the pricing rules -> names buyers list
+WASTE_TYPE_ALIASES = {"sugarcane_trash": "sugarcane_bagasse"}
+
+
+class Industry(NamedTuple):
+    """A buyer of crop residue."""
+    id: str
+    name: str
+    industry: str
+    pincode: str
+    latitude: float
+    longitude: float
+    accepts: Tuple[str, ...]
+    capacity_tons_per_month: float
+
+
+class NearbyIndustry(NamedTuple):
+    industry: Industry
+    distance_km: float
+
+
+def to_unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """Points on the unit sphere, shape (N, 3), for degrees lat/lon."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord) -> np.ndarray:
+    """Great-circle distance in km for a unit-sphere chord length."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+class PincodeDirectory:
+    """Pincode -> (latitude, longitude), with prefix-centroid fallback."""
+
+    def __init__(self, rows: Dict[str, Tuple[float, float]]):
+        self.coordinates = dict(rows)
+        # Centroids of 3- and 2-digit prefixes, for pincodes not listed
+        self.prefix_centroids: Dict[str, Tuple[float, float]] = {}
+        for length in (3, 2):
+            groups: Dict[str, List[Tuple[float, float]]] = {}
+            for pincode, point in self.coordinates.items():
+                groups.setdefault(pincode[:length], []).append(point)
+            for prefix, points in groups.items():
+                # Mean of unit vectors, so centroids are right on a sphere
+                mean = to_unit_vectors(*zip(*points)).mean(axis=0)
+                lat = np.degrees(np.arctan2(mean[2], np.hypot(mean[0], mean[1])))
+                lon = np.degrees(np.arctan2(mean[1], mean[0]))
+                self.prefix_centroids[prefix] = (float(lat), float(lon))
+
+    @classmethod
+    def from_csv(cls, path: str) -> "PincodeDirectory":
+        with open(path, newline='') as f:
+            return cls({
+                row["pincode"].strip(): (float(row["latitude"]), float(row["longitude"]))
+                for row in csv.DictReader(f)
+            })
+
+    def __len__(self) -> int:
+        return len(self.coordinates)
+
+    def locate(self, pincode: str) -> Optional[Tuple[float, float]]:
+        """Coordinates of a pincode, or None if neither it nor its region is known."""
+        pincode = pincode.strip()
+        point = self.coordinates.get(pincode)
+        if point is None and len(pincode) == 6 and pincode.isdigit():
+            point = self.prefix_centroids.get(pincode[:3]) or self.prefix_centroids.get(pincode[:2])
+        return point
+
+
+class IndustryIndex:
+    """KD-trees over industry locations, overall and per accepted waste type."""
+
+    def __init__(self, industries: Sequence[Industry]):
+        from scipy.spatial import cKDTree
+
+        self.industries = list(industries)
+        if not self.industries:
+            raise ValueError("IndustryIndex needs at least one industry")
+        points = to_unit_vectors(
+            [i.latitude for i in self.industries], [i.longitude for i in self.industries]
+        )
+        self._all = (cKDTree(points), np.arange(len(self.industries)))
+
+        members: Dict[str, List[int]] = {}
+        for idx, industry in enumerate(self.industries):
+            for waste_type in industry.accepts:
+                members.setdefault(waste_type, []).append(idx)
+        self._by_waste_type = {
+            waste_type: (cKDTree(points[idx]), np.array(idx))
+            for waste_type, idx in members.items()
+        }
+
+    @classmethod
+    def from_csv(cls, path: str) -> "IndustryIndex":
+        with open(path, newline='') as f:
+            return cls([
+                Industry(
+                    id=row["id"],
+                    name=row["name"],
+                    industry=row["industry"],
+                    pincode=row["pincode"],
+                    latitude=float(row["latitude"]),
+                    longitude=float(row["longitude"]),
+                    accepts=tuple(t.strip() for t in row["accepts"].split(';') if t.strip()),
+                    capacity_tons_per_month=float(row.get("capacity_tons_per_month") or 0)
+                )
+                for row in csv.DictReader(f)
+            ])
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 1,
+        waste_type: Optional[str] = None
+    ) -> List[NearbyIndustry]:
+        """
+        The k closest industries, nearest first.
+
+        Args:
+            latitude, longitude: Query point in degrees
+            k: Number of industries to return
+            waste_type: Only industries buying this waste type; unknown
+                        types (or None) search every industry
+        """
+        waste_type = WASTE_TYPE_ALIASES.get(waste_type, waste_type)
+        tree, members = self._by_waste_type.get(waste_type, self._all)
+        k = min(k, len(members))
+        # Scalar math: far cheaper than NumPy for a single point
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        point = (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+        chords, idx = tree.query(point, k=k)
+        return [
+            NearbyIndustry(
+                self.industries[members[i]],
+                2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+            )
+            for chord, i in zip(np.atleast_1d(chords).tolist(), np.atleast_1d(idx).tolist())
+        ]
+
+    def nearest_many(
+        self,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        waste_type: str,
+        k: int,
+        max_km: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Up to k buyers of waste_type within max_km of each point, in one query.
+
+        Unlike ``nearest``, only industries that accept the waste type are
+        returned; a type nobody buys has no neighbours.
+
+        Returns:
+            (distance_km, industry) arrays of shape (N, k), nearest first.
+            Missing neighbours have distance inf and industry -1; industry
+            indexes ``self.industries``.
+        """
+        n = len(latitudes)
+        entry = self._by_waste_type.get(WASTE_TYPE_ALIASES.get(waste_type, waste_type))
+        if entry is None or n == 0:
+            return np.full((n, k), np.inf), np.full((n, k), -1, dtype=np.intp)
+        tree, members = entry
+        k = min(k, len(members))
+        max_chord = 2 * math.sin(min(max_km / (2 * EARTH_RADIUS_KM), math.pi / 2))
+        # A list of k values keeps the (N, k) shape even for k=1
+        chords, idx = tree.query(
+            to_unit_vectors(latitudes, longitudes), k=list(range(1, k + 1)),
+            distance_upper_bound=max_chord
+        )
+        found = idx < len(members)
+        industry = np.where(found, members[np.minimum(idx, len(members) - 1)], -1)
+        return np.where(found, chord_to_km(np.where(found, chords, 0.0)), np.inf), industry
+
+
+class LocationService:
+    """Memoized nearest-industry lookups by pincode."""
+
+    def __init__(self, directory: PincodeDirectory, index: IndustryIndex, cache_size: int = 65536):
+        self.directory = directory
+        self.index = index
+        self.nearest_to_pincode = lru_cache(maxsize=cache_size)(self._nearest_to_pincode)
+
+    def _nearest_to_pincode(
+        self,
+        pincode: str,
+        waste_type: Optional[str] = None,
+        k: int = 1
+    ) -> Tuple[NearbyIndustry, ...]:
+        """Closest buyers of waste_type to a pincode; empty if it cannot be located."""
+        point = self.directory.locate(pincode)
+        if point is None:
+            return ()
+        return tuple(self.index.nearest(point[0], point[1], k=k, waste_type=waste_type))
+
+    def distances_km(self, pincodes: Sequence[str], waste_types: Sequence[str]) -> np.ndarray:
+        """
+        Distance from each lot to the nearest buyer of its waste type.
+
+        Each distinct (pincode, waste type) pair is looked up once; NaN
+        where the pincode cannot be located.
+        """
+        pairs: Dict[Tuple[str, str], int] = {}
+        inverse = np.fromiter(
+            (pairs.setdefault(pair, len(pairs)) for pair in zip(pincodes, waste_types)),
+            dtype=np.intp,
+            count=len(pincodes)
+        )
+        distances = np.array([
+            nearby[0].distance_km if nearby else np.nan
+            for nearby in (self.nearest_to_pincode(p, t) for p, t in pairs)
+        ], dtype=np.float64)
+        return distances[inverse] if len(pairs) else np.zeros(0)
+
+
+# Global instance
+_location_service = None
+_location_service_loaded = False
+
+def get_location_service() -> Optional[LocationService]:
+    """
+    Get the location service, loading the data files on first call.
+
+    Returns None (no distance penalty) when the data files are missing.
+    """
+    global _location_service, _location_service_loaded
+    if not _location_service_loaded:
+        _location_service_loaded = True
+        data_dir = os.environ.get('GEO_DATA_DIR', DEFAULT_DATA_DIR)
+        pincodes_path = os.path.join(data_dir, 'pincodes.csv')
+        industries_path = os.path.join(data_dir, 'industries.csv')
+        if os.path.exists(pincodes_path) and os.path.exists(industries_path):
+            start = time.perf_counter()
+            _location_service = LocationService(
+                PincodeDirectory.from_csv(pincodes_path),
+                IndustryIndex.from_csv(industries_path),
+                cache_size=int(os.environ.get('GEO_CACHE_SIZE', '65536'))
+            )
+            logger.info(
+                f"Indexed {len(_location_service.index.industries)} industries and "
+                f"{len(_location_service.directory)} pincodes in {time.perf_counter() - start:.3f}s"
+            )
+        else:
+            logger.warning(f"Location data not found in {data_dir}; prices have no distance penalty")
+    return _location_service
@@ -0,0 +1,149 @@
+"""
+Import-time budget check for the API process.
+
+Imports the API module in a fresh interpreter with ``python -X importtime``,
+reports the slowest imports and fails if the total exceeds the budget or if
+a heavy ML package (TensorFlow, ONNX Runtime, ...) was imported eagerly.
+
+Usage (from the backend directory):
+    python -m app.import_budget --budget-ms 1500
+    USE_ML_MODEL=1 python -m app.import_budget
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+# Packages that must only ever be imported lazily by the classifier factory
+DEFAULT_FORBIDDEN = ("tensorflow", "keras", "onnxruntime", "tflite_runtime", "ai_edge_litert")
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure_imports(module: str) -> List[ImportTiming]:
+    """
+    Import a module in a subprocess and parse the -X importtime output.
+
+    Args:
+        module: Dotted module name to import
+
+    Returns:
+        One ImportTiming per imported module, in import order
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # One space after the separator, then two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append(ImportTiming(
+            name.strip(), int(self_us), int(cumulative_us), depth
+        ))
+    return timings
+
+
+def direct_imports(timings: List[ImportTiming], module: str) -> List[ImportTiming]:
+    """
+    Modules imported directly by ``module``.
+
+    -X importtime prints children before their parent, so these are the
+    entries one level deeper immediately preceding the module's own entry.
+    """
+    index = next((i for i, t in enumerate(timings) if t.module == module), None)
+    if index is None:
+        return []
+    depth = timings[index].depth
+    children = []
+    for t in reversed(timings[:index]):
+        if t.depth <= depth:
+            break
+        if t.depth == depth + 1:
+            children.append(t)
+    return children
+
+
+def check_budget(
+    module: str = "app.main",
+    budget_ms: float = 1500,
+    top: int = 15,
+    forbidden=DEFAULT_FORBIDDEN
+) -> bool:
+    """
+    Print an import-time report and check it against the budget.
+
+    Returns:
+        True if the import fits the budget and no forbidden package loaded
+    """
+    timings = measure_imports(module)
+    by_name: Dict[str, ImportTiming] = {t.module: t for t in timings}
+    total_ms = by_name[module].cumulative_us / 1000 if module in by_name else 0.0
+
+    print(f"Importing {module} took {total_ms:.0f}ms (budget {budget_ms:.0f}ms)\n")
+
+    print(f"Slowest imports made by {module} (cumulative):")
+    children = sorted(direct_imports(timings, module), key=lambda t: t.cumulative_us, reverse=True)
+    for t in children[:top]:
+        print(f"  {t.cumulative_us / 1000:>8.1f}ms  {t.module}")
+
+    print("\nSlowest individual modules (self time):")
+    for t in sorted(timings, key=lambda t: t.self_us, reverse=True)[:top]:
+        print(f"  {t.self_us / 1000:>8.1f}ms  {t.module}")
+
+    ok = True
+    eager = sorted({
+        t.module for t in timings
+        if t.module.split(".")[0] in forbidden
+    })
+    if eager:
+        roots = sorted({name.split(".")[0] for name in eager})
+        print(f"\nFAIL: heavy packages imported eagerly: {', '.join(roots)}")
+        ok = False
+    if total_ms > budget_ms:
+        print(f"\nFAIL: import time {total_ms:.0f}ms exceeds budget {budget_ms:.0f}ms")
+        ok = False
+    if ok:
+        print("\nOK: within import budget")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check API import time against a budget")
+    parser.add_argument(
+        '--module',
+        type=str,
+        default='app.main',
+        help='Module to import'
+    )
+    parser.add_argument(
+        '--budget-ms',
+        type=float,
+        default=float(os.environ.get('IMPORT_BUDGET_MS', '1500')),
+        help='Maximum allowed cumulative import time in milliseconds'
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=15,
+        help='Number of slowest imports to report'
+    )
+    args = parser.parse_args()
+
+    sys.exit(0 if check_budget(args.module, args.budget_ms, args.top) else 1)
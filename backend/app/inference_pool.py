@@ -0,0 +1,125 @@
+"""
+Bounded worker pool for running blocking inference off the event loop.
+
+Classification decodes images and runs TensorFlow, both of which block. The
+API endpoints hand that work to this pool so the event loop stays free for
+other requests. The pool admits at most ``max_workers + max_queue_size``
+jobs at once; beyond that it rejects immediately so the endpoint can answer
+503 instead of letting latency pile up.
+
+Each pool thread blocks on the classifier's micro-batcher until its
+request's batch completes, so the pool size caps the batch size. By
+default there are at least CLASSIFIER_MAX_BATCH_SIZE threads.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when the inference pool has no free slot for a new job."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Thread pool with a bounded admission queue."""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue_size: int = 32,
+        retry_after: int = 1
+    ):
+        """
+        Create the pool.
+
+        Args:
+            max_workers: Number of inference threads
+            max_queue_size: Jobs allowed to wait for a free thread
+            retry_after: Seconds suggested to clients when saturated
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.retry_after = retry_after
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="inference"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _call(self, fn: Callable, args: tuple) -> Any:
+        """Run a job and free its slot once done."""
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run ``fn(*args)`` on the pool and await its result.
+
+        Raises:
+            InferencePoolSaturated: If all workers are busy and the queue is full
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise InferencePoolSaturated(self.retry_after)
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            # Run in the caller's context (request metrics, see app.metrics)
+            future = self._executor.submit(
+                contextvars.copy_context().run, self._call, fn, args
+            )
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise
+
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict:
+        """Get pool occupancy and rejection counts."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        """Wait for running jobs and stop the worker threads."""
+        self._executor.shutdown(wait=True)
+
+
+# Global pool instance
+_inference_pool = None
+
+def get_inference_pool() -> InferencePool:
+    """Get or create the global inference pool."""
+    global _inference_pool
+    if _inference_pool is None:
+        default_workers = max(4, int(os.environ.get('CLASSIFIER_MAX_BATCH_SIZE', '16')))
+        _inference_pool = InferencePool(
+            max_workers=int(os.environ.get('INFERENCE_WORKERS', str(default_workers))),
+            max_queue_size=int(os.environ.get('INFERENCE_QUEUE_SIZE', '32')),
+            retry_after=int(os.environ.get('INFERENCE_RETRY_AFTER', '1'))
+        )
+    return _inference_pool
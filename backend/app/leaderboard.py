@@ -0,0 +1,357 @@
+"""
+Green Score leaderboard.
+
+Scores are whole points in [0, LEADERBOARD_MAX_SCORE]. Each ranking
+(one over every farmer, one per state) is a Fenwick tree counting farmers
+per score bucket, next to the farmers in each bucket. Changing a score
+moves one count between two buckets, O(log S) for S possible scores. A
+farmer's rank is one more than the number of farmers with a higher
+score, a single prefix sum; tied farmers share a rank. The farmer at a
+given position is found by descending the tree, so a page is read
+bucket by bucket without sorting anyone.
+
+Serialized pages are kept in an LRU cache. A score change only drops
+the cached pages it can reach: a farmer who stays below a page, or stays
+above it, leaves the page unchanged.
+
+Farmers are seeded from a CSV file (LEADERBOARD_SEED, default
+backend/data/farmers.csv) with columns
+
+    id,name,state,green_score,co2_saved_kg,waste_recycled_tons
+
+Scores are held in memory, so each server process has its own copy.
+Writes are therefore turned off (LEADERBOARD_WRITES=0) when app.server
+runs several workers or recycles them, until scores move to a shared
+store.
+"""
+
+import csv
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEED_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'farmers.csv'
+)
+
+MAX_SCORE = int(os.environ.get('LEADERBOARD_MAX_SCORE', '10000'))
+PAGE_CACHE_SIZE = int(os.environ.get('LEADERBOARD_PAGE_CACHE_SIZE', '256'))
+
+# Lowest score for each badge, best first
+BADGES = [
+    (900, "Eco-Warrior"),
+    (850, "Soil Guardian"),
+    (800, "Green Hero"),
+    (750, "Earth Saver"),
+    (700, "Nature Friend"),
+    (600, "Sustainability Star"),
+    (400, "Green Champion"),
+    (0, "Green Starter"),
+]
+
+
+class Farmer(NamedTuple):
+    id: str
+    name: str
+    state: str
+    green_score: int
+    co2_saved_kg: float
+    waste_recycled_tons: float
+
+
+def badge_for(score: int) -> str:
+    return next(name for threshold, name in BADGES if score >= threshold)
+
+
+def _state_key(state: Optional[str]) -> Optional[str]:
+    return state.strip().casefold() if state else None
+
+
+class ScoreRanking:
+    """Order-statistic structure over farmer scores: Fenwick tree of bucket counts."""
+
+    def __init__(self, max_score: int):
+        self.max_score = max_score
+        # Slot i (1-based) counts score max_score - i + 1, so prefix sums
+        # count farmers scoring at least a given score
+        self._tree = [0] * (max_score + 2)
+        self._top_bit = 1 << (max_score + 1).bit_length()
+        # score -> farmer ids holding it, in the order they reached it
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self.size = 0
+
+    def _add(self, slot: int, delta: int):
+        tree = self._tree
+        while slot < len(tree):
+            tree[slot] += delta
+            slot += slot & -slot
+
+    def _prefix(self, slot: int) -> int:
+        total = 0
+        tree = self._tree
+        while slot > 0:
+            total += tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def _slot_at(self, position: int) -> int:
+        """Slot holding the position-th farmer (1-based), by binary lifting."""
+        slot = 0
+        step = self._top_bit
+        tree = self._tree
+        while step:
+            upper = slot + step
+            if upper < len(tree) and tree[upper] < position:
+                slot = upper
+                position -= tree[upper]
+            step >>= 1
+        return slot + 1
+
+    def add(self, farmer_id: str, score: int):
+        self._buckets.setdefault(score, {})[farmer_id] = None
+        self._add(self.max_score - score + 1, 1)
+        self.size += 1
+
+    def remove(self, farmer_id: str, score: int):
+        bucket = self._buckets[score]
+        del bucket[farmer_id]
+        if not bucket:
+            del self._buckets[score]
+        self._add(self.max_score - score + 1, -1)
+        self.size -= 1
+
+    def rank(self, score: int) -> int:
+        """Rank of a farmer with this score: 1 + farmers scoring higher."""
+        return self._prefix(self.max_score - score) + 1
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, str]]:
+        """
+        (rank, farmer id) for positions offset .. offset + limit - 1.
+
+        Highest score first; tied farmers in the order they reached the score.
+        """
+        entries: List[Tuple[int, str]] = []
+        position = offset + 1
+        while len(entries) < limit and position <= self.size:
+            slot = self._slot_at(position)
+            score = self.max_score - slot + 1
+            before = self._prefix(slot - 1)
+            bucket = self._buckets[score]
+            for farmer_id in islice(bucket, position - before - 1, position - before - 1 + limit - len(entries)):
+                entries.append((before + 1, farmer_id))
+            position = before + len(bucket) + 1
+        return entries
+
+
+class Leaderboard:
+    """Farmers ranked by Green Score overall and within each state."""
+
+    def __init__(self, max_score: int = MAX_SCORE, page_cache_size: int = PAGE_CACHE_SIZE):
+        self.max_score = max_score
+        self.page_cache_size = page_cache_size
+        self.farmers: Dict[str, Farmer] = {}
+        self._overall = ScoreRanking(max_score)
+        self._states: Dict[str, ScoreRanking] = {}
+        # (state key, offset, limit) -> (JSON bytes, lowest score, highest score);
+        # the lowest score is None when the page is not full
+        self._pages: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path: str, **kwargs) -> "Leaderboard":
+        leaderboard = cls(**kwargs)
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                leaderboard.update(Farmer(
+                    id=row["id"],
+                    name=row["name"],
+                    state=row["state"],
+                    green_score=int(row["green_score"]),
+                    co2_saved_kg=float(row.get("co2_saved_kg") or 0),
+                    waste_recycled_tons=float(row.get("waste_recycled_tons") or 0)
+                ))
+        return leaderboard
+
+    def __len__(self) -> int:
+        return len(self.farmers)
+
+    def _ranking(self, state: Optional[str]) -> Optional[ScoreRanking]:
+        key = _state_key(state)
+        return self._overall if key is None else self._states.get(key)
+
+    def update(self, farmer: Farmer):
+        """
+        Add a farmer or replace their record.
+
+        Raises:
+            ValueError: If the score is outside [0, max_score]
+        """
+        self._check_score(farmer.green_score)
+        with self._lock:
+            self._store(farmer)
+
+    def merge(self, farmer_id: str, changes: Dict) -> Farmer:
+        """
+        Change some fields of a farmer's record, or add the farmer.
+
+        Fields missing from changes keep their current values. A new
+        farmer needs at least name, state and green_score; their impact
+        totals start at 0.
+
+        Returns:
+            The farmer's record after the change
+
+        Raises:
+            ValueError: If a new farmer lacks a required field, or the
+                score is outside [0, max_score]
+        """
+        if 'green_score' in changes:
+            self._check_score(changes['green_score'])
+        with self._lock:
+            old = self.farmers.get(farmer_id)
+            if old is None:
+                missing = [name for name in ('name', 'state', 'green_score') if name not in changes]
+                if missing:
+                    raise ValueError(f"New farmer {farmer_id} needs {', '.join(missing)}")
+                old = Farmer(id=farmer_id, name='', state='', green_score=0,
+                             co2_saved_kg=0.0, waste_recycled_tons=0.0)
+            farmer = old._replace(**changes)
+            self._store(farmer)
+            return farmer
+
+    def _check_score(self, score: int):
+        if not 0 <= score <= self.max_score:
+            raise ValueError(f"green_score must be between 0 and {self.max_score}")
+
+    def _store(self, farmer: Farmer):
+        """Put a farmer's record in place and move them in the rankings; caller holds the lock."""
+        old = self.farmers.get(farmer.id)
+        old_score = old.green_score if old else None
+        if old and old_score == farmer.green_score and _state_key(old.state) == _state_key(farmer.state):
+            # Same place in every ranking; only the row's details change
+            self.farmers[farmer.id] = farmer
+            self._invalidate(None, old_score, old_score)
+            self._invalidate(_state_key(farmer.state), old_score, old_score)
+            return
+
+        new_key = _state_key(farmer.state)
+        old_key = _state_key(old.state) if old else None
+
+        if old:
+            self._overall.remove(old.id, old.green_score)
+            self._states[old_key].remove(old.id, old.green_score)
+            if not self._states[old_key].size:
+                del self._states[old_key]
+        self.farmers[farmer.id] = farmer
+        self._overall.add(farmer.id, farmer.green_score)
+        if new_key not in self._states:
+            self._states[new_key] = ScoreRanking(self.max_score)
+        self._states[new_key].add(farmer.id, farmer.green_score)
+
+        self._invalidate(None, old_score, farmer.green_score)
+        if old_key == new_key:
+            self._invalidate(new_key, old_score, farmer.green_score)
+        else:
+            if old_key is not None:
+                self._invalidate(old_key, old_score, None)
+            self._invalidate(new_key, None, farmer.green_score)
+
+    def _invalidate(self, state_key: Optional[str], old_score: Optional[int], new_score: Optional[int]):
+        """Drop cached pages of one ranking that a farmer moving old -> new score can change."""
+        def below(score, low):
+            return score is None or (low is not None and score < low)
+
+        stale = [
+            key for key, (_, low, high) in self._pages.items()
+            if key[0] == state_key
+            and not (below(old_score, low) and below(new_score, low))
+            and not (old_score is not None and new_score is not None
+                     and old_score > high and new_score > high)
+        ]
+        for key in stale:
+            del self._pages[key]
+
+    def entry(self, farmer: Farmer, rank: int) -> Dict:
+        """A farmer's leaderboard row, as shown by the frontend."""
+        return {
+            "id": farmer.id,
+            "rank": rank,
+            "name": farmer.name,
+            "location": farmer.state,
+            "green_score": farmer.green_score,
+            "co2_saved": f"{farmer.co2_saved_kg / 1000:.1f} Tons",
+            "waste_recycled": f"{farmer.waste_recycled_tons:g} Tons",
+            "badge": badge_for(farmer.green_score),
+        }
+
+    def page_json(self, offset: int, limit: int, state: Optional[str] = None) -> bytes:
+        """
+        One page of leaderboard rows as a serialized JSON array.
+
+        Args:
+            offset: Rows to skip from the top
+            limit: Max rows returned
+            state: Rank only farmers of this state (case-insensitive)
+        """
+        key = (_state_key(state), offset, limit)
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached is not None:
+                self._pages.move_to_end(key)
+                return cached[0]
+
+            ranking = self._ranking(state)
+            rows = ranking.page(offset, limit) if ranking else []
+            farmers = [self.farmers[farmer_id] for _, farmer_id in rows]
+            body = json.dumps(
+                [self.entry(farmer, rank) for (rank, _), farmer in zip(rows, farmers)],
+                separators=(',', ':')
+            ).encode()
+
+            if self.page_cache_size > 0:
+                low = farmers[-1].green_score if len(farmers) == limit else None
+                high = farmers[0].green_score if farmers else -1
+                self._pages[key] = (body, low, high)
+                if len(self._pages) > self.page_cache_size:
+                    self._pages.popitem(last=False)
+            return body
+
+    def total(self, state: Optional[str] = None) -> int:
+        ranking = self._ranking(state)
+        return ranking.size if ranking else 0
+
+    def user_rank(self, farmer_id: str, state: Optional[str] = None) -> Optional[Dict]:
+        """A farmer's row, ranked overall or within state; None if not ranked there."""
+        with self._lock:
+            farmer = self.farmers.get(farmer_id)
+            if farmer is None or (state and _state_key(state) != _state_key(farmer.state)):
+                return None
+            return self.entry(farmer, self._ranking(state).rank(farmer.green_score))
+
+
+def writes_enabled() -> bool:
+    """Whether score updates are accepted; off when processes would not share them."""
+    return os.environ.get('LEADERBOARD_WRITES', '1') == '1'
+
+
+# Global instance
+_leaderboard = None
+
+def get_leaderboard() -> Leaderboard:
+    """Get the leaderboard, seeded from LEADERBOARD_SEED on first call (empty if missing)."""
+    global _leaderboard
+    if _leaderboard is None:
+        path = os.environ.get('LEADERBOARD_SEED', DEFAULT_SEED_PATH)
+        if os.path.exists(path):
+            _leaderboard = Leaderboard.from_csv(path)
+            logger.info(f"Loaded {len(_leaderboard)} farmers into the leaderboard from {path}")
+        else:
+            _leaderboard = Leaderboard()
+            logger.warning(f"Leaderboard seed {path} not found; starting empty")
+    return _leaderboard
@@ -0,0 +1,135 @@
+"""
+Classifier startup lifecycle: load, warm up, then report ready.
+
+The configured classifier is loaded and warmed at a few batch sizes in a
+background thread when the API starts. Liveness is reported as soon as the
+process serves HTTP; readiness only once warmup has finished, so a load
+balancer never routes traffic to a cold worker.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def warmup_batch_sizes() -> Tuple[int, ...]:
+    """Batch sizes to warm up, from WARMUP_BATCH_SIZES (e.g. "1,4,8")."""
+    raw = os.environ.get('WARMUP_BATCH_SIZES', '1,4,8')
+    return tuple(int(size) for size in raw.split(',') if size.strip())
+
+
+class ModelState:
+    """Thread-safe record of the classifier's load and warmup progress."""
+
+    STARTING = "starting"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = self.STARTING
+        self.started_at = time.time()
+        self.model_version: Optional[str] = None
+        self.backend: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_ms: Dict[int, float] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == self.READY
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def mark_loaded(self, classifier):
+        """
+        Record a classifier loaded on first use, without startup warmup.
+
+        Only moves the state out of STARTING; a background load in progress
+        still decides readiness itself.
+        """
+        with self._lock:
+            if self.status == self.STARTING:
+                self.status = self.READY
+                self.model_version = classifier.model_version
+                self.backend = classifier.backend_name
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "status": self.status,
+                "model_version": self.model_version,
+                "backend": self.backend,
+                "load_seconds": (
+                    round(self.load_seconds, 3) if self.load_seconds is not None else None
+                ),
+                "warmup_latency_ms": {
+                    str(size): round(ms, 2) for size, ms in self.warmup_ms.items()
+                },
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "error": self.error,
+            }
+
+
+def load_and_warm(
+    get_classifier: Callable,
+    state: ModelState,
+    batch_sizes: Tuple[int, ...] = (1, 4, 8)
+):
+    """
+    Load the classifier and run warmup inferences, recording progress.
+
+    Errors are recorded on the state rather than raised, so a failed load
+    leaves the process alive but not ready.
+    """
+    state.update(status=ModelState.LOADING)
+    try:
+        classifier = get_classifier()
+        # The classifier's own load time; get_classifier may return an
+        # instance loaded earlier, or spend time on other setup
+        load_seconds = classifier.load_seconds
+        state.update(
+            model_version=classifier.model_version,
+            backend=classifier.backend_name,
+            load_seconds=load_seconds
+        )
+
+        warmup_ms = classifier.warmup(batch_sizes)
+        state.update(warmup_ms=warmup_ms, status=ModelState.READY)
+        logger.info(
+            f"Classifier ready ({classifier.backend_name}, {classifier.model_version}) "
+            f"after {load_seconds:.2f}s load"
+        )
+    except Exception as e:
+        logger.error(f"Classifier failed to load: {str(e)}")
+        state.update(status=ModelState.FAILED, error=str(e))
+
+
+def start_background_load(
+    get_classifier: Callable,
+    state: ModelState,
+    batch_sizes: Tuple[int, ...] = (1, 4, 8)
+) -> threading.Thread:
+    """
+    Run load_and_warm in a daemon thread and return it.
+
+    The state is LOADING before this returns, so a request that loads the
+    classifier first (mark_loaded) cannot report READY ahead of warmup.
+    """
+    state.update(status=ModelState.LOADING)
+    thread = threading.Thread(
+        target=load_and_warm,
+        args=(get_classifier, state, batch_sizes),
+        name="classifier-warmup",
+        daemon=True
+    )
+    thread.start()
+    return thread
@@ -1,20 +1,85 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import json
 import random
 import logging
 import os
+import numpy as np
+
+from . import metrics
+from .inference_pool import get_inference_pool, InferencePoolSaturated
+from .upload import read_image_upload, read_upload, UploadRejected
+from .batch_classify import (
+    BatchItem, TooManyImages, extract_archive_images, is_zip_upload, stream_batch_results,
+    MAX_BATCH_ITEMS, MAX_BATCH_BYTES
+)
+from .lifecycle import ModelState, start_background_load, warmup_batch_sizes
+from . import pricing
+from .price_model import get_price_model
+from .geo import get_location_service
+from .matching import buyers_from_demands, match_listings
+from .leaderboard import get_leaderboard as leaderboard_service, writes_enabled
 
 # Use simple classifier for demo, or full ML classifier if USE_ML_MODEL=1
 USE_ML_MODEL = os.environ.get('USE_ML_MODEL', '0') == '1'
 
-if USE_ML_MODEL:
-    from .waste_classifier import get_classifier
-else:
-    from .simple_classifier import get_simple_classifier as get_classifier
+def get_classifier():
+    """
+    Get the configured classifier instance.
+    
+    The classifier module is imported on first call, so the ML stack
+    (TensorFlow, ONNX Runtime) never slows down process startup or the
+    non-ML endpoints.
+    """
+    if USE_ML_MODEL:
+        from .waste_classifier import get_classifier as classifier_factory
+    else:
+        from .simple_classifier import get_simple_classifier as classifier_factory
+    return classifier_factory()
+
+def _request_classifier():
+    """
+    get_classifier(), labeling the current request's metrics with its backend.
+    
+    Without startup warmup, the first successful load here is what makes
+    the process ready.
+    """
+    classifier = get_classifier()
+    if not model_state.ready:
+        model_state.mark_loaded(classifier)
+    metrics.set_backend(classifier.backend_name)
+    return classifier
+
+# Largest lot count accepted by /api/predict-price-batch
+PRICE_BATCH_MAX_ITEMS = int(os.environ.get('PRICE_BATCH_MAX_ITEMS', '10000'))
+
+# Largest listing count accepted by /api/match-listings
+MATCH_MAX_LISTINGS = int(os.environ.get('MATCH_MAX_LISTINGS', '50000'))
+
+# Largest page size accepted by /api/leaderboard
+LEADERBOARD_MAX_PAGE_SIZE = int(os.environ.get('LEADERBOARD_MAX_PAGE_SIZE', '100'))
 
-app = FastAPI(title="StubbleX AI API")
+# Classifier load/warmup progress, reported by the health endpoints
+model_state = ModelState()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm the classifier in the background on startup."""
+    # Small NumPy arrays, KD-trees and the leaderboard; loaded up front so no request pays for it
+    get_price_model()
+    get_location_service()
+    leaderboard_service()
+    if os.environ.get('WARMUP_ON_STARTUP', '1') == '1':
+        start_background_load(get_classifier, model_state, warmup_batch_sizes())
+    yield
+
+app = FastAPI(title="StubbleX AI API", lifespan=lifespan)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +94,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request timings include CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Models
 class WasteItem(BaseModel):
     waste_type: str
@@ -36,11 +104,40 @@ class WasteItem(BaseModel):
     location_pincode: str
     moisture_content: Optional[float] = None
 
+class WasteItemBatch(BaseModel):
+    """Lots in columnar form: one list per WasteItem field, all the same length."""
+    waste_type: List[str]
+    quantity: List[float]
+    location_pincode: List[str]
+    moisture_content: Optional[List[Optional[float]]] = None
+
 class PricePrediction(BaseModel):
     estimated_price_per_ton: float
     total_value: float
     confidence_score: float
     sustainability_impact: dict
+    nearest_industry: Optional[dict] = None
+
+class BuyerDemand(BaseModel):
+    id: str
+    name: Optional[str] = None
+    industry: str
+    location_pincode: str
+    capacity_tons: float
+    accepts: Optional[List[str]] = None
+    price_per_ton: Optional[float] = None
+
+class MatchRequest(BaseModel):
+    listings: WasteItemBatch
+    buyers: Optional[List[BuyerDemand]] = None
+
+class FarmerScore(BaseModel):
+    # Fields left out keep the farmer's current values
+    name: Optional[str] = None
+    state: Optional[str] = None
+    green_score: Optional[int] = None
+    co2_saved_kg: Optional[float] = None
+    waste_recycled_tons: Optional[float] = None
 
 class OTPRequest(BaseModel):
     phone_number: str
@@ -71,33 +168,64 @@ async def verify_otp(request: OTPVerify):
     
     raise HTTPException(status_code=400, detail="Invalid OTP")
 
-# Mock AI Logic (Replace with XGBoost model later)
-def predict_price(item: WasteItem) -> PricePrediction:
-    base_prices = {
-        "rice_straw": 2200,      # Low demand, hard to process
-        "wheat_stubble": 4500,   # High demand (Easy fodder)
-        "sugarcane_trash": 3200  # Biofuel
+def _nearest_industry(item: WasteItem) -> Optional[dict]:
+    """Closest buyer of the lot's waste type, or None if it cannot be located."""
+    service = get_location_service()
+    nearby = service.nearest_to_pincode(item.location_pincode, item.waste_type) if service else ()
+    if not nearby:
+        return None
+    industry, distance_km = nearby[0]
+    return {
+        "id": industry.id,
+        "name": industry.name,
+        "industry": industry.industry,
+        "distance_km": round(distance_km, 1),
     }
+
+# Trained model when PRICE_MODEL_PATH is set (app.train_price_model),
+# rule-based prices otherwise
+def predict_price(item: WasteItem) -> PricePrediction:
+    model = get_price_model()
+    nearest = _nearest_industry(item)
+    if model is not None:
+        values = pricing.value_lots(
+            [item.waste_type], [item.quantity], [item.location_pincode],
+            [item.moisture_content], model=model
+        )
+        return PricePrediction(
+            estimated_price_per_ton=float(values["estimated_price_per_ton"][0]),
+            total_value=float(values["total_value"][0]),
+            confidence_score=float(values["confidence_score"][0]),
+            sustainability_impact={
+                "co2_saved_kg": float(values["co2_saved_kg"][0]),
+                "soil_nitrogen_retained_kg": float(values["soil_nitrogen_retained_kg"][0])
+            },
+            nearest_industry=nearest
+        )
     
-    base = base_prices.get(item.waste_type, 2000)
+    base = pricing.BASE_PRICES.get(item.waste_type, pricing.DEFAULT_BASE_PRICE)
     
     # "AI" adjustments based on location/qty
     # Bulk bonus
-    multiplier = 1.05 if item.quantity > 10 else 1.0
-    
-    # Location penalty (mock logic)
-    # real implementation would calculate distance to nearest industry
+    multiplier = pricing.BULK_MULTIPLIER if item.quantity > pricing.BULK_THRESHOLD_TONS else 1.0
     
     final_price_per_ton = base * multiplier
     
+    # Location penalty: haulage to the nearest buyer of this waste type
+    if nearest is not None:
+        penalty = float(pricing.transport_penalty(final_price_per_ton, nearest["distance_km"]))
+        final_price_per_ton -= penalty
+        nearest["transport_penalty_per_ton"] = round(penalty, 2)
+    
     return PricePrediction(
         estimated_price_per_ton=final_price_per_ton,
         total_value=final_price_per_ton * item.quantity,
-        confidence_score=0.92,
+        confidence_score=pricing.CONFIDENCE_SCORE,
         sustainability_impact={
-            "co2_saved_kg": item.quantity * 1500,  # 1 ton straw burn ~ 1.5 ton CO2
-            "soil_nitrogen_retained_kg": item.quantity * 4.5
-        }
+            "co2_saved_kg": item.quantity * pricing.CO2_SAVED_KG_PER_TON,
+            "soil_nitrogen_retained_kg": item.quantity * pricing.NITROGEN_RETAINED_KG_PER_TON
+        },
+        nearest_industry=nearest
     )
 
 @app.post("/api/predict-price", response_model=PricePrediction)
@@ -110,6 +238,161 @@ async def get_valuation(item: WasteItem):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/predict-price-batch")
+async def get_batch_valuation(batch: WasteItemBatch):
+    """
+    Values many lots in one vectorized pass.
+    
+    Takes the lots as columns and answers in columns, in the same order,
+    with the same rules as /api/predict-price:
+    
+        {"count": N, "estimated_price_per_ton": [...], "total_value": [...],
+         "confidence_score": [...], "nearest_industry_km": [...],
+         "sustainability_impact": {"co2_saved_kg": [...], "soil_nitrogen_retained_kg": [...]},
+         "summary": {"total_value": ..., "total_quantity": ..., "co2_saved_kg": ...}}
+    """
+    count = len(batch.waste_type)
+    if count > PRICE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many lots. Maximum is {PRICE_BATCH_MAX_ITEMS} per request."
+        )
+    columns = [batch.quantity, batch.location_pincode]
+    if batch.moisture_content is not None:
+        columns.append(batch.moisture_content)
+    if any(len(column) != count for column in columns):
+        raise HTTPException(status_code=400, detail="All columns must have the same length.")
+    
+    try:
+        service = get_location_service()
+        distances = (
+            service.distances_km(batch.location_pincode, batch.waste_type)
+            if service else np.full(count, np.nan)
+        )
+        values = pricing.value_lots(
+            batch.waste_type, batch.quantity, batch.location_pincode,
+            batch.moisture_content, model=get_price_model(), distances_km=distances
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    with metrics.stage("serialize"):
+        # null where the pincode could not be located
+        distance_column = np.round(distances, 1).astype(object)
+        distance_column[np.isnan(distances)] = None
+        return JSONResponse(content={
+            "count": count,
+            "estimated_price_per_ton": values["estimated_price_per_ton"].tolist(),
+            "total_value": values["total_value"].tolist(),
+            "confidence_score": values["confidence_score"].tolist(),
+            "nearest_industry_km": distance_column.tolist(),
+            "sustainability_impact": {
+                "co2_saved_kg": values["co2_saved_kg"].tolist(),
+                "soil_nitrogen_retained_kg": values["soil_nitrogen_retained_kg"].tolist(),
+            },
+            "summary": {
+                "total_value": float(values["total_value"].sum()),
+                "total_quantity": float(sum(batch.quantity)),
+                "co2_saved_kg": float(values["co2_saved_kg"].sum()),
+            },
+        })
+
+@app.post("/api/match-listings")
+async def match_buyers(request: MatchRequest):
+    """
+    Assigns farmer listings to industrial buyers (see app.matching).
+    
+    Listings come as columns, like /api/predict-price-batch. Without
+    buyers, the indexed industries are matched with their monthly
+    capacity, paying the base price of each waste type. Listings may be
+    split across buyers:
+    
+        {"count": N, "matched_quantity": [...],
+         "assignments": {"listing": [...], "buyer_id": [...], "quantity": [...],
+                         "distance_km": [...], "price_per_ton": [...],
+                         "transport_cost_per_ton": [...]},
+         "buyers": [{"id": ..., "name": ..., "industry": ..., "capacity_tons": ...,
+                     "assigned_tons": ...}],
+         "summary": {"total_quantity": ..., "matched_quantity": ..., "total_value": ...,
+                     "transport_cost": ...}}
+    """
+    listings = request.listings
+    count = len(listings.waste_type)
+    if count > MATCH_MAX_LISTINGS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many listings. Maximum is {MATCH_MAX_LISTINGS} per request."
+        )
+    if any(len(column) != count for column in (listings.quantity, listings.location_pincode)):
+        raise HTTPException(status_code=400, detail="All columns must have the same length.")
+    
+    service = get_location_service()
+    if service is None:
+        raise HTTPException(status_code=503, detail="Location data is not loaded.")
+    
+    index, buyer_prices = service.index, None
+    if request.buyers is not None:
+        if not request.buyers:
+            raise HTTPException(status_code=400, detail="No buyers given.")
+        try:
+            index = buyers_from_demands(jsonable_encoder(request.buyers), service.directory)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        buyer_prices = [b.price_per_ton for b in request.buyers]
+    
+    try:
+        # Up to about a second of NumPy work for the largest batches
+        result = await run_in_threadpool(
+            match_listings,
+            listings.waste_type, listings.quantity, listings.location_pincode,
+            index, service.directory, buyer_prices
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    with metrics.stage("serialize"):
+        buyer_ids = np.array([industry.id for industry in index.industries], dtype=object)
+        net_value = result["quantity"] * (result["price_per_ton"] - result["transport_cost_per_ton"])
+        return JSONResponse(content={
+            "count": count,
+            "matched_quantity": result["matched_quantity"].tolist(),
+            "assignments": {
+                "listing": result["listing"].tolist(),
+                "buyer_id": buyer_ids[result["buyer"]].tolist(),
+                "quantity": result["quantity"].tolist(),
+                "distance_km": np.round(result["distance_km"], 1).tolist(),
+                "price_per_ton": result["price_per_ton"].tolist(),
+                "transport_cost_per_ton": np.round(result["transport_cost_per_ton"], 2).tolist(),
+            },
+            "buyers": [
+                {
+                    "id": industry.id,
+                    "name": industry.name,
+                    "industry": industry.industry,
+                    "capacity_tons": industry.capacity_tons_per_month,
+                    "assigned_tons": float(assigned),
+                }
+                for industry, assigned in zip(index.industries, result["buyer_assigned"].tolist())
+            ],
+            "summary": {
+                "total_quantity": float(sum(listings.quantity)),
+                "matched_quantity": float(result["quantity"].sum()),
+                "total_value": float(net_value.sum()),
+                "transport_cost": float((result["quantity"] * result["transport_cost_per_ton"]).sum()),
+            },
+        })
+
+def _busy_response(error: InferencePoolSaturated) -> HTTPException:
+    """503 telling the client when to retry a saturated inference queue."""
+    logger.warning("Inference queue saturated, rejecting request")
+    return HTTPException(
+        status_code=503,
+        detail="Classifier is busy. Please retry shortly.",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 @app.post("/api/classify-waste")
 async def classify_waste(file: UploadFile = File(...)):
     """
@@ -119,10 +402,12 @@ async def classify_waste(file: UploadFile = File(...)):
         - predicted_class: Type of waste (e.g., rice_straw)
         - display_name: Human-readable name
         - confidence: Prediction confidence (0-1)
+        - top_predictions: Top-3 alternatives (same as /api/classify-waste-top-k)
         - industrial_uses: List of industrial reuse options
         - environmental_benefits: CO2, nitrogen, water savings
         - price_range: Estimated market value per ton
     """
+    metrics.mark_since_start("multipart_parse")
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
@@ -131,28 +416,28 @@ async def classify_waste(file: UploadFile = File(...)):
                 detail=f"Invalid file type: {file.content_type}. Please upload an image."
             )
         
-        # Read image bytes
-        image_bytes = await file.read()
+        # Stream the upload in chunks, rejecting oversized files and
+        # decompression bombs before anything reaches PIL
+        with metrics.stage("file_read"):
+            image_bytes = await read_image_upload(file)
         
-        # Validate file size (max 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if len(image_bytes) > max_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large ({len(image_bytes)} bytes). Maximum size is 10MB."
-            )
-        
-        # Get classifier and make prediction
-        classifier = get_classifier()
-        result = classifier.predict(image_bytes)
+        # Run prediction on the inference pool, off the event loop
+        result = await get_inference_pool().run(
+            lambda: _request_classifier().predict(image_bytes)
+        )
         
         logger.info(
             f"Classified waste as {result['display_name']} "
             f"with {result['confidence']:.2%} confidence"
         )
         
-        return result
+        with metrics.stage("serialize"):
+            return JSONResponse(content=jsonable_encoder(result))
         
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except InferencePoolSaturated as e:
+        raise _busy_response(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -163,17 +448,18 @@ async def classify_waste(file: UploadFile = File(...)):
         )
 
 @app.post("/api/classify-waste-top-k")
-async def classify_waste_top_k(file: UploadFile = File(...), k: int = 3):
+async def classify_waste_top_k(file: UploadFile = File(...), k: int = Query(3, ge=1)):
     """
     Get top-k waste classification predictions.
     
     Args:
         file: Uploaded image file
-        k: Number of top predictions to return (default: 3)
+        k: Number of top predictions to return (default: 3; 422 if below 1)
     
     Returns:
         List of top predictions sorted by confidence
     """
+    metrics.mark_since_start("multipart_parse")
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
@@ -182,15 +468,23 @@ async def classify_waste_top_k(file: UploadFile = File(...), k: int = 3):
                 detail=f"Invalid file type: {file.content_type}. Please upload an image."
             )
         
-        # Read image bytes
-        image_bytes = await file.read()
+        # Stream the upload in chunks, rejecting oversized files and
+        # decompression bombs before anything reaches PIL
+        with metrics.stage("file_read"):
+            image_bytes = await read_image_upload(file)
         
-        # Get classifier and make predictions
-        classifier = get_classifier()
-        results = classifier.predict_top_k(image_bytes, k=k)
+        # Run predictions on the inference pool, off the event loop
+        results = await get_inference_pool().run(
+            lambda: _request_classifier().predict_top_k(image_bytes, k=k)
+        )
         
-        return {"predictions": results}
+        with metrics.stage("serialize"):
+            return JSONResponse(content=jsonable_encoder({"predictions": results}))
         
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except InferencePoolSaturated as e:
+        raise _busy_response(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -201,57 +495,168 @@ async def classify_waste_top_k(file: UploadFile = File(...), k: int = 3):
         )
 
 
+@app.post("/api/classify-waste-batch")
+async def classify_waste_batch(files: List[UploadFile] = File(...), k: int = Query(3, ge=1)):
+    """
+    Classify many images in one request.
+    
+    Accepts multiple image files and/or zip archives of images. Results are
+    streamed back as NDJSON (one JSON object per line) as each batch
+    completes.
+    
+    Args:
+        files: Image files or zip archives
+        k: Number of top predictions per image (default: 3; 422 if below 1)
+    
+    Returns:
+        NDJSON stream. Each line has index, filename and either the
+        /api/classify-waste payload or an error. The last line is
+        {"done": true, "total", "succeeded", "failed"}.
+    """
+    metrics.mark_since_start("multipart_parse")
+    items: List[BatchItem] = []
+    total_bytes = 0
+    
+    for file in files:
+        if len(items) >= MAX_BATCH_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many images. Maximum is {MAX_BATCH_ITEMS} per request."
+            )
+        
+        if total_bytes + (file.size or 0) > MAX_BATCH_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch too large. Maximum is {MAX_BATCH_BYTES // (1024 * 1024)}MB per request."
+            )
+        
+        try:
+            if is_zip_upload(file.filename, file.content_type):
+                with metrics.stage("file_read"):
+                    archive_bytes = await read_upload(file, MAX_BATCH_BYTES - total_bytes)
+                total_bytes += len(archive_bytes)
+                # Decompressing and validating members is CPU-bound; keep it off the event loop
+                with metrics.stage("archive_extract"):
+                    items.extend(await run_in_threadpool(
+                        extract_archive_images, archive_bytes, MAX_BATCH_ITEMS - len(items)
+                    ))
+            else:
+                with metrics.stage("file_read"):
+                    image_bytes = await read_image_upload(file)
+                total_bytes += len(image_bytes)
+                items.append(BatchItem(file.filename, image_bytes))
+        except UploadRejected as e:
+            items.append(BatchItem(file.filename, error=e.detail))
+        except TooManyImages:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many images. Maximum is {MAX_BATCH_ITEMS} per request."
+            )
+    
+    logger.info(f"Batch classification of {len(items)} images")
+    
+    return StreamingResponse(
+        stream_batch_results(items, _request_classifier, get_inference_pool(), k=k),
+        media_type="application/x-ndjson"
+    )
+
+
 @app.get("/api/leaderboard")
-async def get_leaderboard():
+async def get_leaderboard(
+    offset: int = 0,
+    limit: int = 20,
+    state: Optional[str] = None,
+    user_id: Optional[str] = None
+):
     """
-    Returns the top farmers ranked by Green Score.
-    Mock data for demo.
+    Farmers ranked by Green Score, one page at a time.
+    
+    Args:
+        offset: Rows to skip from the top
+        limit: Rows per page (at most LEADERBOARD_MAX_PAGE_SIZE)
+        state: Rank only farmers of this state
+        user_id: Farmer whose own rank is returned as user_rank
+    
+    Returns:
+        {"leaderboard": [...], "user_rank": {...} or null, "total", "offset",
+        "limit"}. Pages come pre-serialized from the leaderboard's cache.
     """
-    return {
-        "leaderboard": [
-            {
-                "id": "farmer-1",
-                "rank": 1, "name": "Rajesh Kumar", "location": "Punjab",
-                "green_score": 950, "co2_saved": "12.5 Tons", "waste_recycled": "45 Tons", "badge": "Eco-Warrior"
-            },
-            {
-                "id": "farmer-2",
-                "rank": 2, "name": "Sunita Devi", "location": "Haryana",
-                "green_score": 880, "co2_saved": "10.2 Tons", "waste_recycled": "38 Tons", "badge": "Soil Guardian"
-            },
-            {
-                "id": "farmer-3",
-                "rank": 3, "name": "Vikram Singh", "location": "UP",
-                "green_score": 820, "co2_saved": "9.1 Tons", "waste_recycled": "32 Tons", "badge": "Green Hero"
-            },
-            {
-                "id": "farmer-4",
-                "rank": 4, "name": "Amandeep Singh", "location": "Punjab",
-                "green_score": 750, "co2_saved": "8.0 Tons", "waste_recycled": "28 Tons", "badge": "Earth Saver"
-            },
-            {
-                "id": "farmer-5",
-                "rank": 5, "name": "Meera Reddy", "location": "Telangana",
-                "green_score": 710, "co2_saved": "7.5 Tons", "waste_recycled": "25 Tons", "badge": "Nature Friend"
-            },
-            {
-                "id": "farmer-6",
-                "rank": 6, "name": "Ramesh Patel", "location": "Gujarat",
-                "green_score": 680, "co2_saved": "6.8 Tons", "waste_recycled": "22 Tons", "badge": "Sustainability Star"
-            }
-        ],
-        "user_rank": {
-            "id": "current-user",
-            "rank": 142, "name": "You", "green_score": 320,
-            "co2_saved": "2.1 Tons", "waste_recycled": "8 Tons"
-        }
-    }
+    if offset < 0 or not 1 <= limit <= LEADERBOARD_MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"offset must be >= 0 and limit between 1 and {LEADERBOARD_MAX_PAGE_SIZE}."
+        )
+    leaderboard = leaderboard_service()
+    page = leaderboard.page_json(offset, limit, state)
+    user_rank = leaderboard.user_rank(user_id, state) if user_id else None
+    
+    with metrics.stage("serialize"):
+        tail = json.dumps({
+            "user_rank": user_rank,
+            "total": leaderboard.total(state),
+            "offset": offset,
+            "limit": limit
+        }, separators=(',', ':')).encode()
+        return Response(
+            content=b'{"leaderboard":' + page + b',' + tail[1:],
+            media_type="application/json"
+        )
+
+@app.put("/api/leaderboard/farmers/{farmer_id}")
+async def update_farmer_score(farmer_id: str, score: FarmerScore):
+    """
+    Record a farmer's Green Score and impact totals.
+    
+    Only the fields sent are changed; the rest of the record is kept.
+    Adds the farmer if unknown, which needs name, state and green_score.
+    Returns their row with the new overall rank.
+    503 when writes are disabled because worker processes do not share
+    scores (see app.leaderboard).
+    """
+    if not writes_enabled():
+        raise HTTPException(
+            status_code=503,
+            detail="Leaderboard writes are disabled: worker processes do not share scores."
+        )
+    leaderboard = leaderboard_service()
+    try:
+        leaderboard.merge(farmer_id, score.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return leaderboard.user_rank(farmer_id)
+
+@app.get("/api/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "model_version": "v1.0.2",
-        "waste_classifier": "active"
-    }
+    """
+    Liveness probe: the process is up and serving HTTP.
+    
+    Always 200 while the event loop is responsive; includes the classifier
+    load state for visibility.
+    """
+    return {"status": "alive", "classifier": model_state.to_dict()}
+
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness probe: the classifier is loaded and warmed up.
+    
+    Returns 503 until startup warmup completes (or if it failed), so the
+    load balancer only routes traffic to warm workers.
+    """
+    state = model_state.to_dict()
+    return JSONResponse(
+        status_code=200 if model_state.ready else 503,
+        content=state
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Request and per-stage latency histograms in Prometheus text format.
+    
+    Labeled by endpoint, classifier backend and stage (see app.metrics).
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,441 @@
+"""
+Batch matching of farmer listings to industrial buyers.
+
+Each listing (waste type, tons, pincode) can go to any buyer that uses its
+waste type, up to the buyer's monthly capacity. A ton sent from a listing
+to a buyer is worth the buyer's price minus the haul, charged exactly as
+pricing.transport_penalty charges it for /api/predict-price (first
+FREE_HAUL_KM free, then TRANSPORT_COST_PER_TON_KM per km, at most
+MAX_TRANSPORT_PENALTY of the price):
+
+    value per ton = price_per_ton - transport_penalty(price_per_ton, distance_km)
+
+and the engine looks for the assignment with the largest total value, a
+transportation (min-cost flow) problem. Three steps keep tens of thousands
+of listings fast:
+
+- Pooling: listings at the same location with the same waste type are
+  interchangeable. They become one supply node, split back afterwards.
+- Spatial prefilter: each supply node only gets edges to its
+  MATCH_CANDIDATES nearest buyers within MATCH_MAX_KM, found with the geo
+  KD-trees. Edges that would lose money, or that rank too low at their
+  buyer to ever be used, are dropped.
+- Solver: up to EXACT_SOLVER_MAX_EDGES edges, the flow is an exact sparse
+  linear program solved with HiGHS (scipy.optimize.linprog). Simplex time
+  climbs steeply beyond that, so larger problems use a vectorized forward
+  auction, within AUCTION_EPSILON per matched ton of the optimum. The
+  auction is slow in the opposite case, a few large supply nodes bidding
+  prices up in small steps, which the LP handles in milliseconds.
+
+With whole-ton listings and capacities, assignments are whole tons.
+
+Buyers only see their nearest candidates, so when those are all full a
+listing stays unmatched even if a farther buyer has room; raise
+MATCH_CANDIDATES for regions with few buyers.
+"""
+
+import logging
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .geo import Industry, IndustryIndex, PincodeDirectory
+from .pricing import base_prices, transport_penalty
+
+logger = logging.getLogger(__name__)
+
+# Buyers considered per listing location, nearest first
+MATCH_CANDIDATES = int(os.environ.get('MATCH_CANDIDATES', '8'))
+
+# Buyers farther than this are never considered
+MATCH_MAX_KM = float(os.environ.get('MATCH_MAX_KM', '300'))
+
+# Larger problems use the auction instead of the exact LP
+EXACT_SOLVER_MAX_EDGES = 15000
+
+# Rs per ton: the auction's price step, and its distance from the optimum
+AUCTION_EPSILON = 1.0
+
+# Assignments smaller than this (tons) are round-off
+MIN_ASSIGNMENT_TONS = 1e-6
+
+
+def match_listings(
+    waste_types: Sequence[str],
+    quantities: Sequence[float],
+    pincodes: Sequence[str],
+    index: IndustryIndex,
+    directory: PincodeDirectory,
+    buyer_prices: Optional[Sequence[Optional[float]]] = None,
+    candidates: int = MATCH_CANDIDATES,
+    max_km: float = MATCH_MAX_KM
+) -> Dict[str, np.ndarray]:
+    """
+    Assign listings to buyers, maximizing price minus transport cost.
+
+    Args:
+        waste_types: Waste type of each listing
+        quantities: Tons in each listing
+        pincodes: Location pincode of each listing
+        index: Buyers (``capacity_tons_per_month`` is their capacity)
+        directory: Locates listing pincodes
+        buyer_prices: Price per ton offered by each buyer of ``index``, None
+                      or NaN where the buyer pays the rule-based base price
+                      of the waste type
+        candidates: Buyers considered per listing location
+        max_km: Largest listing-to-buyer distance considered
+
+    Returns:
+        Column name -> array. One row per assignment: listing, buyer (index
+        into ``index.industries``), quantity, distance_km, price_per_ton,
+        transport_cost_per_ton. Plus matched_quantity (one value per
+        listing) and buyer_assigned (one value per buyer).
+
+    Raises:
+        ValueError: If a quantity or capacity is negative or not finite, or
+                    an offered price is infinite
+    """
+    start = time.perf_counter()
+    quantity = np.asarray(quantities, dtype=np.float64)
+    num_buyers = len(index.industries)
+    capacity = np.array([i.capacity_tons_per_month for i in index.industries], dtype=np.float64)
+    offers = np.full(num_buyers, np.nan)
+    if buyer_prices is not None:
+        offers[:] = np.array(buyer_prices, dtype=np.float64)  # None -> NaN
+
+    # Pooling sums quantities, so one bad listing would corrupt its neighbours
+    bad = np.flatnonzero(~(quantity >= 0) | np.isinf(quantity))
+    if len(bad):
+        raise ValueError(f"Listing {bad[0]} has quantity {quantity[bad[0]]}; quantities must be finite and >= 0")
+    bad = np.flatnonzero(~(capacity >= 0) | np.isinf(capacity))
+    if len(bad):
+        raise ValueError(
+            f"Buyer {index.industries[bad[0]].id} has capacity {capacity[bad[0]]}; "
+            f"capacities must be finite and >= 0"
+        )
+    bad = np.flatnonzero(np.isinf(offers))
+    if len(bad):
+        raise ValueError(f"Buyer {index.industries[bad[0]].id} offers an infinite price")
+
+    # Pool listings by (location, waste type); pincodes that resolve to the
+    # same prefix centroid share a location
+    located = {p: directory.locate(p) for p in set(pincodes)}
+    groups: Dict[tuple, int] = {}
+    group_of = np.fromiter(
+        (groups.setdefault((located[p], t), len(groups)) for p, t in zip(pincodes, waste_types)),
+        dtype=np.intp,
+        count=len(quantity)
+    )
+    supply = np.bincount(group_of, weights=quantity, minlength=len(groups))
+    group_points = [point for point, _ in groups]
+    group_types = np.array([t for _, t in groups], dtype=str)
+    group_base_price = base_prices(group_types) if len(groups) else np.zeros(0)
+
+    # Spatial prefilter: candidate edges from each located group, per waste type
+    edge_group, edge_buyer, edge_km = [], [], []
+    for waste_type in np.unique(group_types):
+        members = np.array([
+            g for g in np.flatnonzero(group_types == waste_type) if group_points[g] is not None
+        ], dtype=np.intp)
+        if not len(members):
+            continue
+        points = np.array([group_points[g] for g in members])
+        km, buyer = index.nearest_many(points[:, 0], points[:, 1], waste_type, candidates, max_km)
+        found = buyer >= 0
+        edge_group.append(np.broadcast_to(members[:, None], buyer.shape)[found])
+        edge_buyer.append(buyer[found])
+        edge_km.append(km[found])
+    edge_group = np.concatenate(edge_group) if edge_group else np.zeros(0, dtype=np.intp)
+    edge_buyer = np.concatenate(edge_buyer) if edge_buyer else np.zeros(0, dtype=np.intp)
+    edge_km = np.concatenate(edge_km) if edge_km else np.zeros(0)
+
+    edge_price = np.where(np.isnan(offers[edge_buyer]), group_base_price[edge_group], offers[edge_buyer])
+    edge_cost = transport_penalty(edge_price, edge_km)
+    keep = (edge_price - edge_cost > 0) & (supply[edge_group] > 0) & (capacity[edge_buyer] > 0)
+    edge_group, edge_buyer, edge_km = edge_group[keep], edge_buyer[keep], edge_km[keep]
+    edge_price, edge_cost = edge_price[keep], edge_cost[keep]
+
+    keep = _prune_outbid_edges(edge_group, edge_buyer, edge_price - edge_cost, supply, capacity.sum())
+    edge_group, edge_buyer, edge_km = edge_group[keep], edge_buyer[keep], edge_km[keep]
+    edge_price, edge_cost = edge_price[keep], edge_cost[keep]
+
+    solve = _solve_transportation if len(edge_group) <= EXACT_SOLVER_MAX_EDGES else _auction
+    flow = solve(edge_group, edge_buyer, edge_price - edge_cost, supply, capacity)
+    listing, edge, tons = _split_pooled_flow(group_of, quantity, edge_group, flow)
+
+    logger.info(
+        f"Matched {tons.sum():.1f} of {quantity.sum():.1f} tons from {len(quantity)} listings "
+        f"({len(groups)} supply nodes, {len(flow)} candidate edges) to {num_buyers} buyers "
+        f"in {time.perf_counter() - start:.3f}s"
+    )
+    return {
+        "listing": listing,
+        "buyer": edge_buyer[edge],
+        "quantity": tons,
+        "distance_km": edge_km[edge],
+        "price_per_ton": edge_price[edge],
+        "transport_cost_per_ton": edge_cost[edge],
+        "matched_quantity": np.bincount(listing, weights=tons, minlength=len(quantity)),
+        "buyer_assigned": np.bincount(edge_buyer[edge], weights=tons, minlength=num_buyers),
+    }
+
+
+def _sum_before(values: np.ndarray, keys: np.ndarray, num_keys: int) -> np.ndarray:
+    """Sum of the values before each position within its run of equal keys (keys sorted)."""
+    cumulative = np.cumsum(values)
+    run_start = np.searchsorted(keys, np.arange(num_keys), side="left")
+    return cumulative - values - np.concatenate([[0.0], cumulative])[run_start][keys]
+
+
+def _prune_outbid_edges(
+    edge_group: np.ndarray,
+    edge_buyer: np.ndarray,
+    edge_value: np.ndarray,
+    supply: np.ndarray,
+    total_capacity: float
+) -> np.ndarray:
+    """
+    Mask of the edges an optimal assignment may use.
+
+    If a buyer takes tons over an edge while a more valuable edge into the
+    same buyer comes from a group with tons left, moving them to the better
+    edge gains value. So a buyer only uses an edge once every better edge's
+    group has sold out, and all groups together cannot sell more than the
+    total capacity. Edges ranked below that much supply at their buyer
+    are dropped. When supply far exceeds demand, this removes most edges.
+    """
+    order = np.lexsort((-edge_value, edge_buyer))
+    better_supply = _sum_before(supply[edge_group[order]], edge_buyer[order], int(edge_buyer.max(initial=-1)) + 1)
+    keep = np.empty(len(order), dtype=bool)
+    keep[order] = better_supply <= total_capacity
+    return keep
+
+
+def _solve_transportation(
+    edge_group: np.ndarray,
+    edge_buyer: np.ndarray,
+    edge_value: np.ndarray,
+    supply: np.ndarray,
+    capacity: np.ndarray
+) -> np.ndarray:
+    """Tons on each edge maximizing total value, within supply and capacity (exact)."""
+    num_edges = len(edge_value)
+    if not num_edges:
+        return np.zeros(0)
+    from scipy.optimize import linprog
+    from scipy.sparse import csr_matrix
+
+    # One row per supply node, then one per buyer; each edge is in two rows
+    rows = np.concatenate([edge_group, len(supply) + edge_buyer])
+    columns = np.tile(np.arange(num_edges), 2)
+    constraints = csr_matrix(
+        (np.ones(2 * num_edges), (rows, columns)),
+        shape=(len(supply) + len(capacity), num_edges)
+    )
+    result = linprog(
+        -edge_value,
+        A_ub=constraints,
+        b_ub=np.concatenate([supply, capacity]),
+        bounds=(0, None),
+        method="highs"
+    )
+    if result.status != 0:
+        raise RuntimeError(f"Matching solver failed: {result.message}")
+    return np.maximum(result.x, 0.0)
+
+
+def _auction(
+    edge_group: np.ndarray,
+    edge_buyer: np.ndarray,
+    edge_value: np.ndarray,
+    supply: np.ndarray,
+    capacity: np.ndarray,
+    epsilon: float = AUCTION_EPSILON
+) -> np.ndarray:
+    """
+    Tons on each edge maximizing total value, within supply and capacity
+    (to within epsilon per ton).
+
+    Forward auction for the transportation problem, with every group
+    bidding at once. Each group with unsold tons bids them all on its best
+    buyer (value minus the buyer's price), raising the price by its margin
+    over the second-best option plus epsilon; not selling is an option
+    worth 0. A buyer keeps the highest bids up to its capacity and rejects
+    the rest, and once full its price is its lowest kept bid. Every
+    accepted ton ends within epsilon of its best choice at the final
+    prices, so the total value is within epsilon per matched ton of the
+    optimum.
+
+    Bids are vectorized across groups. Each round only re-ranks the held
+    bids of buyers that received new bids: near the end, a handful of
+    groups are still trading places and most buyers are settled.
+    """
+    num_buyers, num_edges = len(capacity), len(edge_value)
+    flow = np.zeros(num_edges)
+    if not num_edges:
+        return flow
+
+    # Groups with edges ("slots"), each owning a contiguous run of edges
+    order = np.argsort(edge_group, kind="stable")
+    buyers, values = edge_buyer[order], edge_value[order]
+    starts = np.flatnonzero(np.r_[True, edge_group[order][1:] != edge_group[order][:-1]])
+    sizes = np.diff(np.r_[starts, num_edges])
+    unsold = supply[edge_group[order][starts]].astype(np.float64)
+    price = np.zeros(num_buyers)
+
+    # Buyers never overlap in the sort key: bids are in (0, spacing)
+    spacing = float(values.max()) + 2 * epsilon + 1.0
+
+    held_slot = np.zeros(0, dtype=np.intp)
+    held_edge = np.zeros(0, dtype=np.intp)
+    held_tons = np.zeros(0)
+    held_price = np.zeros(0)
+
+    active = np.flatnonzero(unsold > MIN_ASSIGNMENT_TONS)
+    while len(active):
+        # Edges of the active slots, slot by slot
+        counts = sizes[active]
+        offsets = np.cumsum(counts) - counts
+        edges = np.repeat(starts[active] - offsets, counts) + np.arange(counts.sum())
+        net = values[edges] - price[buyers[edges]]
+        best = np.maximum.reduceat(net, offsets)
+        local = np.repeat(np.arange(len(active)), counts)
+        is_best = net == best[local]
+        best_at = np.full(len(active), len(edges))
+        np.minimum.at(best_at, local[is_best], np.flatnonzero(is_best))
+        net[best_at] = -np.inf
+        second = np.maximum(np.maximum.reduceat(net, offsets), 0.0)
+
+        # Groups no buyer is worth selling to drop out: prices only rise
+        bidding = best > 0
+        unsold[active[~bidding]] = 0.0
+        if not bidding.any():
+            break
+        slots = active[bidding]
+        bid_edges = edges[best_at[bidding]]
+
+        # Only buyers with new bids change; the rest keep their bids
+        bid_buyers = np.zeros(num_buyers, dtype=bool)
+        bid_buyers[buyers[bid_edges]] = True
+        in_play = bid_buyers[buyers[held_edge]]
+        slot = np.concatenate([held_slot[in_play], slots])
+        edge = np.concatenate([held_edge[in_play], bid_edges])
+        tons = np.concatenate([held_tons[in_play], unsold[slots]])
+        bid = np.concatenate([held_price[in_play], values[bid_edges] - second[bidding] + epsilon])
+        unsold[slots] = 0.0
+
+        # Highest bids first per buyer; on equal bids the earlier one wins
+        ranked = np.argsort(buyers[edge] * spacing - bid, kind="stable")
+        slot, edge, tons, bid = slot[ranked], edge[ranked], tons[ranked], bid[ranked]
+        buyer = buyers[edge]
+        kept = np.clip(capacity[buyer] - _sum_before(tons, buyer, num_buyers), 0.0, tons)
+        rejected = tons - kept
+        returned = rejected > MIN_ASSIGNMENT_TONS
+        np.add.at(unsold, slot[returned], rejected[returned])
+
+        keep = kept > MIN_ASSIGNMENT_TONS
+        held_slot = np.concatenate([held_slot[~in_play], slot[keep]])
+        held_edge = np.concatenate([held_edge[~in_play], edge[keep]])
+        held_tons = np.concatenate([held_tons[~in_play], kept[keep]])
+        held_price = np.concatenate([held_price[~in_play], bid[keep]])
+        # Full buyers charge their lowest held bid; others are free
+        total = np.bincount(buyer[keep], weights=kept[keep], minlength=num_buyers)
+        lowest = np.full(num_buyers, np.inf)
+        np.minimum.at(lowest, buyer[keep], bid[keep])
+        price[bid_buyers] = np.where(total >= capacity - MIN_ASSIGNMENT_TONS, lowest, 0.0)[bid_buyers]
+        active = np.unique(slot[returned])
+
+    np.add.at(flow, order[held_edge], held_tons)
+    return flow
+
+
+def _split_pooled_flow(
+    group_of: np.ndarray,
+    quantity: np.ndarray,
+    edge_group: np.ndarray,
+    flow: np.ndarray
+):
+    """
+    Split each pooled supply node's edge flows back onto its listings.
+
+    Listings of a group and the group's edge flows are laid end to end on
+    the same axis (groups in order, listings in input order); every
+    overlap between a listing's interval and an edge's interval is one
+    assignment.
+
+    Returns:
+        (listing, edge, tons) arrays, one entry per assignment
+    """
+    used = flow > MIN_ASSIGNMENT_TONS
+    edges = np.flatnonzero(used)
+    if not len(edges):
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+
+    order = np.argsort(group_of, kind="stable")
+    listing_end = np.cumsum(quantity[order])
+    listing_start = listing_end - quantity[order]
+    num_groups = int(group_of.max()) + 1
+    group_start = np.concatenate([[0.0], np.cumsum(np.bincount(group_of, weights=quantity, minlength=num_groups))[:-1]])
+
+    edges = edges[np.argsort(edge_group[edges], kind="stable")]
+    edge_groups = edge_group[edges]
+    cumulative = np.cumsum(flow[edges])
+    # Flow of the group's earlier edges, so each group restarts at its own start
+    first = np.searchsorted(edge_groups, edge_groups, side="left")
+    edge_end = group_start[edge_groups] + cumulative - (cumulative[first] - flow[edges][first])
+    edge_start = edge_end - flow[edges]
+
+    bounds = np.unique(np.concatenate([listing_start, listing_end, edge_start, edge_end]))
+    lengths = np.diff(bounds)
+    middle = bounds[:-1] + lengths / 2
+    which_listing = np.minimum(np.searchsorted(listing_end, middle, side="right"), len(order) - 1)
+    which_edge = np.minimum(np.searchsorted(edge_end, middle, side="right"), len(edges) - 1)
+    inside = (
+        (edge_start[which_edge] <= middle) & (middle < edge_end[which_edge])
+        & (edge_groups[which_edge] == group_of[order[which_listing]])
+        & (lengths > MIN_ASSIGNMENT_TONS)
+    )
+    return order[which_listing[inside]], edges[which_edge[inside]], lengths[inside]
+
+
+def buyers_from_demands(
+    demands: Sequence[Dict],
+    directory: PincodeDirectory
+) -> IndustryIndex:
+    """
+    Build a buyer index from demands posted with a matching request.
+
+    Each demand has id, name, industry, location_pincode and capacity_tons,
+    and optionally accepts (waste types). Without accepts, the waste types
+    are those ReuseSuggestions lists the industry as a use for.
+
+    Raises:
+        ValueError: If a demand's pincode cannot be located or it accepts
+                    no waste type
+    """
+    from .reuse_suggestions import ReuseSuggestions
+
+    industries = []
+    for demand in demands:
+        point = directory.locate(demand["location_pincode"])
+        if point is None:
+            raise ValueError(f"Unknown pincode for buyer {demand['id']}: {demand['location_pincode']}")
+        accepts = demand.get("accepts") or ReuseSuggestions.get_waste_types_for_industry(demand["industry"])
+        if not accepts:
+            raise ValueError(
+                f"Buyer {demand['id']} accepts no waste type. Pass accepts, or an industry from: "
+                f"{', '.join(ReuseSuggestions.get_all_industries())}"
+            )
+        industries.append(Industry(
+            id=demand["id"],
+            name=demand.get("name") or demand["id"],
+            industry=demand["industry"],
+            pincode=demand["location_pincode"],
+            latitude=point[0],
+            longitude=point[1],
+            accepts=tuple(accepts),
+            capacity_tons_per_month=float(demand["capacity_tons"])
+        ))
+    return IndustryIndex(industries)
@@ -0,0 +1,220 @@
+"""
+Per-stage request latency metrics in Prometheus text format.
+
+The ASGI middleware gives every request a ``RequestTimings`` in a context
+variable. Hot-path code times its work with ``stage()``:
+
+    with stage("decode"):
+        img.load()
+
+Stage times are summed per request. When the response has been sent they
+are observed in one histogram labeled by endpoint (the route template),
+classifier backend and stage:
+
+    multipart_parse   receiving and parsing the form, up to the endpoint
+    file_read         reading the upload out of the parsed form
+    decode            PIL decode (JPEG at reduced scale) and orientation
+    resize            resize to the model input size
+    inference         model forward pass (including micro-batch wait)
+    serialize         JSON encoding of the response
+
+Outside a request, ``stage()`` costs a context variable lookup. Inside one,
+it costs two perf_counter calls and a list append; the histogram lock is
+taken once per stage per request. That is cheap enough to leave on in
+production. Set METRICS_ENABLED=0 to turn it off completely.
+
+Histograms live in the process, so each pre-forked worker (app.server)
+exposes its own counts; scrape every worker or aggregate in Prometheus.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from sub-millisecond stages up to slow cold-model requests
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed label set."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        """Record one observation for the given label values."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        """Exposition lines for every series."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for label_values, counts, total in sorted(snapshot):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values)
+            )
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+REQUEST_DURATION = Histogram(
+    "stubblex_request_duration_seconds",
+    "Time from request start until the response body was sent.",
+    ("endpoint", "method", "status")
+)
+
+STAGE_DURATION = Histogram(
+    "stubblex_stage_duration_seconds",
+    "Time spent in each request processing stage, summed per request.",
+    ("endpoint", "backend", "stage")
+)
+
+
+class RequestTimings:
+    """Stage timings collected while one request is handled."""
+
+    __slots__ = ("start", "backend", "stages")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.backend = "none"
+        # (stage, seconds); list.append is atomic, so worker threads the
+        # request fans out to can record into the same list
+        self.stages: List[Tuple[str, float]] = []
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per stage, summed over repeated stages."""
+        totals: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as a stage of the current request, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.stages.append((name, time.perf_counter() - start))
+
+
+def mark_since_start(name: str):
+    """
+    Record the time since the request started as a stage.
+
+    Called first thing in an endpoint, this captures what the framework did
+    before it (receiving the body and parsing the multipart form).
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.stages.append((name, time.perf_counter() - timings.start))
+
+
+def set_backend(backend: str):
+    """Label the current request's stages with the classifier backend."""
+    timings = _current.get()
+    if timings is not None:
+        timings.backend = backend
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    return "\n".join(REQUEST_DURATION.render() + STAGE_DURATION.render()) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times each HTTP request and its stages.
+
+    Written as plain ASGI rather than BaseHTTPMiddleware so streaming
+    responses are timed until their last chunk and the request runs in the
+    same context as the endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_DURATION.observe(
+                time.perf_counter() - timings.start, endpoint, scope["method"], status
+            )
+            for name, seconds in timings.totals().items():
+                STAGE_DURATION.observe(seconds, endpoint, timings.backend, name)
@@ -0,0 +1,205 @@
+"""
+Pack an image directory into sharded, memory-mappable arrays.
+
+Training on thousands of small JPEGs pays a file open and a decode per image
+per epoch, which dominates on network storage. Packing decodes and resizes
+every image once and writes them as a few large uint8 ``.npy`` shards that
+training reads with zero-copy slices of a memory map:
+
+    <output>/index.json          class labels, image size, shard list
+    <output>/labels.npy          int16 label of every sample, in pack order
+    <output>/images-00000.npy    uint8 (count, 224, 224, 3)
+    ...
+
+Samples are shuffled once before packing so every shard mixes all classes.
+
+Usage (from the backend directory):
+    python -m app.pack_dataset --input data/train --output data/packed/train
+    python -m app.train_model --train-dir data/packed/train --val-dir data/packed/val \\
+        --input-pipeline tfdata
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .image_io import decode_image
+except ImportError:
+    # Imported from a script run inside app/ (python train_model.py);
+    # image_io imports relatively, so load it through the app package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.image_io import decode_image
+
+FORMAT = "stubblex-packed-v1"
+INDEX_FILE = "index.json"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+
+def is_packed(directory: str) -> bool:
+    """Whether a directory holds a packed dataset."""
+    return os.path.exists(os.path.join(directory, INDEX_FILE))
+
+
+def list_class_images(directory: str, class_labels: Sequence[str]) -> List[Tuple[str, int]]:
+    """List (path, label index) pairs for a directory organized by class."""
+    samples = []
+    for label_idx, class_label in enumerate(class_labels):
+        class_dir = os.path.join(directory, class_label)
+        if not os.path.isdir(class_dir):
+            continue
+        for fname in sorted(os.listdir(class_dir)):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(class_dir, fname), label_idx))
+    return samples
+
+
+def _load(path: str, image_size: Tuple[int, int]) -> np.ndarray:
+    with open(path, 'rb') as f:
+        return np.asarray(decode_image(f.read(), image_size), dtype=np.uint8)
+
+
+def pack_directory(
+    input_dir: str,
+    output_dir: str,
+    class_labels: Sequence[str],
+    image_size: Tuple[int, int] = (224, 224),
+    shard_size: int = 1024,
+    workers: Optional[int] = None,
+    seed: int = 0
+) -> dict:
+    """
+    Decode, resize and pack a class-per-subdirectory image tree.
+
+    Args:
+        input_dir: Directory with one subdirectory per class
+        output_dir: Directory to write the packed dataset into
+        class_labels: Class names, in model output order
+        image_size: (width, height) every image is resized to
+        shard_size: Images per shard file
+        workers: Decode threads (default: CPU count)
+        seed: Seed of the one-off shuffle
+
+    Returns:
+        The index written to index.json
+    """
+    samples = list_class_images(input_dir, class_labels)
+    if not samples:
+        raise ValueError(f"No images found in {input_dir}")
+    order = np.random.default_rng(seed).permutation(len(samples))
+    samples = [samples[i] for i in order]
+
+    os.makedirs(output_dir, exist_ok=True)
+    width, height = image_size
+    shards = []
+    start = time.perf_counter()
+
+    # PIL releases the GIL while decoding, so threads decode in parallel
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for shard_idx, offset in enumerate(range(0, len(samples), shard_size)):
+            chunk = samples[offset:offset + shard_size]
+            filename = f"images-{shard_idx:05d}.npy"
+            images = np.lib.format.open_memmap(
+                os.path.join(output_dir, filename), mode='w+',
+                dtype=np.uint8, shape=(len(chunk), height, width, 3)
+            )
+            for i, image in enumerate(pool.map(lambda s: _load(s[0], image_size), chunk)):
+                images[i] = image
+            images.flush()
+            del images
+            shards.append({"images": filename, "count": len(chunk)})
+            print(f"  {filename}: {len(chunk)} images")
+
+    labels = np.array([label for _, label in samples], dtype=np.int16)
+    np.save(os.path.join(output_dir, "labels.npy"), labels)
+
+    index = {
+        "format": FORMAT,
+        "class_labels": list(class_labels),
+        "image_size": [width, height],
+        "num_samples": len(samples),
+        "labels": "labels.npy",
+        "shards": shards,
+    }
+    # Written last, so a partial pack is never mistaken for a complete one
+    with open(os.path.join(output_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    elapsed = time.perf_counter() - start
+    print(f"Packed {len(samples)} images into {len(shards)} shards in {elapsed:.1f}s")
+    return index
+
+
+class PackedDataset:
+    """Read-only view of a packed dataset; shards are memory-mapped on demand."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        if self.index.get("format") != FORMAT:
+            raise ValueError(f"Unsupported packed dataset format in {directory}")
+        self.directory = directory
+        self.class_labels: List[str] = self.index["class_labels"]
+        self.labels = np.load(os.path.join(directory, self.index["labels"]), mmap_mode='r')
+        counts = [shard["count"] for shard in self.index["shards"]]
+        # First sample index of each shard
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._shards = [None] * len(counts)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def num_shards(self) -> int:
+        return len(self._shards)
+
+    def shard(self, shard_idx: int) -> np.ndarray:
+        """Images of one shard as a read-only memory map (no data is read yet)."""
+        if self._shards[shard_idx] is None:
+            path = os.path.join(self.directory, self.index["shards"][shard_idx]["images"])
+            self._shards[shard_idx] = np.load(path, mmap_mode='r')
+        return self._shards[shard_idx]
+
+    def shard_labels(self, shard_idx: int) -> np.ndarray:
+        return self.labels[self.offsets[shard_idx]:self.offsets[shard_idx + 1]]
+
+    def take(self, indices: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Copy out the images and labels at global sample indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_ids = np.searchsorted(self.offsets, indices, side='right') - 1
+        images = np.stack([
+            self.shard(s)[i - self.offsets[s]] for s, i in zip(shard_ids, indices)
+        ])
+        return images, np.asarray(self.labels[indices])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .waste_classifier import WasteClassifier
+
+    parser = argparse.ArgumentParser(
+        description="Pack a class-per-subdirectory image tree into memory-mappable shards"
+    )
+    parser.add_argument('--input', type=str, required=True, help='Image directory (e.g. data/train)')
+    parser.add_argument('--output', type=str, required=True, help='Output directory')
+    parser.add_argument('--shard-size', type=int, default=1024, help='Images per shard')
+    parser.add_argument('--image-size', type=int, default=224, help='Square side images are resized to')
+    parser.add_argument('--workers', type=int, help='Decode threads (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the pack-time shuffle')
+    args = parser.parse_args()
+
+    pack_directory(
+        args.input,
+        args.output,
+        WasteClassifier.CLASS_LABELS,
+        image_size=(args.image_size, args.image_size),
+        shard_size=args.shard_size,
+        workers=args.workers,
+        seed=args.seed
+    )
@@ -0,0 +1,100 @@
+"""
+Shared post-processing for classifier outputs.
+
+A classifier produces one probability vector per image. Everything the API
+returns (argmax, top-k, full distribution, reuse suggestions) is derived from
+that single vector, so one upload costs one forward pass regardless of which
+endpoint asked for it.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .reuse_suggestions import ReuseSuggestions
+
+
+def top_k_indices(probabilities: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest probabilities, highest first.
+
+    Uses partial selection (O(n)) and only sorts the k selected entries.
+    Ties resolve to the lower index, matching np.argmax. k above the
+    number of classes returns them all.
+
+    Raises:
+        ValueError: If k is less than 1
+    """
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    n = probabilities.shape[-1]
+    k = min(k, n)
+    if k == n:
+        candidates = np.arange(n)
+    else:
+        threshold = np.partition(probabilities, n - k)[n - k]
+        above = np.flatnonzero(probabilities > threshold)
+        tied = np.flatnonzero(probabilities == threshold)[:k - len(above)]
+        candidates = np.sort(np.concatenate([above, tied]))
+    order = np.argsort(-probabilities[candidates], kind='stable')
+    return candidates[order]
+
+
+def summarize(labels: Sequence[str], probabilities: np.ndarray, k: int = 3) -> Dict:
+    """
+    Derive argmax, top-k and the labelled distribution from one vector.
+
+    Args:
+        labels: Class labels in model output order
+        probabilities: Class probabilities for a single image
+        k: Number of top predictions to keep
+
+    Returns:
+        Dictionary containing:
+            - predicted_class: Most likely waste type
+            - confidence: Its probability
+            - all_predictions: Probability for every class
+            - top_k: List of (waste type, probability) pairs, highest first
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    top = top_k_indices(probabilities, k)
+
+    return {
+        "predicted_class": labels[top[0]],
+        "confidence": float(probabilities[top[0]]),
+        "all_predictions": {
+            label: float(score) for label, score in zip(labels, probabilities)
+        },
+        "top_k": [(labels[idx], float(probabilities[idx])) for idx in top],
+    }
+
+
+def top_k_with_suggestions(summary: Dict) -> List[Dict]:
+    """Format a summary's top-k as the /api/classify-waste-top-k payload."""
+    results = []
+    for waste_type, confidence in summary["top_k"]:
+        reuse_data = ReuseSuggestions.get_suggestions(waste_type)
+        results.append({
+            "predicted_class": waste_type,
+            "display_name": reuse_data["display_name"],
+            "confidence": confidence,
+            "price_range": reuse_data["price_range"]
+        })
+    return results
+
+
+def with_suggestions(summary: Dict) -> Dict:
+    """Format a summary as the /api/classify-waste payload."""
+    predicted_class = summary["predicted_class"]
+    reuse_data = ReuseSuggestions.get_suggestions(predicted_class)
+
+    return {
+        "predicted_class": predicted_class,
+        "display_name": reuse_data["display_name"],
+        "confidence": summary["confidence"],
+        "all_predictions": summary["all_predictions"],
+        "top_predictions": top_k_with_suggestions(summary),
+        "industrial_uses": reuse_data["industrial_uses"],
+        "environmental_benefits": reuse_data["environmental_benefits"],
+        "price_range": reuse_data["price_range"]
+    }
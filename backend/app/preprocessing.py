@@ -0,0 +1,12 @@
+"""
+Model input scaling shared by training and serving.
+
+Kept free of TensorFlow and package-relative imports so the training
+scripts can import it when run directly, and the API without loading
+TensorFlow.
+"""
+
+
+def preprocess_input(img_array):
+    """MobileNetV2 input scaling: pixels [0, 255] -> [-1, 1]."""
+    return img_array / 127.5 - 1.0
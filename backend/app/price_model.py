@@ -0,0 +1,322 @@
+"""
+Trained price model, compiled for fast batch scoring.
+
+app.train_price_model fits scikit-learn gradient-boosted trees: one for the
+expected price per ton and two quantile models for an 80% interval. Calling
+sklearn's predict would cost milliseconds per call in input validation and
+thread dispatch, so the training script compiles all three models into
+flat arrays of perfect binary trees instead. Scoring is then a NumPy walk
+down every tree at once, a few gathers per tree level. sklearn is not
+needed at serving time.
+
+Features:
+
+    waste_type        index into the training vocabulary (unknown -> missing)
+    quantity          tons
+    region            first two pincode digits, the postal region
+                      (regions unseen in training -> missing)
+    moisture_content  percent (missing when not reported)
+
+Categorical encodings are precompiled into lookup arrays. Pincodes are
+parsed without a Python loop by viewing the strings as code points.
+"""
+
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("waste_type", "quantity", "region", "moisture_content")
+
+# Model outputs, in column order
+OUTPUTS = ("price", "lower", "upper")
+
+NUM_REGIONS = 100
+
+# Confidence multiplier for lots with a waste type or region unseen in training
+UNSEEN_CATEGORY_CONFIDENCE = 0.5
+
+
+def parse_regions(pincodes: Sequence[str]) -> np.ndarray:
+    """
+    Postal region (first two digits) of each pincode, -1 when malformed.
+
+    Viewing a fixed-width unicode array as uint32 gives every character's
+    code point, so the digits are checked and combined with array math.
+    """
+    digits = np.asarray(pincodes, dtype='U6').view(np.uint32).reshape(-1, 6).astype(np.int64) - ord('0')
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1) & (digits[:, 0] > 0)
+    return np.where(valid, digits[:, 0] * 10 + digits[:, 1], -1)
+
+
+class CompiledForest:
+    """
+    Several boosted tree ensembles flattened into perfect binary trees.
+
+    Every tree is padded to the full depth: a leaf above the bottom level
+    becomes a chain of always-left splits ending in its value. Children are
+    then found by arithmetic (2i+1, 2i+2) rather than lookups, and every
+    sample takes exactly ``depth`` steps. Missing values are routed by
+    comparing against a copy of the features with NaN replaced by -inf
+    (missing goes left) or +inf (missing goes right), selected per split
+    through its column index.
+    """
+
+    def __init__(
+        self,
+        split_column: np.ndarray,
+        split_threshold: np.ndarray,
+        leaf_value: np.ndarray,
+        tree_output: np.ndarray,
+        baselines: np.ndarray,
+        depth: int,
+        num_features: int
+    ):
+        self.split_column = split_column
+        self.split_threshold = split_threshold
+        self.leaf_value = leaf_value
+        self.tree_output = tree_output
+        self.baselines = baselines
+        self.depth = depth
+        self.num_features = num_features
+        self.num_trees = len(tree_output)
+        splits_per_tree = 2 ** depth - 1
+        tree_base = np.arange(self.num_trees, dtype=np.intp) * splits_per_tree
+        # Nodes are tracked as global split indices: the child of global
+        # node g = base + i is base + 2i + 1 (+1 for right) = 2g + 1 - base
+        self._roots = tree_base
+        self._child_offset = 1 - tree_base
+        # Global index past the last split level -> index into leaf_value
+        self._leaf_offset = np.arange(self.num_trees, dtype=np.intp) * (2 ** depth) - tree_base - splits_per_tree
+        # (num_trees, num_outputs) 0/1 matrix summing leaves per output
+        self._output_matrix = np.zeros((self.num_trees, len(baselines)))
+        self._output_matrix[np.arange(self.num_trees), tree_output] = 1.0
+
+    @classmethod
+    def from_sklearn(cls, models: Sequence, num_features: int) -> "CompiledForest":
+        """Compile fitted HistGradientBoostingRegressors (numeric features only)."""
+        trees = [
+            (output, predictors[0].nodes)
+            for output, model in enumerate(models)
+            for predictors in model._predictors
+        ]
+        depth = max(int(nodes['depth'].max()) for _, nodes in trees)
+        num_splits, num_leaves = 2 ** depth - 1, 2 ** depth
+
+        split_column = np.zeros((len(trees), num_splits), dtype=np.int64)
+        split_threshold = np.full((len(trees), num_splits), np.inf)
+        leaf_value = np.zeros((len(trees), num_leaves))
+
+        for t, (_, nodes) in enumerate(trees):
+            if nodes['is_categorical'].any():
+                raise ValueError("Categorical splits are not supported by the compiled forest")
+            stack = [(0, 0)]  # (sklearn node, perfect-tree position)
+            while stack:
+                src, dst = stack.pop()
+                node = nodes[src]
+                if dst >= num_splits:
+                    leaf_value[t, dst - num_splits] = node['value']
+                elif node['is_leaf']:
+                    # Padding split: threshold +inf always goes left
+                    stack.append((src, 2 * dst + 1))
+                else:
+                    missing_right = not node['missing_go_to_left']
+                    split_column[t, dst] = node['feature_idx'] + num_features * missing_right
+                    split_threshold[t, dst] = node['num_threshold']
+                    stack.append((int(node['left']), 2 * dst + 1))
+                    stack.append((int(node['right']), 2 * dst + 2))
+
+        return cls(
+            split_column=split_column.ravel().astype(np.intp),
+            split_threshold=split_threshold.ravel(),
+            leaf_value=leaf_value.ravel(),
+            tree_output=np.array([output for output, _ in trees], dtype=np.int64),
+            baselines=np.array([float(np.ravel(m._baseline_prediction)[0]) for m in models]),
+            depth=depth,
+            num_features=num_features
+        )
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Raw predictions of every ensemble.
+
+        Args:
+            X: Float features of shape (N, num_features), NaN for missing
+
+        Returns:
+            Array of shape (N, num_outputs)
+        """
+        missing = np.isnan(X)
+        routed = np.concatenate(
+            [np.where(missing, -np.inf, X), np.where(missing, np.inf, X)], axis=1
+        ).ravel()
+        row_base = (np.arange(len(X), dtype=np.intp) * 2 * self.num_features)[:, None]
+
+        # Preallocated buffers: each level is a handful of in-place ops
+        shape = (len(X), self.num_trees)
+        node = np.broadcast_to(self._roots, shape).copy()
+        column = np.empty(shape, dtype=np.intp)
+        x = np.empty(shape)
+        threshold = np.empty(shape)
+        go_right = np.empty(shape, dtype=bool)
+        for _ in range(self.depth):
+            np.take(self.split_column, node, out=column, mode='clip')
+            column += row_base
+            np.take(routed, column, out=x, mode='clip')
+            np.take(self.split_threshold, node, out=threshold, mode='clip')
+            np.greater(x, threshold, out=go_right)
+            node *= 2
+            node += self._child_offset
+            node += go_right
+        node += self._leaf_offset
+        return np.take(self.leaf_value, node) @ self._output_matrix + self.baselines
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "split_column": self.split_column,
+            "split_threshold": self.split_threshold,
+            "leaf_value": self.leaf_value,
+            "tree_output": self.tree_output,
+            "baselines": self.baselines,
+            "depth": np.array(self.depth),
+            "num_features": np.array(self.num_features),
+        }
+
+
+class PriceModel:
+    """Feature encoding plus the compiled forest."""
+
+    def __init__(self, forest: CompiledForest, waste_types: Sequence[str], regions: Sequence[int], metadata: Dict):
+        self.forest = forest
+        self.waste_types = list(waste_types)
+        self.metadata = metadata
+        self._waste_type_codes = {name: float(i) for i, name in enumerate(self.waste_types)}
+        # Region number -> feature value; NaN for regions unseen in training
+        self._region_table = np.full(NUM_REGIONS + 1, np.nan)
+        self._region_table[np.asarray(regions, dtype=np.int64)] = regions
+        self.version = metadata.get("version", "unknown")
+
+    def encode(
+        self,
+        waste_types: Sequence[str],
+        quantities: Sequence[float],
+        pincodes: Sequence[str],
+        moisture: Optional[Sequence[Optional[float]]] = None
+    ) -> np.ndarray:
+        """Feature matrix of shape (N, len(FEATURES))."""
+        n = len(quantities)
+        X = np.empty((n, len(FEATURES)))
+
+        # One dict lookup per lot; np.unique would sort the strings first
+        X[:, 0] = np.fromiter(
+            map(self._waste_type_codes.get, waste_types, itertools.repeat(np.nan, n)),
+            dtype=np.float64,
+            count=n
+        )
+        X[:, 1] = quantities
+        # -1 (malformed) indexes the table's trailing NaN
+        X[:, 2] = self._region_table[parse_regions(pincodes)]
+        if moisture is None:
+            X[:, 3] = np.nan
+        else:
+            X[:, 3] = np.array(moisture, dtype=np.float64)  # None -> NaN
+        return X
+
+    def predict(
+        self,
+        waste_types: Sequence[str],
+        quantities: Sequence[float],
+        pincodes: Sequence[str],
+        moisture: Optional[Sequence[Optional[float]]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Price per ton and confidence of every lot.
+
+        Confidence is one minus the relative half-width of the 80%
+        prediction interval: 1.0 for a perfectly certain price, 0.0 when the
+        interval is as wide as the price itself. It is scaled down for lots
+        whose waste type or region was not in the training data, whose
+        interval is not meaningful.
+
+        Returns:
+            price_per_ton, lower, upper and confidence_score arrays
+        """
+        X = self.encode(waste_types, quantities, pincodes, moisture)
+        raw = self.forest.predict(X)
+        price = np.maximum(raw[:, 0], 0.0)
+        lower = np.minimum(raw[:, 1], raw[:, 2])
+        upper = np.maximum(raw[:, 1], raw[:, 2])
+        half_width = (upper - lower) / 2
+        confidence = np.clip(1.0 - half_width / np.maximum(price, 1.0), 0.0, 1.0)
+        # The trees never saw these lots' waste type or region
+        unseen = np.isnan(X[:, 0]) | np.isnan(X[:, 2])
+        confidence[unseen] *= UNSEEN_CATEGORY_CONFIDENCE
+        return {
+            "price_per_ton": price,
+            "lower": lower,
+            "upper": upper,
+            "confidence_score": np.round(confidence, 3),
+        }
+
+    def save(self, path: str):
+        """Write the model as an .npz of arrays plus JSON metadata."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(
+            path,
+            waste_types=np.array(self.waste_types),
+            regions=np.flatnonzero(~np.isnan(self._region_table)),
+            metadata=np.array(json.dumps(self.metadata)),
+            **self.forest.arrays()
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PriceModel":
+        with np.load(path, allow_pickle=False) as data:
+            forest = CompiledForest(
+                split_column=data["split_column"],
+                split_threshold=data["split_threshold"],
+                leaf_value=data["leaf_value"],
+                tree_output=data["tree_output"],
+                baselines=data["baselines"],
+                depth=int(data["depth"]),
+                num_features=int(data["num_features"])
+            )
+            return cls(
+                forest,
+                data["waste_types"].tolist(),
+                data["regions"].tolist(),
+                json.loads(str(data["metadata"]))
+            )
+
+
+# Global instance
+_price_model = None
+_price_model_loaded = False
+
+def get_price_model() -> Optional[PriceModel]:
+    """
+    Get the trained price model, loading it on first call.
+
+    Returns None (rule-based pricing) when PRICE_MODEL_PATH is unset or the
+    file does not exist.
+    """
+    global _price_model, _price_model_loaded
+    if not _price_model_loaded:
+        _price_model_loaded = True
+        path = os.environ.get('PRICE_MODEL_PATH')
+        if path and os.path.exists(path):
+            start = time.perf_counter()
+            _price_model = PriceModel.load(path)
+            logger.info(
+                f"Loaded price model {_price_model.version} from {path} "
+                f"({_price_model.forest.num_trees} trees) in {time.perf_counter() - start:.3f}s"
+            )
+        elif path:
+            logger.warning(f"Price model not found at {path}; using rule-based pricing")
+    return _price_model
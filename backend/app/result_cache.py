@@ -0,0 +1,146 @@
+"""
+Content-addressed cache for classification results.
+
+Farmers often re-upload the same photo after a dropped connection, and the
+frontend retries failed requests. Results are keyed by a hash of the
+uploaded bytes plus the model version, so a repeat upload skips decoding and
+inference entirely. Entries are evicted least-recently-used once the memory
+bound is reached, and expire after a fixed time-to-live.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+# Approximate per-entry bookkeeping cost (key string, tuple, dict slot)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+class ResultCache:
+    """Thread-safe LRU cache with TTL for class-probability vectors."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        """
+        Create the cache.
+
+        Args:
+            max_bytes: Approximate memory bound for stored entries
+            ttl_seconds: Time after which an entry is treated as missing
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(image_bytes: bytes, model_version: str) -> str:
+        """Build a cache key from upload content and model version."""
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"{model_version}:{digest}"
+
+    @staticmethod
+    def _entry_size(key: str, value: np.ndarray) -> int:
+        return value.nbytes + len(key) + _ENTRY_OVERHEAD_BYTES
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up a cached result.
+
+        Returns:
+            The cached array, or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, size = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._size_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: np.ndarray):
+        """Store a result, evicting least-recently-used entries if needed."""
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+
+        value = np.array(value, copy=True)
+        value.setflags(write=False)
+        expires_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size_bytes -= old[2]
+
+            self._entries[key] = (value, expires_at, size)
+            self._size_bytes += size
+
+            while self._size_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Global cache instance shared by all classifiers
+_result_cache = None
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Get or create the global result cache.
+
+    Returns:
+        ResultCache instance, or None if disabled with RESULT_CACHE_MAX_MB=0
+    """
+    global _result_cache
+    max_mb = float(os.environ.get('RESULT_CACHE_MAX_MB', '64'))
+    if max_mb <= 0:
+        return None
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            max_bytes=int(max_mb * 1024 * 1024),
+            ttl_seconds=float(os.environ.get('RESULT_CACHE_TTL_SECONDS', '3600'))
+        )
+    return _result_cache
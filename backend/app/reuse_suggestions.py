@@ -225,3 +225,31 @@ class ReuseSuggestions:
     def get_all_waste_types() -> List[str]:
         """Get list of all supported waste types."""
         return list(ReuseSuggestions.WASTE_DATABASE.keys())
+
+    @staticmethod
+    def get_all_industries() -> List[str]:
+        """Get list of every industry that reuses some waste type."""
+        return sorted({
+            use["industry"]
+            for info in ReuseSuggestions.WASTE_DATABASE.values()
+            for use in info["industrial_uses"]
+        })
+
+    @staticmethod
+    def get_waste_types_for_industry(industry: str) -> List[str]:
+        """
+        Get the waste types an industry can use.
+
+        Args:
+            industry: Industry name as listed under industrial_uses,
+                     e.g. "Paper & Pulp Manufacturing" (case-insensitive)
+
+        Returns:
+            Waste types with that industry among their uses; empty if unknown
+        """
+        industry = industry.strip().lower()
+        return [
+            waste_type
+            for waste_type, info in ReuseSuggestions.WASTE_DATABASE.items()
+            if any(use["industry"].lower() == industry for use in info["industrial_uses"])
+        ]
@@ -0,0 +1,354 @@
+"""
+Pre-fork multi-worker server for the StubbleX API.
+
+The parent process binds the listening socket, loads and warms the
+classifier once, then forks worker processes that each run uvicorn on the
+shared socket. Model weights loaded before the fork stay shared
+copy-on-write between workers instead of being loaded N times.
+
+Each worker's CPU thread pools (OpenMP, TensorFlow, ONNX Runtime, TFLite)
+are sized to cpu_count / workers so workers do not oversubscribe the cores.
+Workers are recycled after a number of requests and restarted if they die.
+
+TensorFlow is not fork-safe, so with the keras backend the parent skips the
+preload and every worker loads its own copy. Use the onnx or tflite backend
+to share weights.
+
+Usage (from the backend directory):
+    python -m app.server --workers 4 --port 8000
+
+Signals:
+    SIGTERM/SIGINT  graceful shutdown of all workers
+    SIGHUP          rolling restart, one worker at a time
+"""
+
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Environment variables read by the CPU runtimes when they initialise
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS',
+    'CLASSIFIER_NUM_THREADS',
+)
+
+
+def threads_per_worker(workers: int) -> int:
+    """Split the available cores evenly between workers."""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def limit_worker_threads(num_threads: int, override: bool = False):
+    """
+    Cap the CPU thread pools of the ML runtimes.
+
+    Must run before TensorFlow, ONNX Runtime or NumPy's BLAS are imported,
+    since they read these variables once at initialisation.
+
+    Args:
+        num_threads: Threads per worker
+        override: Replace values already set in the environment
+    """
+    for name in THREAD_ENV_VARS:
+        if override or name not in os.environ:
+            os.environ[name] = str(num_threads)
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+
+
+def preload_is_fork_safe() -> bool:
+    """Whether the configured classifier can be loaded before forking."""
+    if os.environ.get('USE_ML_MODEL', '0') != '1':
+        return True
+    return os.environ.get('CLASSIFIER_BACKEND', 'keras') in ('onnx', 'tflite')
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Create the listening socket shared by all workers."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Forks and supervises uvicorn workers sharing one listening socket."""
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        graceful_timeout: float = 30.0
+    ):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind
+            workers: Number of worker processes
+            max_requests: Recycle a worker after this many requests (0 = never)
+            max_requests_jitter: Random extra requests per worker, so workers
+                                 do not all recycle at the same moment
+            graceful_timeout: Seconds a worker gets to finish in-flight
+                              requests before it is killed
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+
+        self.sock: Optional[socket.socket] = None
+        self.app = None
+        self.classifier = None
+        self.model_state = None
+        self._children: Dict[int, float] = {}
+        self._shutting_down = False
+        self._reload_requested = False
+
+    def preload(self):
+        """
+        Import the app and, where fork-safe, load and warm the classifier.
+
+        Runs in the parent before any worker is forked.
+        """
+        from .main import app, get_classifier, model_state
+        from .lifecycle import ModelState, load_and_warm, warmup_batch_sizes
+
+        self.app = app
+        self.model_state = model_state
+
+        if self.workers > 1 or self.max_requests > 0:
+            # Leaderboard scores live in each worker's memory, so a write would
+            # reach one worker only, and be lost when that worker is recycled
+            os.environ['LEADERBOARD_WRITES'] = '0'
+
+        if not preload_is_fork_safe():
+            logger.warning(
+                "The keras backend is not fork-safe; each worker will load its own "
+                "model. Use CLASSIFIER_BACKEND=onnx or tflite to share weights."
+            )
+            return
+
+        load_and_warm(get_classifier, model_state, warmup_batch_sizes())
+        if model_state.status != ModelState.READY:
+            raise RuntimeError(f"Classifier failed to load: {model_state.error}")
+        self.classifier = get_classifier()
+
+        # Workers inherit the warm classifier instead of loading their own
+        os.environ['WARMUP_ON_STARTUP'] = '0'
+
+        # Move everything allocated so far out of the collector's reach, so
+        # gc passes in the workers do not touch (and copy) the shared pages
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+    def spawn_worker(self) -> int:
+        """Fork one worker process and return its pid."""
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.time()
+            return pid
+
+        exit_code = 0
+        try:
+            self._run_worker()
+        except BaseException as e:
+            if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                logger.exception(f"Worker {os.getpid()} crashed")
+                exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _run_worker(self):
+        import uvicorn
+        from .lifecycle import warmup_batch_sizes
+
+        # uvicorn installs its own handlers for a graceful exit
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        random.seed()
+
+        if self.classifier is not None:
+            self.classifier.after_fork()
+            # Warm the worker's own thread pools before taking traffic
+            self.model_state.update(
+                warmup_ms=self.classifier.warmup(warmup_batch_sizes()),
+                started_at=time.time()
+            )
+
+        limit = None
+        if self.max_requests > 0:
+            limit = self.max_requests + random.randint(0, self.max_requests_jitter)
+
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            log_config=None
+        )
+        server = uvicorn.Server(config)
+        logger.info(f"Worker {os.getpid()} serving on {self.host}:{self.port}")
+        server.run(sockets=[self.sock])
+
+    def _handle_shutdown(self, signum, frame):
+        self._shutting_down = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _signal_children(self, sig: int, pids=None):
+        for pid in list(pids if pids is not None else self._children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self._children.pop(pid, None)
+
+    def _reap(self, block: bool = False) -> Optional[int]:
+        """Collect one exited worker, returning its pid (or None)."""
+        try:
+            pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            return None
+        if pid == 0:
+            return None
+        started = self._children.pop(pid, None)
+        if started is not None and not self._shutting_down:
+            code = os.waitstatus_to_exitcode(status)
+            logger.info(
+                f"Worker {pid} exited with {code} after {time.time() - started:.0f}s"
+            )
+        return pid
+
+    def _wait_for(self, pid: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while pid in self._children and time.monotonic() < deadline:
+            if self._reap() is None:
+                time.sleep(0.1)
+        return pid not in self._children
+
+    def _rolling_restart(self):
+        """Replace workers one at a time so capacity never drops to zero."""
+        logger.info("Rolling restart of workers")
+        for pid in list(self._children):
+            if self._shutting_down:
+                return
+            self.spawn_worker()
+            self._signal_children(signal.SIGTERM, [pid])
+            if not self._wait_for(pid, self.graceful_timeout):
+                self._signal_children(signal.SIGKILL, [pid])
+                self._wait_for(pid, 5)
+
+    def _stop_workers(self):
+        self._signal_children(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            if self._reap() is None:
+                time.sleep(0.1)
+        if self._children:
+            logger.warning(f"Killing {len(self._children)} workers after graceful timeout")
+            self._signal_children(signal.SIGKILL)
+            while self._children and self._reap(block=True) is not None:
+                pass
+
+    def run(self):
+        """Bind, preload, fork the workers and supervise them until shutdown."""
+        self.sock = bind_socket(self.host, self.port)
+        self.preload()
+
+        signal.signal(signal.SIGTERM, self._handle_shutdown)
+        signal.signal(signal.SIGINT, self._handle_shutdown)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        logger.info(
+            f"Starting {self.workers} workers on {self.host}:{self.port} "
+            f"({os.environ.get('CLASSIFIER_NUM_THREADS')} threads each)"
+        )
+        for _ in range(self.workers):
+            self.spawn_worker()
+
+        while not self._shutting_down:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._rolling_restart()
+            # Replace workers that were recycled or crashed
+            while self._reap() is not None:
+                pass
+            while len(self._children) < self.workers and not self._shutting_down:
+                self.spawn_worker()
+            time.sleep(0.5)
+
+        logger.info("Shutting down workers")
+        self._stop_workers()
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked workers")
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8000, help='Port to bind')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=int(os.environ.get('WEB_WORKERS', '2')),
+        help='Number of worker processes'
+    )
+    parser.add_argument(
+        '--threads-per-worker',
+        type=int,
+        help='CPU threads per worker for inference (default: cpu_count / workers)'
+    )
+    parser.add_argument(
+        '--max-requests',
+        type=int,
+        default=int(os.environ.get('WORKER_MAX_REQUESTS', '0')),
+        help='Recycle a worker after this many requests (0 = never)'
+    )
+    parser.add_argument(
+        '--max-requests-jitter',
+        type=int,
+        default=int(os.environ.get('WORKER_MAX_REQUESTS_JITTER', '0')),
+        help='Random extra requests added to --max-requests per worker'
+    )
+    parser.add_argument(
+        '--graceful-timeout',
+        type=float,
+        default=float(os.environ.get('WORKER_GRACEFUL_TIMEOUT', '30')),
+        help='Seconds to let workers finish in-flight requests on shutdown'
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.threads_per_worker:
+        limit_worker_threads(args.threads_per_worker, override=True)
+    else:
+        limit_worker_threads(threads_per_worker(args.workers))
+
+    PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout
+    ).run()
+    sys.exit(0)
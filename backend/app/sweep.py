@@ -0,0 +1,332 @@
+"""
+Parallel hyperparameter sweep for the classification head.
+
+Every trial trains the head on the same bottleneck features (see
+train_model --bottleneck), extracted once by the parent and memory-mapped
+read-only by the trials, so the page cache holds a single copy. Trials run
+in a process pool with TensorFlow's thread pools sized so that
+workers x threads matches the machine's cores. A trial whose validation
+accuracy falls clearly behind the best finished trial is stopped early.
+
+The search space is a JSON object mapping hyperparameters to candidate
+values; the sweep runs the full grid, or a random sample with --trials:
+
+    {"learning_rate": [0.001, 0.0003], "dropout": [0.2, 0.3, 0.5], "head_units": [128, 256]}
+
+Usage (from the backend directory):
+    python -m app.sweep --train-dir data/train --val-dir data/val --space space.json
+
+Results are ranked by validation accuracy and written as sweep_results.csv
+and sweep_results.json into --output-dir, next to model_metadata.json.
+Retrain the winner with train_model --learning-rate/--dropout/--head-units.
+"""
+
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from .server import limit_worker_threads
+
+# Hyperparameters a trial understands, with train_model's defaults
+DEFAULTS = {
+    "learning_rate": 0.001,
+    "dropout": 0.3,
+    "head_units": 256,
+    "batch_size": 32,
+}
+
+DEFAULT_SPACE = {
+    "learning_rate": [0.001, 0.0003],
+    "dropout": [0.2, 0.3, 0.5],
+    "head_units": [128, 256],
+}
+
+
+def expand_space(space: Dict[str, list], trials: Optional[int] = None, seed: int = 0) -> List[Dict]:
+    """
+    Turn a search space into trial configurations.
+
+    Args:
+        space: Hyperparameter name -> list of candidate values
+        trials: Sample this many configurations from the grid (None = all)
+        seed: Seed for the sample
+
+    Returns:
+        Configurations with defaults filled in for unswept hyperparameters
+    """
+    unknown = set(space) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(
+            f"Unknown hyperparameters: {', '.join(sorted(unknown))}. "
+            f"Supported: {', '.join(DEFAULTS)}"
+        )
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if trials is not None and trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    return [{**DEFAULTS, **config} for config in grid]
+
+
+def _init_worker(threads: int):
+    """Cap the trial process's CPU threads before TensorFlow starts."""
+    limit_worker_threads(threads, override=True)
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_trial(
+    trial_id: int,
+    config: Dict,
+    feature_dir: str,
+    num_classes: int,
+    epochs: int,
+    patience: int,
+    grace_epochs: int,
+    prune_ratio: float,
+    best_accuracy
+) -> Dict:
+    """
+    Train one head configuration on the shared bottleneck features.
+
+    After grace_epochs, the trial is stopped if its best validation
+    accuracy is below prune_ratio times the best accuracy of any finished
+    trial (a shared value updated by every worker).
+    """
+    from tensorflow import keras
+
+    from .train_model import create_head_layers
+    from .training_data import load_features
+
+    train_features, train_labels = load_features(os.path.join(feature_dir, 'train'))
+    val_features, val_labels = load_features(os.path.join(feature_dir, 'val'))
+
+    keras.utils.set_random_seed(trial_id)
+    head = keras.Sequential(
+        [keras.Input((train_features.shape[1],))] +
+        create_head_layers(num_classes, config["dropout"], config["head_units"])
+    )
+    head.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=config["learning_rate"]),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    class PruneHopeless(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.best = 0.0
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.best = max(self.best, logs.get('val_accuracy', 0.0))
+            if epoch + 1 >= grace_epochs and self.best < prune_ratio * best_accuracy.value:
+                self.pruned = True
+                self.model.stop_training = True
+
+    pruner = PruneHopeless()
+    start = time.perf_counter()
+    history = head.fit(
+        train_features,
+        keras.utils.to_categorical(train_labels, num_classes),
+        batch_size=config["batch_size"],
+        epochs=epochs,
+        shuffle=True,
+        validation_data=(val_features, keras.utils.to_categorical(val_labels, num_classes)),
+        callbacks=[
+            keras.callbacks.EarlyStopping(
+                monitor='val_loss', patience=patience, restore_best_weights=True
+            ),
+            pruner
+        ],
+        verbose=0
+    )
+
+    val_accuracy = max(history.history['val_accuracy'])
+    if not pruner.pruned:
+        # Benign race: a slightly stale best only makes pruning more lenient
+        best_accuracy.value = max(best_accuracy.value, val_accuracy)
+
+    return {
+        "trial": trial_id,
+        **config,
+        "val_accuracy": round(float(val_accuracy), 4),
+        "val_loss": round(float(min(history.history['val_loss'])), 4),
+        "epochs_run": len(history.history['val_loss']),
+        "pruned": pruner.pruned,
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+
+
+def write_results(results: List[Dict], output_dir: str) -> List[Dict]:
+    """Rank trials (accuracy desc, loss asc) and write the CSV and JSON tables."""
+    ranked = sorted(results, key=lambda r: (-r["val_accuracy"], r["val_loss"]))
+    for rank, result in enumerate(ranked, start=1):
+        result["rank"] = rank
+
+    columns = ["rank", "trial", *DEFAULTS, "val_accuracy", "val_loss", "epochs_run", "pruned", "seconds"]
+    with open(os.path.join(output_dir, 'sweep_results.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(ranked)
+    with open(os.path.join(output_dir, 'sweep_results.json'), 'w') as f:
+        json.dump(ranked, f, indent=2)
+
+    print(f"\n{'Rank':>4} {'lr':>9} {'dropout':>8} {'units':>6} {'batch':>6} "
+          f"{'val_acc':>8} {'val_loss':>9} {'epochs':>7}  status")
+    for r in ranked:
+        print(f"{r['rank']:>4} {r['learning_rate']:>9.2g} {r['dropout']:>8} {r['head_units']:>6} "
+              f"{r['batch_size']:>6} {r['val_accuracy']:>8.2%} {r['val_loss']:>9.4f} "
+              f"{r['epochs_run']:>7}  {'pruned' if r['pruned'] else 'done'}")
+    return ranked
+
+
+def run_sweep(
+    train_dir: str,
+    val_dir: str,
+    output_dir: str = "models/waste_classifier",
+    space: Optional[Dict[str, list]] = None,
+    trials: Optional[int] = None,
+    workers: Optional[int] = None,
+    epochs: int = 15,
+    patience: int = 3,
+    grace_epochs: int = 3,
+    prune_ratio: float = 0.9,
+    feature_variants: int = 4,
+    feature_dir: Optional[str] = None,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Run a head hyperparameter sweep and write the ranked results.
+
+    Args:
+        train_dir: Training images (class directories or a packed dataset)
+        val_dir: Validation images
+        output_dir: Where the results tables are written
+        space: Search space (default: DEFAULT_SPACE)
+        trials: Random sample size from the grid (None = full grid)
+        workers: Parallel trials (default: half the cores, at most one per trial)
+        epochs: Maximum epochs per trial
+        patience: Early-stopping patience on validation loss
+        grace_epochs: Epochs before a trial can be pruned
+        prune_ratio: Prune trials below this fraction of the best accuracy
+        feature_variants: Training-set passes stored as features
+        feature_dir: Feature store shared by all trials
+                     (default: output_dir/bottleneck, as train_model uses)
+        seed: Seed for sampling the grid
+
+    Returns:
+        Trial results, best first
+    """
+    from tensorflow import keras
+
+    from .train_model import CLASS_LABELS, create_model, prepare_bottleneck_features
+
+    configs = expand_space(space or DEFAULT_SPACE, trials, seed)
+    cpu_count = os.cpu_count() or 1
+    workers = min(len(configs), workers or max(1, cpu_count // 2))
+    threads = max(1, cpu_count // workers)
+    feature_dir = feature_dir or os.path.join(output_dir, 'bottleneck')
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Extract (or reuse) the features once, before any trial starts
+    model, _ = create_model(num_classes=len(CLASS_LABELS))
+    backbone = keras.Sequential(model.layers[:2])
+    prepare_bottleneck_features(
+        backbone, train_dir, val_dir, feature_dir, DEFAULTS["batch_size"], feature_variants
+    )
+    del model, backbone
+
+    print(f"\nRunning {len(configs)} trials on {workers} workers x {threads} threads")
+    start = time.perf_counter()
+    results = []
+
+    # spawn, not fork: the parent has already initialised TensorFlow
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        best_accuracy = manager.Value('d', 0.0)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(threads,)
+        ) as pool:
+            futures = [
+                pool.submit(
+                    run_trial, trial_id, config, feature_dir, len(CLASS_LABELS),
+                    epochs, patience, grace_epochs, prune_ratio, best_accuracy
+                )
+                for trial_id, config in enumerate(configs)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"  trial {result['trial']}: val_accuracy {result['val_accuracy']:.2%} "
+                      f"after {result['epochs_run']} epochs"
+                      f"{' (pruned)' if result['pruned'] else ''} in {result['seconds']}s")
+
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s")
+    return write_results(results, output_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the classifier head")
+    parser.add_argument('--train-dir', type=str, required=True, help='Training data directory')
+    parser.add_argument('--val-dir', type=str, required=True, help='Validation data directory')
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default='models/waste_classifier',
+        help='Directory for the results tables (next to model_metadata.json)'
+    )
+    parser.add_argument('--space', type=str, help='JSON file with the search space')
+    parser.add_argument('--trials', type=int, help='Randomly sample this many grid points')
+    parser.add_argument('--workers', type=int, help='Parallel trials (default: half the cores)')
+    parser.add_argument('--epochs', type=int, default=15, help='Maximum epochs per trial')
+    parser.add_argument('--patience', type=int, default=3, help='Early-stopping patience')
+    parser.add_argument('--grace-epochs', type=int, default=3, help='Epochs before pruning applies')
+    parser.add_argument(
+        '--prune-ratio',
+        type=float,
+        default=0.9,
+        help='Stop trials below this fraction of the best finished accuracy'
+    )
+    parser.add_argument(
+        '--feature-variants',
+        type=int,
+        default=4,
+        help='Training-set passes stored as features (1 clean + N-1 augmented)'
+    )
+    parser.add_argument('--feature-dir', type=str, help='Shared bottleneck feature store')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for --trials sampling')
+    args = parser.parse_args()
+
+    space = None
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+
+    run_sweep(
+        args.train_dir,
+        args.val_dir,
+        output_dir=args.output_dir,
+        space=space,
+        trials=args.trials,
+        workers=args.workers,
+        epochs=args.epochs,
+        patience=args.patience,
+        grace_epochs=args.grace_epochs,
+        prune_ratio=args.prune_ratio,
+        feature_variants=args.feature_variants,
+        feature_dir=args.feature_dir,
+        seed=args.seed
+    )
@@ -11,7 +11,23 @@ from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
 import json
+import time
 from datetime import datetime
+from typing import Optional
+
+try:
+    from .preprocessing import preprocess_input
+    from .training_data import (
+        PackedDataset, build_dataset, count_samples, extract_features, is_packed,
+        list_class_images, load_features, measure_throughput
+    )
+except ImportError:
+    # Run as a script: python app/train_model.py
+    from preprocessing import preprocess_input
+    from training_data import (
+        PackedDataset, build_dataset, count_samples, extract_features, is_packed,
+        list_class_images, load_features, measure_throughput
+    )
 
 # Class labels
 CLASS_LABELS = [
@@ -23,7 +39,33 @@ CLASS_LABELS = [
 ]
 
 
-def create_model(num_classes: int = 5, input_shape=(224, 224, 3)):
+def create_head_layers(num_classes: int = 5, dropout: float = 0.3, head_units: int = 256):
+    """
+    Classification head applied to the pooled backbone features.
+    
+    Args:
+        num_classes: Number of output classes
+        dropout: Dropout rate after the pooled features and the first Dense layer
+        head_units: Width of the first Dense layer (the second is half as wide)
+    """
+    return [
+        keras.layers.BatchNormalization(),
+        keras.layers.Dropout(dropout),
+        keras.layers.Dense(head_units, activation='relu'),
+        keras.layers.BatchNormalization(),
+        keras.layers.Dropout(dropout),
+        keras.layers.Dense(head_units // 2, activation='relu'),
+        keras.layers.Dropout(0.2),
+        keras.layers.Dense(num_classes, activation='softmax')
+    ]
+
+
+def create_model(
+    num_classes: int = 5,
+    input_shape=(224, 224, 3),
+    dropout: float = 0.3,
+    head_units: int = 256
+):
     """Create transfer learning model with MobileNetV2 base."""
     
     # Load pre-trained MobileNetV2
@@ -40,45 +82,166 @@ def create_model(num_classes: int = 5, input_shape=(224, 224, 3)):
     model = keras.Sequential([
         base_model,
         keras.layers.GlobalAveragePooling2D(),
-        keras.layers.BatchNormalization(),
-        keras.layers.Dropout(0.3),
-        keras.layers.Dense(256, activation='relu'),
-        keras.layers.BatchNormalization(),
-        keras.layers.Dropout(0.3),
-        keras.layers.Dense(128, activation='relu'),
-        keras.layers.Dropout(0.2),
-        keras.layers.Dense(num_classes, activation='softmax')
+        *create_head_layers(num_classes, dropout, head_units)
     ])
     
     return model, base_model
 
 
-def train_model(
+def _load_sample_images(directory: str, limit: int, seed: int = 0):
+    """
+    Load a random sample of images, preprocessed the way the server sends them.
+    
+    Calibration and the exported accuracy report must see the inputs the
+    model gets in production, so pixels go through the same MobileNetV2
+    scaling as WasteClassifier.preprocess_image.
+    
+    Returns:
+        (images, labels): float32 array (N, 224, 224, 3) in [-1, 1] and int labels
+    """
+    rng = np.random.default_rng(seed)
+    if is_packed(directory):
+        packed = PackedDataset(directory)
+        picked = np.arange(len(packed))
+        if len(packed) > limit:
+            picked = np.sort(rng.choice(len(packed), size=limit, replace=False))
+        images, labels = packed.take(picked)
+        return preprocess_input(images.astype(np.float32)), labels.astype(np.int64)
+    
+    samples = list_class_images(directory, CLASS_LABELS)
+    if len(samples) > limit:
+        picked = rng.choice(len(samples), size=limit, replace=False)
+        samples = [samples[i] for i in sorted(picked)]
+    
+    images = np.stack([
+        preprocess_input(keras.utils.img_to_array(keras.utils.load_img(path, target_size=(224, 224))))
+        for path, _ in samples
+    ]).astype(np.float32)
+    labels = np.array([label for _, label in samples])
+    return images, labels
+
+
+def _evaluate_tflite(model_path: str, images: np.ndarray, labels: np.ndarray) -> dict:
+    """Measure accuracy and single-image latency of a TFLite model."""
+    interpreter = tf.lite.Interpreter(model_path=model_path)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    
+    in_scale, in_zero = input_details['quantization']
+    out_scale, out_zero = output_details['quantization']
+    
+    predictions = []
+    start = time.perf_counter()
+    for img in images:
+        x = img[np.newaxis]
+        if input_details['dtype'] != np.float32:
+            x = np.round(x / in_scale + in_zero).astype(input_details['dtype'])
+        interpreter.set_tensor(input_details['index'], x)
+        interpreter.invoke()
+        out = interpreter.get_tensor(output_details['index'])[0]
+        if output_details['dtype'] != np.float32:
+            out = (out.astype(np.float32) - out_zero) * out_scale
+        predictions.append(np.argmax(out))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "size_mb": round(os.path.getsize(model_path) / (1024 * 1024), 2),
+        "accuracy": float(np.mean(np.array(predictions) == labels)),
+        "latency_ms": round(elapsed / len(images) * 1000, 2)
+    }
+
+
+def export_tflite(
+    model: keras.Model,
+    output_dir: str,
     train_dir: str,
     val_dir: str,
-    output_dir: str = "models/waste_classifier",
-    epochs: int = 30,
-    batch_size: int = 32,
-    fine_tune: bool = True
-):
+    calibration_samples: int = 200,
+    eval_samples: int = 200
+) -> dict:
     """
-    Train the waste classification model.
+    Export dynamic-range and full-int8 quantized TFLite models.
+    
+    The int8 model is calibrated on a random sample of the training
+    directory. Both exports are then compared with the Keras model on a
+    sample of the validation set.
     
     Args:
-        train_dir: Directory containing training images organized by class
-        val_dir: Directory containing validation images organized by class
-        output_dir: Directory to save trained model
-        epochs: Number of training epochs
-        batch_size: Training batch size
-        fine_tune: Whether to fine-tune base model after initial training
+        model: Trained Keras model
+        output_dir: Directory to write the .tflite files into
+        train_dir: Training images (calibration data)
+        val_dir: Validation images (accuracy/latency report)
+        calibration_samples: Number of training images used for calibration
+        eval_samples: Number of validation images in the report
+    
+    Returns:
+        Side-by-side accuracy, latency and size report
     """
+    print("\n" + "="*50)
+    print("Exporting TFLite models...")
+    print("="*50 + "\n")
     
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
+    # Dynamic-range quantization: int8 weights, float activations
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    dynamic_path = os.path.join(output_dir, 'model_dynamic.tflite')
+    with open(dynamic_path, 'wb') as f:
+        f.write(converter.convert())
+    print(f"Dynamic-range TFLite model saved to: {dynamic_path}")
+    
+    # Full-integer quantization calibrated on training images
+    calibration_images, _ = _load_sample_images(train_dir, calibration_samples)
+    
+    def representative_dataset():
+        for img in calibration_images:
+            yield [img[np.newaxis]]
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    int8_path = os.path.join(output_dir, 'model_int8.tflite')
+    with open(int8_path, 'wb') as f:
+        f.write(converter.convert())
+    print(f"Int8 TFLite model saved to: {int8_path} "
+          f"(calibrated on {len(calibration_images)} images)")
+    
+    # Side-by-side report against the Keras model
+    eval_images, eval_labels = _load_sample_images(val_dir, eval_samples)
+    
+    model.predict_on_batch(eval_images[:1])  # Warm up graph tracing
+    start = time.perf_counter()
+    keras_predictions = [
+        np.argmax(model.predict_on_batch(img[np.newaxis])[0]) for img in eval_images
+    ]
+    keras_elapsed = time.perf_counter() - start
+    
+    report = {
+        "num_eval_samples": len(eval_images),
+        "num_calibration_samples": len(calibration_images),
+        "keras": {
+            "accuracy": float(np.mean(np.array(keras_predictions) == eval_labels)),
+            "latency_ms": round(keras_elapsed / len(eval_images) * 1000, 2)
+        },
+        "tflite_dynamic_range": _evaluate_tflite(dynamic_path, eval_images, eval_labels),
+        "tflite_int8": _evaluate_tflite(int8_path, eval_images, eval_labels)
+    }
+    
+    print(f"\n{'Model':<22}{'Accuracy':>10}{'Latency (ms)':>15}")
+    for name in ("keras", "tflite_dynamic_range", "tflite_int8"):
+        print(f"{name:<22}{report[name]['accuracy']:>10.2%}{report[name]['latency_ms']:>15.2f}")
     
+    return report
+
+
+def _generator_loaders(train_dir: str, val_dir: str, batch_size: int):
+    """ImageDataGenerator loaders: (train, val, num_train, num_val)."""
     # Data augmentation for training
     train_datagen = ImageDataGenerator(
-        rescale=1./255,
+        preprocessing_function=preprocess_input,
         rotation_range=30,
         width_shift_range=0.2,
         height_shift_range=0.2,
@@ -89,8 +252,8 @@ def train_model(
         fill_mode='nearest'
     )
     
-    # Only rescaling for validation
-    val_datagen = ImageDataGenerator(rescale=1./255)
+    # Only input scaling for validation, the same as serving
+    val_datagen = ImageDataGenerator(preprocessing_function=preprocess_input)
     
     # Load training data
     train_generator = train_datagen.flow_from_directory(
@@ -112,12 +275,167 @@ def train_model(
         shuffle=False
     )
     
+    return train_generator, val_generator, train_generator.samples, val_generator.samples
+
+
+def _tfdata_loaders(train_dir: str, val_dir: str, batch_size: int, cache: Optional[str]):
+    """tf.data loaders: (train, val, num_train, num_val)."""
+    train_cache = val_cache = cache
+    if cache and cache != "memory":
+        train_cache = os.path.join(cache, "train")
+        val_cache = os.path.join(cache, "val")
+    
+    train_data, num_train = build_dataset(
+        train_dir, CLASS_LABELS, batch_size, training=True, cache=train_cache
+    )
+    val_data, num_val = build_dataset(
+        val_dir, CLASS_LABELS, batch_size, training=False, cache=val_cache
+    )
+    return train_data, val_data, num_train, num_val
+
+
+def prepare_bottleneck_features(
+    backbone: keras.Model,
+    train_dir: str,
+    val_dir: str,
+    feature_dir: str,
+    batch_size: int,
+    variants: int,
+    cache: Optional[str] = None
+):
+    """
+    Frozen-backbone features for head training, computed once and reused.
+    
+    Training images get one clean pass plus (variants - 1) augmented
+    passes; validation images one clean pass. Features from an earlier run
+    with the same directories and variant count are memory-mapped instead
+    of recomputed.
+    
+    Returns:
+        (train_features, train_labels, val_features, val_labels)
+    """
+    os.makedirs(feature_dir, exist_ok=True)
+    manifest = {
+        "train_dir": os.path.abspath(train_dir),
+        "val_dir": os.path.abspath(val_dir),
+        "variants": variants,
+        "num_train": count_samples(train_dir, CLASS_LABELS),
+        "num_val": count_samples(val_dir, CLASS_LABELS),
+        "backbone": backbone.layers[0].name
+    }
+    manifest_path = os.path.join(feature_dir, 'features.json')
+    train_prefix = os.path.join(feature_dir, 'train')
+    val_prefix = os.path.join(feature_dir, 'val')
+    
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                print(f"Reusing bottleneck features from {feature_dir}")
+                return load_features(train_prefix) + load_features(val_prefix)
+    
+    print(f"Extracting bottleneck features ({variants} passes over training data)...")
+    start = time.perf_counter()
+    
+    # Same on-disk layout as _tfdata_loaders, so both share the train cache
+    train_cache = cache
+    if cache and cache != "memory":
+        train_cache = os.path.join(cache, "train")
+    
+    train_clean, num_train = build_dataset(train_dir, CLASS_LABELS, batch_size, training=False)
+    train_augmented, _ = build_dataset(
+        train_dir, CLASS_LABELS, batch_size, training=True, cache=train_cache
+    )
+    val_clean, num_val = build_dataset(val_dir, CLASS_LABELS, batch_size, training=False)
+    
+    # Each iteration of the augmented dataset draws new augmentations
+    train_features = extract_features(
+        backbone, [train_clean] + [train_augmented] * (variants - 1),
+        num_train * variants, train_prefix
+    )
+    val_features = extract_features(backbone, [val_clean], num_val, val_prefix)
+    
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Bottleneck features saved to {feature_dir} in {time.perf_counter() - start:.1f}s")
+    return train_features + val_features
+
+
+def train_model(
+    train_dir: str,
+    val_dir: str,
+    output_dir: str = "models/waste_classifier",
+    epochs: int = 30,
+    batch_size: int = 32,
+    fine_tune: bool = True,
+    export_tflite_models: bool = False,
+    calibration_samples: int = 200,
+    input_pipeline: str = "generator",
+    cache: Optional[str] = None,
+    bottleneck: bool = False,
+    feature_variants: int = 4,
+    feature_dir: Optional[str] = None,
+    learning_rate: float = 0.001,
+    dropout: float = 0.3,
+    head_units: int = 256
+):
+    """
+    Train the waste classification model.
+    
+    Args:
+        train_dir: Directory containing training images organized by class
+        val_dir: Directory containing validation images organized by class
+        output_dir: Directory to save trained model
+        epochs: Number of training epochs
+        batch_size: Training batch size
+        fine_tune: Whether to fine-tune base model after initial training
+        export_tflite_models: Also export dynamic-range and int8 TFLite models
+        calibration_samples: Training images used to calibrate the int8 model
+        input_pipeline: "generator" (ImageDataGenerator) or "tfdata"
+                       (parallel decode, caching and prefetch)
+        cache: For the tfdata pipeline, "memory" or a directory for an
+               on-disk cache of decoded images (None disables caching)
+        bottleneck: Train the phase-1 head on precomputed backbone features
+                   instead of images (phase 2 still uses images)
+        feature_variants: Passes over the training set stored as features:
+                         one clean pass plus (variants - 1) augmented
+        feature_dir: Where to store the features (default: output_dir/bottleneck)
+        learning_rate: Phase-1 (head training) learning rate
+        dropout: Head dropout rate (see create_head_layers)
+        head_units: Width of the head's first Dense layer
+    """
+    if input_pipeline not in ("generator", "tfdata"):
+        raise ValueError(f"Unknown input pipeline: {input_pipeline}")
+    if input_pipeline == "generator" and (is_packed(train_dir) or is_packed(val_dir)):
+        print("Packed datasets are read with the tfdata pipeline")
+        input_pipeline = "tfdata"
+    
+    # Create output directory
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if input_pipeline == "tfdata":
+        train_data, val_data, num_train, num_val = _tfdata_loaders(
+            train_dir, val_dir, batch_size, cache
+        )
+        # Timed on an uncached copy so a partial pass does not touch the cache
+        throughput_data = _tfdata_loaders(train_dir, val_dir, batch_size, None)[0]
+    else:
+        train_data, val_data, num_train, num_val = _generator_loaders(
+            train_dir, val_dir, batch_size
+        )
+        throughput_data = train_data
+    
+    # Input throughput alone, to spot a model waiting on its data
+    images_per_sec = measure_throughput(throughput_data)
+    print(f"Data loader throughput ({input_pipeline}): {images_per_sec:.1f} images/sec")
+    
     # Create model
-    model, base_model = create_model(num_classes=len(CLASS_LABELS))
+    model, base_model = create_model(
+        num_classes=len(CLASS_LABELS), dropout=dropout, head_units=head_units
+    )
     
     # Compile model
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
         loss='categorical_crossentropy',
         metrics=['accuracy', keras.metrics.TopKCategoricalAccuracy(k=3)]
     )
@@ -153,13 +471,43 @@ def train_model(
     print("Phase 1: Training classification head...")
     print("="*50 + "\n")
     
-    history1 = model.fit(
-        train_generator,
-        epochs=epochs // 2,
-        validation_data=val_generator,
-        callbacks=callbacks,
-        verbose=1
-    )
+    if bottleneck:
+        # The frozen backbone gives the same features every epoch, so run
+        # it once and train the head (sharing the model's layers) on them
+        backbone = keras.Sequential(model.layers[:2])
+        head = keras.Sequential([keras.Input((backbone.output_shape[-1],))] + model.layers[2:])
+        head.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+            loss='categorical_crossentropy',
+            metrics=['accuracy', keras.metrics.TopKCategoricalAccuracy(k=3)]
+        )
+        train_features, train_labels, val_features, val_labels = prepare_bottleneck_features(
+            backbone, train_dir, val_dir,
+            feature_dir or os.path.join(output_dir, 'bottleneck'),
+            batch_size, feature_variants, cache
+        )
+        
+        history1 = head.fit(
+            train_features,
+            keras.utils.to_categorical(train_labels, len(CLASS_LABELS)),
+            batch_size=batch_size,
+            epochs=epochs // 2,
+            shuffle=True,
+            validation_data=(
+                val_features, keras.utils.to_categorical(val_labels, len(CLASS_LABELS))
+            ),
+            # The checkpoint would save the head alone
+            callbacks=[cb for cb in callbacks if not isinstance(cb, ModelCheckpoint)],
+            verbose=1
+        )
+    else:
+        history1 = model.fit(
+            train_data,
+            epochs=epochs // 2,
+            validation_data=val_data,
+            callbacks=callbacks,
+            verbose=1
+        )
     
     # Phase 2: Fine-tune entire model
     if fine_tune:
@@ -178,9 +526,9 @@ def train_model(
         )
         
         history2 = model.fit(
-            train_generator,
+            train_data,
             epochs=epochs // 2,
-            validation_data=val_generator,
+            validation_data=val_data,
             callbacks=callbacks,
             verbose=1
         )
@@ -201,7 +549,7 @@ def train_model(
     print("Final Evaluation:")
     print("="*50 + "\n")
     
-    results = model.evaluate(val_generator, verbose=1)
+    results = model.evaluate(val_data, verbose=1)
     metrics = dict(zip(model.metrics_names, results))
     
     # Save training metadata
@@ -213,10 +561,24 @@ def train_model(
         "batch_size": batch_size,
         "fine_tuned": fine_tune,
         "final_metrics": metrics,
-        "num_train_samples": train_generator.samples,
-        "num_val_samples": val_generator.samples
+        "num_train_samples": num_train,
+        "num_val_samples": num_val,
+        "input_pipeline": input_pipeline,
+        "loader_images_per_sec": round(images_per_sec, 1),
+        "bottleneck_features": bottleneck,
+        "hyperparameters": {
+            "learning_rate": learning_rate,
+            "dropout": dropout,
+            "head_units": head_units
+        }
     }
     
+    if export_tflite_models:
+        metadata["tflite_report"] = export_tflite(
+            model, output_dir, train_dir, val_dir,
+            calibration_samples=calibration_samples
+        )
+    
     metadata_path = os.path.join(output_dir, 'model_metadata.json')
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
@@ -288,6 +650,63 @@ if __name__ == "__main__":
         action='store_true',
         help='Skip fine-tuning phase'
     )
+    parser.add_argument(
+        '--export-tflite',
+        action='store_true',
+        help='Also export dynamic-range and int8 quantized TFLite models'
+    )
+    parser.add_argument(
+        '--calibration-samples',
+        type=int,
+        default=200,
+        help='Training images used to calibrate the int8 TFLite model'
+    )
+    parser.add_argument(
+        '--input-pipeline',
+        type=str,
+        choices=['generator', 'tfdata'],
+        default='generator',
+        help='Input pipeline: ImageDataGenerator, or tf.data with parallel decode and prefetch'
+    )
+    parser.add_argument(
+        '--cache',
+        type=str,
+        help='tf.data cache of decoded images: "memory" or a directory'
+    )
+    parser.add_argument(
+        '--bottleneck',
+        action='store_true',
+        help='Train the phase-1 head on precomputed frozen-backbone features'
+    )
+    parser.add_argument(
+        '--feature-variants',
+        type=int,
+        default=4,
+        help='Training-set passes stored as features (1 clean + N-1 augmented)'
+    )
+    parser.add_argument(
+        '--feature-dir',
+        type=str,
+        help='Directory for bottleneck features (default: <output-dir>/bottleneck)'
+    )
+    parser.add_argument(
+        '--learning-rate',
+        type=float,
+        default=0.001,
+        help='Phase-1 learning rate'
+    )
+    parser.add_argument(
+        '--dropout',
+        type=float,
+        default=0.3,
+        help='Dropout rate in the classification head'
+    )
+    parser.add_argument(
+        '--head-units',
+        type=int,
+        default=256,
+        help='Width of the first Dense layer of the head'
+    )
     parser.add_argument(
         '--create-demo',
         action='store_true',
@@ -305,7 +724,17 @@ if __name__ == "__main__":
             output_dir=args.output_dir,
             epochs=args.epochs,
             batch_size=args.batch_size,
-            fine_tune=not args.no_fine_tune
+            fine_tune=not args.no_fine_tune,
+            export_tflite_models=args.export_tflite,
+            calibration_samples=args.calibration_samples,
+            input_pipeline=args.input_pipeline,
+            cache=args.cache,
+            bottleneck=args.bottleneck,
+            feature_variants=args.feature_variants,
+            feature_dir=args.feature_dir,
+            learning_rate=args.learning_rate,
+            dropout=args.dropout,
+            head_units=args.head_units
         )
     else:
         print("Error: Please provide --train-dir and --val-dir, or use --create-demo")
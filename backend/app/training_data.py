@@ -0,0 +1,295 @@
+"""
+Training input pipelines for the waste classifier.
+
+``ImageDataGenerator`` decodes and augments one image at a time in Python
+and re-reads every JPEG from disk each epoch. The tf.data pipeline here
+reads and decodes files in parallel, caches the decoded, resized images
+(in memory or on disk) so later epochs skip decoding, augments whole
+batches at once on the graph, and prefetches the next batch while the
+model trains on the current one.
+
+Directories packed with app.pack_dataset are read instead from memory-mapped
+uint8 shards by several parallel shard readers, with no per-file I/O or
+decoding at all.
+
+For head-only training, extract_features runs the frozen backbone once
+and stores the pooled features as memory-mapped float16 arrays.
+"""
+
+import os
+import time
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+try:
+    from .pack_dataset import PackedDataset, is_packed, list_class_images
+    from .preprocessing import preprocess_input
+except ImportError:
+    # Run as a script from app/ (python train_model.py)
+    from pack_dataset import PackedDataset, is_packed, list_class_images
+    from preprocessing import preprocess_input
+
+IMG_SIZE = (224, 224)
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def build_augmenter(seed: Optional[int] = None) -> keras.Sequential:
+    """
+    Batch-level augmentation matching the ImageDataGenerator settings.
+
+    Rotation 30 degrees, shifts and zoom of 20%, shear, horizontal and
+    vertical flips, nearest fill. Each layer transforms a whole batch with
+    one projective-transform op.
+    """
+    layers = [
+        keras.layers.RandomFlip("horizontal_and_vertical", seed=seed),
+        keras.layers.RandomRotation(30 / 360, fill_mode='nearest', seed=seed),
+        keras.layers.RandomTranslation(0.2, 0.2, fill_mode='nearest', seed=seed),
+        keras.layers.RandomZoom(0.2, fill_mode='nearest', seed=seed),
+    ]
+    if hasattr(keras.layers, 'RandomShear'):
+        layers.append(keras.layers.RandomShear(
+            x_factor=0.2, y_factor=0.2, fill_mode='nearest', seed=seed
+        ))
+    return keras.Sequential(layers, name="augmentation")
+
+
+def _decode(path: tf.Tensor, label: tf.Tensor):
+    """Read and decode one file, resized to the model input as uint8."""
+    image = tf.io.decode_image(
+        tf.io.read_file(path), channels=3, expand_animations=False
+    )
+    image = tf.image.resize(image, IMG_SIZE)
+    # uint8 keeps the cache at a quarter of the float32 size
+    return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8), label
+
+
+def build_dataset(
+    directory: str,
+    class_labels: Sequence[str],
+    batch_size: int = 32,
+    training: bool = True,
+    cache: Optional[str] = None,
+    shuffle_buffer: int = 1000,
+    seed: Optional[int] = None
+) -> Tuple[tf.data.Dataset, int]:
+    """
+    Build a tf.data pipeline over a directory organized by class, or over
+    a packed dataset (see app.pack_dataset).
+
+    Args:
+        directory: Directory with one subdirectory per class
+        class_labels: Class names, in model output order
+        batch_size: Images per batch
+        training: Shuffle and augment (validation data is neither)
+        cache: None, "memory", or a file path prefix for an on-disk cache
+               of decoded, resized images (not used for packed datasets,
+               which are already decoded)
+        shuffle_buffer: Decoded images held for shuffling
+        seed: Random seed for shuffling and augmentation
+
+    Returns:
+        (dataset, num_samples): batches of (float32 images in [-1, 1],
+        one-hot labels), matching the ImageDataGenerator output
+    """
+    if is_packed(directory):
+        dataset, num_samples = _packed_examples(directory, class_labels, training)
+        return _to_batches(
+            dataset, num_samples, len(class_labels), batch_size, training, shuffle_buffer, seed
+        ), num_samples
+
+    samples = list_class_images(directory, class_labels)
+    if not samples:
+        raise ValueError(f"No images found in {directory}")
+    paths, labels = zip(*samples)
+
+    dataset = tf.data.Dataset.from_tensor_slices((list(paths), list(labels)))
+    dataset = dataset.map(_decode, num_parallel_calls=AUTOTUNE, deterministic=not training)
+
+    if cache == "memory":
+        dataset = dataset.cache()
+    elif cache:
+        os.makedirs(os.path.dirname(cache) or '.', exist_ok=True)
+        dataset = dataset.cache(cache)
+
+    # Shuffled after the cache, so every epoch sees a new order
+    return _to_batches(
+        dataset, len(samples), len(class_labels), batch_size, training, shuffle_buffer, seed
+    ), len(samples)
+
+
+def _to_batches(
+    dataset: tf.data.Dataset,
+    num_samples: int,
+    num_classes: int,
+    batch_size: int,
+    training: bool,
+    shuffle_buffer: int,
+    seed: Optional[int]
+) -> tf.data.Dataset:
+    """Shuffle, batch, augment and prefetch (uint8 image, label) examples."""
+    if training:
+        dataset = dataset.shuffle(
+            min(shuffle_buffer, num_samples), seed=seed, reshuffle_each_iteration=True
+        )
+
+    dataset = dataset.batch(batch_size, num_parallel_calls=AUTOTUNE)
+
+    augmenter = build_augmenter(seed) if training else None
+
+    def to_model_input(images, labels):
+        # Same scaling as serving; the augmentation layers work in any range
+        images = preprocess_input(tf.cast(images, tf.float32))
+        if augmenter is not None:
+            images = augmenter(images, training=True)
+        return images, tf.one_hot(labels, num_classes)
+
+    dataset = dataset.map(to_model_input, num_parallel_calls=AUTOTUNE)
+    return dataset.prefetch(AUTOTUNE)
+
+
+def _packed_examples(
+    directory: str,
+    class_labels: Sequence[str],
+    training: bool,
+    readers: int = 4,
+    block_size: int = 64
+) -> Tuple[tf.data.Dataset, int]:
+    """
+    (uint8 image, label) examples read from a packed dataset.
+
+    Each shard is read as contiguous blocks sliced straight out of its
+    memory map; several shards are read in parallel and interleaved. In
+    training, shard and block order are shuffled every epoch (the packer
+    already shuffled samples across shards).
+    """
+    packed = PackedDataset(directory)
+    if list(packed.class_labels) != list(class_labels):
+        raise ValueError(
+            f"Packed dataset {directory} has classes {packed.class_labels}, "
+            f"expected {list(class_labels)}"
+        )
+    if tuple(packed.index["image_size"]) != IMG_SIZE:
+        raise ValueError(
+            f"Packed dataset {directory} has image size {packed.index['image_size']}, "
+            f"expected {list(IMG_SIZE)}"
+        )
+
+    def read_shard(shard_idx):
+        images = packed.shard(int(shard_idx))
+        labels = np.asarray(packed.shard_labels(int(shard_idx)), dtype=np.int32)
+        starts = np.arange(0, len(images), block_size)
+        if training:
+            np.random.shuffle(starts)
+        for start in starts:
+            # A view into the memory map; the pages are read on conversion
+            yield images[start:start + block_size], labels[start:start + block_size]
+
+    width, height = IMG_SIZE
+    signature = (
+        tf.TensorSpec((None, height, width, 3), tf.uint8),
+        tf.TensorSpec((None,), tf.int32),
+    )
+    shards = tf.data.Dataset.range(packed.num_shards)
+    if training:
+        shards = shards.shuffle(packed.num_shards, reshuffle_each_iteration=True)
+    dataset = shards.interleave(
+        lambda shard_idx: tf.data.Dataset.from_generator(
+            read_shard, output_signature=signature, args=(shard_idx,)
+        ),
+        cycle_length=min(readers, packed.num_shards),
+        num_parallel_calls=min(readers, packed.num_shards),
+        deterministic=not training
+    )
+    return dataset.unbatch(), len(packed)
+
+
+def count_samples(directory: str, class_labels: Sequence[str]) -> int:
+    """Number of images in a class directory tree or packed dataset."""
+    if is_packed(directory):
+        return len(PackedDataset(directory))
+    return len(list_class_images(directory, class_labels))
+
+
+def measure_throughput(batches, num_batches: int = 20) -> float:
+    """
+    Images per second a data loader delivers, without any model work.
+
+    The first batch is not timed, so pipeline start-up does not count.
+
+    Args:
+        batches: tf.data.Dataset or Keras iterator (e.g. ImageDataGenerator)
+        num_batches: Batches to time
+    """
+    iterator = iter(batches)
+    next(iterator)
+    images = 0
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        try:
+            batch_images, _ = next(iterator)
+        except StopIteration:
+            break
+        images += int(batch_images.shape[0])
+    elapsed = time.perf_counter() - start
+    return images / elapsed if elapsed > 0 else 0.0
+
+
+def extract_features(
+    backbone: keras.Model,
+    passes: Sequence[tf.data.Dataset],
+    num_rows: int,
+    path_prefix: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run a frozen backbone over one or more passes of a dataset.
+
+    Features are written straight into float16 .npy files, so memory use
+    does not grow with the dataset and later runs can memory-map them.
+
+    Args:
+        backbone: Model mapping images to pooled feature vectors
+        passes: Datasets to run, e.g. one clean pass and several augmented
+        num_rows: Total images across all passes
+        path_prefix: Writes <prefix>_features.npy and <prefix>_labels.npy
+
+    Returns:
+        (features, labels) as read-only memory maps
+    """
+    dim = backbone.output_shape[-1]
+    features_path = f"{path_prefix}_features.npy"
+    labels_path = f"{path_prefix}_labels.npy"
+    features = np.lib.format.open_memmap(
+        features_path, mode='w+', dtype=np.float16, shape=(num_rows, dim)
+    )
+    labels = np.lib.format.open_memmap(
+        labels_path, mode='w+', dtype=np.int16, shape=(num_rows,)
+    )
+
+    row = 0
+    for dataset in passes:
+        for images, one_hot in dataset:
+            batch_features = np.asarray(backbone.predict_on_batch(images))
+            end = row + len(batch_features)
+            features[row:end] = batch_features
+            labels[row:end] = np.argmax(one_hot, axis=1)
+            row = end
+    if row != num_rows:
+        raise ValueError(f"Expected {num_rows} feature rows, extracted {row}")
+
+    features.flush()
+    labels.flush()
+    del features, labels
+    return load_features(path_prefix)
+
+
+def load_features(path_prefix: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Memory-map features written by extract_features."""
+    return (
+        np.load(f"{path_prefix}_features.npy", mmap_mode='r'),
+        np.load(f"{path_prefix}_labels.npy", mmap_mode='r')
+    )
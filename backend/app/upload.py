@@ -0,0 +1,248 @@
+"""
+Streaming ingestion and validation of uploaded images.
+
+Uploads are read in fixed-size chunks and rejected as soon as they cross the
+byte limit, so an oversized file is never buffered whole in memory. The image
+header is then parsed by hand to check the format and pixel dimensions, which
+rejects decompression bombs (small files that decode to huge bitmaps) before
+anything is handed to PIL.
+"""
+
+import os
+import struct
+from typing import Any, Callable, NamedTuple, Optional
+
+from fastapi import UploadFile
+
+MAX_UPLOAD_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', str(50 * 1000 * 1000)))
+CHUNK_SIZE = 64 * 1024
+
+# JPEG start-of-frame markers carry the image dimensions
+_JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+# JPEG markers without a length field
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+_UNSUPPORTED_FORMAT = (
+    "Unsupported image format. Please upload a JPEG, PNG, WebP, GIF or BMP image."
+)
+
+
+class UploadRejected(Exception):
+    """Raised when an upload fails size or format validation."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ImageInfo(NamedTuple):
+    """Format and dimensions read from an image header."""
+    format: str
+    width: int
+    height: int
+
+
+def detect_format(header: bytes) -> str:
+    """
+    Identify a supported image format from its magic bytes.
+
+    Returns:
+        One of JPEG, PNG, GIF, BMP, WEBP, or an empty string if unknown
+    """
+    if header[:3] == b'\xff\xd8\xff':
+        return 'JPEG'
+    if header[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'PNG'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'GIF'
+    if header[:2] == b'BM':
+        return 'BMP'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return ''
+
+
+def _jpeg_size(data: bytes):
+    """Walk JPEG segments up to the first start-of-frame marker."""
+    i = 2
+    n = len(data)
+    while i + 1 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            i += 2
+            continue
+        if i + 4 > n:
+            return None
+        (length,) = struct.unpack('>H', data[i + 2:i + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _webp_size(data: bytes):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25:
+        (bits,) = struct.unpack('<I', data[21:25])
+        return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF)
+    if chunk == b'VP8X' and len(data) >= 30:
+        width = 1 + int.from_bytes(data[24:27], 'little')
+        height = 1 + int.from_bytes(data[27:30], 'little')
+        return width, height
+    return None
+
+
+def sniff_image(data: bytes, max_pixels: int = MAX_IMAGE_PIXELS) -> ImageInfo:
+    """
+    Read format and dimensions from an image header without decoding it.
+
+    Args:
+        data: Image bytes (at least the header)
+        max_pixels: Largest width * height accepted
+
+    Returns:
+        ImageInfo for the upload
+
+    Raises:
+        UploadRejected: If the format is unsupported, the header is
+                        malformed, or the image has too many pixels
+    """
+    fmt = detect_format(data)
+    size = None
+
+    if fmt == 'JPEG':
+        size = _jpeg_size(data)
+    elif fmt == 'PNG' and len(data) >= 24 and data[12:16] == b'IHDR':
+        size = struct.unpack('>II', data[16:24])
+    elif fmt == 'GIF' and len(data) >= 10:
+        size = struct.unpack('<HH', data[6:10])
+    elif fmt == 'BMP' and len(data) >= 26:
+        width, height = struct.unpack('<ii', data[18:26])
+        size = (abs(width), abs(height))
+    elif fmt == 'WEBP':
+        size = _webp_size(data)
+
+    if not fmt:
+        raise UploadRejected(400, _UNSUPPORTED_FORMAT)
+    if size is None or size[0] <= 0 or size[1] <= 0:
+        raise UploadRejected(400, f"Corrupt or truncated {fmt} image header.")
+
+    width, height = size
+    if width * height > max_pixels:
+        raise UploadRejected(
+            413,
+            f"Image dimensions too large ({width}x{height}). "
+            f"Maximum is {max_pixels // 1000000} megapixels."
+        )
+
+    return ImageInfo(fmt, width, height)
+
+
+async def read_upload(
+    file: UploadFile,
+    max_bytes: int,
+    signature_check: Optional[Callable[[bytes], Any]] = None
+) -> bytes:
+    """
+    Read an upload in chunks, aborting as soon as it exceeds max_bytes.
+
+    Args:
+        file: Uploaded file
+        max_bytes: Largest upload accepted
+        signature_check: Optional callable run on the first chunk; a falsy
+                         result rejects the upload before reading further
+
+    Returns:
+        The uploaded bytes
+
+    Raises:
+        UploadRejected: If the upload is empty, too large or fails the
+                        signature check
+    """
+    too_large = UploadRejected(
+        413, f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB."
+    )
+
+    # Reject up front when the size is already known
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if not chunks and signature_check is not None and not signature_check(chunk):
+            raise UploadRejected(400, _UNSUPPORTED_FORMAT)
+        total += len(chunk)
+        if total > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+
+    if not chunks:
+        raise UploadRejected(400, "Empty upload.")
+
+    return b''.join(chunks)
+
+
+def validate_image_bytes(
+    image_bytes: bytes,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_pixels: int = MAX_IMAGE_PIXELS
+) -> ImageInfo:
+    """
+    Apply the upload size and header checks to bytes already in memory.
+
+    Used for images that did not arrive as their own upload (e.g. archive
+    members).
+    """
+    if len(image_bytes) > max_bytes:
+        raise UploadRejected(
+            413, f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB."
+        )
+    return sniff_image(image_bytes, max_pixels=max_pixels)
+
+
+async def read_image_upload(
+    file: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_pixels: int = MAX_IMAGE_PIXELS
+) -> bytes:
+    """
+    Read an uploaded image in chunks and validate it.
+
+    The upload is aborted as soon as it exceeds max_bytes. The first chunk
+    is checked for a supported image signature before reading further.
+
+    Args:
+        file: Uploaded file
+        max_bytes: Largest upload accepted
+        max_pixels: Largest width * height accepted
+
+    Returns:
+        The image bytes
+
+    Raises:
+        UploadRejected: On oversized, unsupported or oversized-bitmap uploads
+    """
+    image_bytes = await read_upload(file, max_bytes, signature_check=detect_format)
+    sniff_image(image_bytes, max_pixels=max_pixels)
+    return image_bytes
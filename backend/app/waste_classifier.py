@@ -5,26 +5,41 @@ Uses MobileNetV2 as base with custom classification head.
 
 import os
 import numpy as np
-from PIL import Image
-import io
-from typing import Dict, Tuple, List
+import hashlib
+import threading
+import time
+from typing import Dict, Tuple, List, Optional
 import logging
 
+from .prediction import summarize, with_suggestions, top_k_with_suggestions
+from .batching import MicroBatcher
+from .image_io import decode_image
+from .preprocessing import preprocess_input
+from .metrics import stage
+from .result_cache import ResultCache, get_result_cache
+from .backends import KerasBackend, TFLiteBackend, OnnxBackend
+from .embeddings import EmbeddingCache, backbone_fingerprint, split_keras_model
+
 # Set TensorFlow to use only CPU and reduce logging
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
-try:
-    import tensorflow as tf
-    from tensorflow import keras
-    from tensorflow.keras.applications import MobileNetV2
-    from tensorflow.keras.preprocessing import image
-    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-except ImportError:
-    raise ImportError(
-        "TensorFlow is required. Install with: pip install tensorflow"
-    )
 
-from .reuse_suggestions import ReuseSuggestions
+def _import_keras():
+    """
+    Import Keras on first use.
+    
+    TensorFlow takes seconds to import, so it is only loaded when a Keras
+    model is actually built or loaded (not for the tflite/onnx backends,
+    and not when this module is imported).
+    """
+    try:
+        from tensorflow import keras
+    except ImportError:
+        raise ImportError(
+            "TensorFlow is required. Install with: pip install tensorflow"
+        )
+    return keras
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -44,23 +59,109 @@ class WasteClassifier:
     
     IMG_SIZE = (224, 224)  # MobileNetV2 input size
     
-    def __init__(self, model_path: str = None):
+    BACKENDS = ("keras", "tflite", "onnx")
+    
+    def __init__(
+        self,
+        model_path: str = None,
+        backend: str = "keras",
+        num_threads: int = None,
+        max_batch_size: int = 1,
+        max_batch_wait_ms: float = 5.0,
+        result_cache: Optional[ResultCache] = None,
+        embedding_cache_dir: Optional[str] = None
+    ):
         """
         Initialize the waste classifier.
         
         Args:
             model_path: Path to saved model weights. If None, uses pre-trained 
                        MobileNetV2 with random classification head (demo mode).
+            backend: Inference backend: "keras" (.h5 model), "tflite"
+                    (.tflite model exported by train_model.py) or "onnx"
+                    (.onnx model from convert_onnx.py)
+            num_threads: CPU (intra-op) threads for the tflite/onnx backends
+            max_batch_size: Maximum number of concurrent requests merged into
+                           one forward pass. 1 disables micro-batching.
+            max_batch_wait_ms: Maximum time a request waits for others to
+                              join its batch
+            result_cache: Optional cache of class probabilities keyed by
+                         upload content and model version
+            embedding_cache_dir: Optional directory for the persistent
+                                backbone embedding cache (keras backend)
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"Unknown backend '{backend}'. Choose one of: {', '.join(self.BACKENDS)}"
+            )
+        
         self.model_path = model_path
+        self.backend_name = backend
+        self.num_threads = num_threads
         self.model = None
+        self.backend = None
+        self.backbone = None
+        self.head = None
+        self.embedding_cache = None
+        load_start = time.perf_counter()
         self._load_model()
+        self.load_seconds = time.perf_counter() - load_start
+        self.model_version = self._compute_model_version()
+        self.result_cache = result_cache
+        if embedding_cache_dir:
+            self._open_embedding_cache(embedding_cache_dir)
+        
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self._batcher = None
+        self._start_batcher()
+    
+    def _start_batcher(self):
+        """Start the micro-batching worker thread if batching is enabled."""
+        self._batcher = None
+        if self.max_batch_size > 1:
+            # With a split model the batcher runs the backbone only, so each
+            # request gets its embedding back for the embedding cache
+            batch_fn = self._embed_batch if self.backbone is not None else self._predict_batch
+            self._batcher = MicroBatcher(
+                batch_fn,
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_batch_wait_ms,
+                name="waste-classifier-batcher"
+            )
+    
+    @property
+    def fork_safe(self) -> bool:
+        """Whether this classifier can be loaded before fork() and used after."""
+        return self.backend.fork_safe
+    
+    def after_fork(self):
+        """
+        Restore per-process state in a forked worker.
+        
+        Threads do not survive fork(), so the micro-batcher worker is
+        restarted and the backend rebuilds its thread pool. Model weights
+        stay shared copy-on-write with the parent.
+        """
+        self.backend.after_fork()
+        self._start_batcher()
     
     def _load_model(self):
         """Load or create the classification model."""
+        if self.backend_name in ("tflite", "onnx"):
+            if not (self.model_path and os.path.exists(self.model_path)):
+                raise FileNotFoundError(
+                    f"The {self.backend_name} backend needs an exported model file, "
+                    f"got: {self.model_path}"
+                )
+            backend_cls = TFLiteBackend if self.backend_name == "tflite" else OnnxBackend
+            self.backend = backend_cls(self.model_path, num_threads=self.num_threads)
+            return
+        
         if self.model_path and os.path.exists(self.model_path):
             # Load trained model
             logger.info(f"Loading trained model from {self.model_path}")
+            keras = _import_keras()
             self.model = keras.models.load_model(self.model_path)
         else:
             # Create demo model with pre-trained MobileNetV2 base
@@ -68,15 +169,49 @@ class WasteClassifier:
                 "No trained model found. Using demo mode with pre-trained base."
             )
             self.model = self._create_demo_model()
+        
+        self.backend = KerasBackend(self.model)
+        try:
+            self.backbone, self.head = split_keras_model(self.model)
+        except ValueError as e:
+            logger.warning(f"Serving the full model, embeddings unavailable: {str(e)}")
     
-    def _create_demo_model(self) -> keras.Model:
+    def _open_embedding_cache(self, cache_dir: str):
+        """Open the embedding store for this model's backbone."""
+        if self.backbone is None:
+            logger.warning(
+                f"The embedding cache needs the keras backend, ignoring it for {self.backend_name}"
+            )
+            return
+        store_dir = os.path.join(cache_dir, backbone_fingerprint(self.backbone))
+        self.embedding_cache = EmbeddingCache(
+            store_dir,
+            dim=self.backbone.output_shape[-1],
+            max_entries=int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', '1000000'))
+        )
+        logger.info(f"Embedding cache at {store_dir} ({len(self.embedding_cache)} entries)")
+    
+    def _compute_model_version(self) -> str:
+        """Fingerprint the loaded weights so cached results never go stale."""
+        if self.model_path and os.path.exists(self.model_path):
+            digest = hashlib.sha256()
+            with open(self.model_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()[:16]
+        # Demo model has a random head, so results are only valid per process
+        return f"demo-{id(self.backend):x}"
+    
+    def _create_demo_model(self) -> "keras.Model":
         """
         Create a demo model using pre-trained MobileNetV2.
         Note: This is for demonstration only. Predictions will be based on 
         image features but not specifically trained on agricultural waste.
         """
+        keras = _import_keras()
+        
         # Load pre-trained MobileNetV2 (ImageNet weights)
-        base_model = MobileNetV2(
+        base_model = keras.applications.MobileNetV2(
             input_shape=(224, 224, 3),
             include_top=False,
             weights='imagenet'
@@ -108,70 +243,219 @@ class WasteClassifier:
         Returns:
             Preprocessed image array ready for model
         """
-        # Load image from bytes
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to RGB if necessary
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize to model input size
-        img = img.resize(self.IMG_SIZE)
+        # Decode (at reduced JPEG scale), orient, convert to RGB and resize
+        img = decode_image(image_bytes, self.IMG_SIZE)
         
         # Convert to array and preprocess for MobileNetV2
-        img_array = image.img_to_array(img)
+        img_array = np.asarray(img, dtype=np.float32)
         img_array = np.expand_dims(img_array, axis=0)
         img_array = preprocess_input(img_array)
         
         return img_array
     
-    def predict(self, image_bytes: bytes) -> Dict:
+    def _forward(self, batch: np.ndarray) -> np.ndarray:
+        """Class probabilities for a preprocessed batch."""
+        if self.backbone is not None:
+            return self.head(np.asarray(self.backbone.predict_on_batch(batch)))
+        return self.backend.predict(batch)
+    
+    def _predict_batch(self, img_arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """Run one forward pass over a list of preprocessed images."""
+        return list(self._forward(np.stack(img_arrays)))
+    
+    def _embed_batch(self, img_arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """Run the backbone over a list of preprocessed images."""
+        return list(np.asarray(self.backbone.predict_on_batch(np.stack(img_arrays))))
+    
+    def _require_split(self):
+        if self.backbone is None:
+            raise ValueError(f"Embeddings are not available with the {self.backend_name} backend")
+    
+    def embed_preprocessed(self, processed_imgs: List[np.ndarray]) -> np.ndarray:
         """
-        Classify agricultural waste from image.
+        Backbone embeddings for already-preprocessed images.
         
         Args:
-            image_bytes: Raw image bytes
+            processed_imgs: Images as returned by preprocess_image
         
         Returns:
-            Dictionary containing:
-                - predicted_class: Waste type name
-                - confidence: Confidence score (0-1)
-                - all_predictions: All class probabilities
-                - reuse_suggestions: Industrial reuse recommendations
+            Array of shape (len(processed_imgs), embedding_dim)
         """
-        # Preprocess image
+        self._require_split()
+        return np.stack(self._embed_batch([img[0] for img in processed_imgs]))
+    
+    def predict_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Run only the classification head.
+        
+        Args:
+            embeddings: Array of shape (N, embedding_dim)
+        
+        Returns:
+            Array of shape (N, num_classes)
+        """
+        self._require_split()
+        return self.head(embeddings)
+    
+    def embed(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Backbone embedding of raw image bytes, served from the embedding
+        cache when this upload has been seen before.
+        """
+        self._require_split()
+        key = None
+        if self.embedding_cache is not None:
+            key = EmbeddingCache.make_key(image_bytes)
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                return cached
+        
         processed_img = self.preprocess_image(image_bytes)
+        with stage("inference"):
+            if self._batcher is not None:
+                embedding = self._batcher(processed_img[0])
+            else:
+                embedding = self._embed_batch([processed_img[0]])[0]
+        
+        if key is not None:
+            self.embedding_cache.put(key, embedding)
+        return embedding
+    
+    def predict_preprocessed(
+        self,
+        processed_imgs: List[np.ndarray],
+        image_bytes: Optional[List[bytes]] = None
+    ) -> np.ndarray:
+        """
+        Run one forward pass over already-preprocessed images.
+        
+        Bypasses the micro-batcher, since callers pass a full batch.
+        
+        Args:
+            processed_imgs: Images as returned by preprocess_image
+            image_bytes: Optional raw uploads, in the same order, used to
+                        store the embeddings in the embedding cache
+        
+        Returns:
+            Array of shape (len(processed_imgs), num_classes)
+        """
+        if self.backbone is None:
+            return np.stack(self._predict_batch([img[0] for img in processed_imgs]))
+        
+        embeddings = self.embed_preprocessed(processed_imgs)
+        if self.embedding_cache is not None and image_bytes is not None:
+            for data, embedding in zip(image_bytes, embeddings):
+                self.embedding_cache.put(EmbeddingCache.make_key(data), embedding)
+        return self.head(embeddings)
+    
+    def _get_predictions(self, processed_img: np.ndarray) -> np.ndarray:
+        """
+        Get class probabilities for a single preprocessed image.
+        
+        Goes through the micro-batcher when enabled, so concurrent requests
+        share one forward pass.
+        """
+        if self._batcher is not None:
+            return self._batcher(processed_img[0])
+        return self._predict_batch([processed_img[0]])[0]
+    
+    def _get_probabilities(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Get class probabilities for raw image bytes.
         
-        # Get predictions
-        predictions = self.model.predict(processed_img, verbose=0)[0]
+        Repeat uploads are served from the result cache without decoding.
+        """
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = ResultCache.make_key(image_bytes, self.model_version)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        # Get top prediction
-        top_idx = np.argmax(predictions)
-        predicted_class = self.CLASS_LABELS[top_idx]
-        confidence = float(predictions[top_idx])
+        if self.backbone is not None:
+            embedding = self.embed(image_bytes)
+            with stage("inference"):
+                predictions = self.head(embedding[np.newaxis])[0]
+        else:
+            processed_img = self.preprocess_image(image_bytes)
+            with stage("inference"):
+                predictions = self._get_predictions(processed_img)
         
-        # Get all predictions with labels
-        all_predictions = {
-            label: float(score) 
-            for label, score in zip(self.CLASS_LABELS, predictions)
-        }
+        if cache_key is not None:
+            self.result_cache.put(cache_key, predictions)
+        return predictions
+    
+    def warmup(self, batch_sizes: Tuple[int, ...] = (1, 4, 8)) -> Dict[int, float]:
+        """
+        Run dummy forward passes so the first real request is not cold.
         
-        # Get reuse suggestions for predicted class
-        reuse_data = ReuseSuggestions.get_suggestions(predicted_class)
+        Each batch size is run twice: the first call pays for graph tracing
+        and buffer allocation, the second is timed.
+        
+        Args:
+            batch_sizes: Batch sizes to warm up
+        
+        Returns:
+            Warm latency in milliseconds per batch size
+        """
+        latencies = {}
+        for batch_size in batch_sizes:
+            batch = np.zeros((batch_size,) + self.IMG_SIZE + (3,), dtype=np.float32)
+            self._forward(batch)
+            start = time.perf_counter()
+            self._forward(batch)
+            latencies[batch_size] = (time.perf_counter() - start) * 1000
         
         logger.info(
-            f"Prediction: {predicted_class} (confidence: {confidence:.2%})"
+            "Warmup latency: " +
+            ", ".join(f"batch {bs}: {ms:.1f}ms" for bs, ms in latencies.items())
         )
+        return latencies
+    
+    def batching_stats(self) -> Dict:
+        """Get micro-batching metrics (batch sizes and queue wait)."""
+        if self._batcher is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._batcher.stats()}
+    
+    def classify(self, image_bytes: bytes, k: int = 3) -> Dict:
+        """
+        Run one forward pass and derive every output from it.
+        
+        Args:
+            image_bytes: Raw image bytes
+            k: Number of top predictions to keep
+        
+        Returns:
+            Summary with predicted_class, confidence, all_predictions and
+            top_k (see prediction.summarize)
+        """
+        predictions = self._get_probabilities(image_bytes)
+        summary = summarize(self.CLASS_LABELS, predictions, k)
         
-        return {
-            "predicted_class": predicted_class,
-            "display_name": reuse_data["display_name"],
-            "confidence": confidence,
-            "all_predictions": all_predictions,
-            "industrial_uses": reuse_data["industrial_uses"],
-            "environmental_benefits": reuse_data["environmental_benefits"],
-            "price_range": reuse_data["price_range"]
-        }
+        logger.info(
+            f"Prediction: {summary['predicted_class']} "
+            f"(confidence: {summary['confidence']:.2%})"
+        )
+        return summary
+    
+    def predict(self, image_bytes: bytes, k: int = 3) -> Dict:
+        """
+        Classify agricultural waste from image.
+        
+        Args:
+            image_bytes: Raw image bytes
+            k: Number of alternatives to include in top_predictions
+        
+        Returns:
+            Dictionary containing:
+                - predicted_class: Waste type name
+                - confidence: Confidence score (0-1)
+                - all_predictions: All class probabilities
+                - top_predictions: Top-k alternatives with price ranges
+                - reuse_suggestions: Industrial reuse recommendations
+        """
+        return with_suggestions(self.classify(image_bytes, k=k))
     
     def predict_top_k(self, image_bytes: bytes, k: int = 3) -> List[Dict]:
         """
@@ -184,40 +468,20 @@ class WasteClassifier:
         Returns:
             List of prediction dictionaries sorted by confidence
         """
-        # Preprocess image
-        processed_img = self.preprocess_image(image_bytes)
-        
-        # Get predictions
-        predictions = self.model.predict(processed_img, verbose=0)[0]
-        
-        # Get top-k indices
-        top_indices = np.argsort(predictions)[-k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            waste_type = self.CLASS_LABELS[idx]
-            confidence = float(predictions[idx])
-            reuse_data = ReuseSuggestions.get_suggestions(waste_type)
-            
-            results.append({
-                "predicted_class": waste_type,
-                "display_name": reuse_data["display_name"],
-                "confidence": confidence,
-                "price_range": reuse_data["price_range"]
-            })
-        
-        return results
+        return top_k_with_suggestions(self.classify(image_bytes, k=k))
 
 
 # Global classifier instance (singleton pattern)
 _classifier_instance = None
+_classifier_lock = threading.Lock()
 
-def get_classifier(model_path: str = None) -> WasteClassifier:
+def get_classifier(model_path: str = None, backend: str = None) -> WasteClassifier:
     """
     Get or create the global classifier instance.
     
     Args:
-        model_path: Optional path to trained model
+        model_path: Optional path to trained model (default: CLASSIFIER_MODEL_PATH)
+        backend: Inference backend (default: CLASSIFIER_BACKEND, else keras)
     
     Returns:
         WasteClassifier instance
@@ -225,6 +489,18 @@ def get_classifier(model_path: str = None) -> WasteClassifier:
     global _classifier_instance
     
     if _classifier_instance is None:
-        _classifier_instance = WasteClassifier(model_path)
+        # Requests arriving during startup wait for the one load in progress
+        with _classifier_lock:
+            if _classifier_instance is None:
+                num_threads = os.environ.get('CLASSIFIER_NUM_THREADS')
+                _classifier_instance = WasteClassifier(
+                    model_path or os.environ.get('CLASSIFIER_MODEL_PATH'),
+                    backend=backend or os.environ.get('CLASSIFIER_BACKEND', 'keras'),
+                    num_threads=int(num_threads) if num_threads else None,
+                    max_batch_size=int(os.environ.get('CLASSIFIER_MAX_BATCH_SIZE', '16')),
+                    max_batch_wait_ms=float(os.environ.get('CLASSIFIER_MAX_BATCH_WAIT_MS', '5')),
+                    result_cache=get_result_cache(),
+                    embedding_cache_dir=os.environ.get('EMBEDDING_CACHE_DIR')
+                )
     
     return _classifier_instance
@@ -0,0 +1,84 @@
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+from app import batch_classify
+from app.batch_classify import TooManyImages, extract_archive_images, is_zip_upload
+from app.upload import UploadRejected
+
+
+def _png(size=(20, 20)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (90, 140, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _archive(members, compression=zipfile.ZIP_STORED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as archive:
+        for name, data in members:
+            if data is None:
+                archive.writestr(zipfile.ZipInfo(name), b"")  # directory entry
+            else:
+                archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_extracts_images_and_skips_directories_and_hidden_files():
+    archive = _archive([
+        ("photos/", None),
+        ("photos/a.png", _png()),
+        ("photos/.DS_Store", b"junk"),
+        ("__MACOSX/photos/._a.png", b"junk"),
+        ("photos/b.png", _png()),
+    ])
+    items = extract_archive_images(archive, max_items=10)
+    assert [item.filename for item in items] == ["photos/a.png", "photos/b.png"]
+    assert all(item.error is None and item.image_bytes for item in items)
+
+
+def test_too_many_members_is_checked_before_extraction():
+    archive = _archive([(f"{i}.png", _png()) for i in range(4)])
+    assert len(extract_archive_images(archive, max_items=4)) == 4
+    with pytest.raises(TooManyImages):
+        extract_archive_images(archive, max_items=3)
+
+
+def test_high_compression_ratio_is_rejected_per_member():
+    bomb = b"\x00" * (1024 * 1024)
+    archive = _archive([("bomb.png", bomb), ("ok.png", _png())], compression=zipfile.ZIP_DEFLATED)
+    items = {item.filename: item for item in extract_archive_images(archive, max_items=10)}
+    assert items["bomb.png"].error == "Suspicious compression ratio."
+    assert items["bomb.png"].image_bytes is None
+    assert items["ok.png"].error is None
+
+
+def test_oversized_member_is_rejected_without_reading(monkeypatch):
+    monkeypatch.setattr(batch_classify, "MAX_UPLOAD_BYTES", 100)
+    items = extract_archive_images(_archive([("big.png", _png(size=(64, 64)))]), max_items=10)
+    assert items[0].error == "File too large."
+
+
+def test_member_that_is_not_an_image_gets_an_error():
+    items = extract_archive_images(_archive([("notes.txt", b"hello world")]), max_items=10)
+    assert items[0].image_bytes is None
+    assert "Unsupported image format" in items[0].error
+
+
+def test_unreadable_archive_is_rejected_with_400():
+    with pytest.raises(UploadRejected) as excinfo:
+        extract_archive_images(b"PK\x03\x04 not really a zip", max_items=10)
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.parametrize("filename, content_type, expected", [
+    ("photos.zip", None, True),
+    ("PHOTOS.ZIP", "application/octet-stream", True),
+    (None, "application/zip", True),
+    ("photo.jpg", "image/jpeg", False),
+    (None, None, False),
+])
+def test_is_zip_upload(filename, content_type, expected):
+    assert is_zip_upload(filename, content_type) is expected
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+pytest.importorskip("onnxruntime")
+
+from tensorflow import keras
+
+from app.backends import OnnxBackend
+from app.convert_onnx import INPUT_SHAPE, convert_to_onnx, verify_parity
+
+NUM_CLASSES = 5
+
+
+@pytest.fixture(scope="module")
+def converted(tmp_path_factory):
+    """A tiny classifier with the serving input shape, saved and exported to ONNX."""
+    tmp = tmp_path_factory.mktemp("onnx")
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([
+        keras.Input(shape=INPUT_SHAPE),
+        keras.layers.Conv2D(4, 3, strides=4, activation="relu"),
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(NUM_CLASSES, activation="softmax"),
+    ])
+    model_path = str(tmp / "tiny.keras")
+    model.save(model_path)
+    onnx_path = convert_to_onnx(model_path, str(tmp / "tiny.onnx"))
+    return model, model_path, onnx_path
+
+
+def _inputs(n, seed=0):
+    # Same range as preprocess_input output
+    return np.random.default_rng(seed).uniform(-1.0, 1.0, (n,) + INPUT_SHAPE).astype(np.float32)
+
+
+def test_onnx_backend_matches_keras(converted):
+    model, _, onnx_path = converted
+    batch = _inputs(8)
+    expected = np.asarray(model.predict_on_batch(batch))
+    actual = OnnxBackend(onnx_path).predict(batch)
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_onnx_backend_output_shape(converted, batch_size):
+    _, _, onnx_path = converted
+    probabilities = OnnxBackend(onnx_path).predict(_inputs(batch_size))
+    assert probabilities.shape == (batch_size, NUM_CLASSES)
+    np.testing.assert_allclose(probabilities.sum(axis=1), 1.0, atol=1e-5)
+
+
+def test_onnx_backend_accepts_float64(converted):
+    _, _, onnx_path = converted
+    batch = _inputs(2)
+    backend = OnnxBackend(onnx_path)
+    np.testing.assert_array_equal(backend.predict(batch.astype(np.float64)), backend.predict(batch))
+
+
+def test_onnx_backend_predicts_after_fork(converted):
+    _, _, onnx_path = converted
+    backend = OnnxBackend(onnx_path)
+    batch = _inputs(2)
+    before = backend.predict(batch)
+    backend.after_fork()
+    assert OnnxBackend.fork_safe
+    np.testing.assert_array_equal(backend.predict(batch), before)
+
+
+def test_verify_parity_passes_for_the_export(converted):
+    _, model_path, onnx_path = converted
+    report = verify_parity(model_path, onnx_path, num_samples=4)
+    assert report["argmax_agreement"] == 1.0
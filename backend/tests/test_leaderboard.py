@@ -0,0 +1,120 @@
+import json
+import random
+
+import pytest
+
+from app.leaderboard import Farmer, Leaderboard, ScoreRanking
+
+
+def _farmer(farmer_id, score, state="PB", **fields):
+    return Farmer(
+        id=farmer_id,
+        name=fields.get("name", farmer_id),
+        state=state,
+        green_score=score,
+        co2_saved_kg=fields.get("co2_saved_kg", 1000.0),
+        waste_recycled_tons=fields.get("waste_recycled_tons", 5.0)
+    )
+
+
+def _reference_page(scores, offset, limit):
+    """(rank, id) by sorting: highest first, ties in insertion order."""
+    ordered = sorted(scores.items(), key=lambda item: -item[1])
+    return [
+        (1 + sum(other > score for other in scores.values()), farmer_id)
+        for farmer_id, score in ordered[offset:offset + limit]
+    ]
+
+
+def test_ranking_matches_sorting_under_random_updates():
+    rng = random.Random(0)
+    ranking = ScoreRanking(max_score=50)
+    scores = {}
+    for step in range(500):
+        farmer_id = f"f{rng.randrange(40)}"
+        if farmer_id in scores:
+            ranking.remove(farmer_id, scores.pop(farmer_id))
+        if rng.random() < 0.8:
+            scores[farmer_id] = rng.randrange(51)
+            ranking.add(farmer_id, scores[farmer_id])
+
+        assert ranking.size == len(scores)
+        if step % 25 == 0:
+            offset, limit = rng.randrange(len(scores) + 2), rng.randrange(1, 15)
+            assert ranking.page(offset, limit) == _reference_page(scores, offset, limit)
+            for farmer_id, score in scores.items():
+                assert ranking.rank(score) == 1 + sum(other > score for other in scores.values())
+
+
+def test_ranking_extreme_scores():
+    ranking = ScoreRanking(max_score=10)
+    ranking.add("top", 10)
+    ranking.add("bottom", 0)
+    assert ranking.page(0, 5) == [(1, "top"), (2, "bottom")]
+    assert ranking.rank(0) == 2
+    assert ranking.page(2, 5) == []
+
+
+def test_tied_farmers_share_a_rank():
+    board = Leaderboard(max_score=1000)
+    for farmer in (_farmer("a", 900), _farmer("b", 800), _farmer("c", 800), _farmer("d", 700)):
+        board.update(farmer)
+    rows = json.loads(board.page_json(0, 10))
+    assert [(row["id"], row["rank"]) for row in rows] == [("a", 1), ("b", 2), ("c", 2), ("d", 4)]
+
+
+def test_state_rankings_and_moves_between_states():
+    board = Leaderboard(max_score=1000)
+    board.update(_farmer("a", 900, state="PB"))
+    board.update(_farmer("b", 800, state="HR"))
+    board.update(_farmer("c", 700, state="hr"))
+    assert board.user_rank("c", state="HR")["rank"] == 2
+    assert board.user_rank("c", state="PB") is None
+
+    board.update(_farmer("c", 700, state="PB"))
+    assert board.total("HR") == 1
+    assert board.user_rank("c", state="PB")["rank"] == 2
+    assert [row["id"] for row in json.loads(board.page_json(0, 10, state="pb"))] == ["a", "c"]
+
+
+def test_cached_pages_follow_score_changes():
+    board = Leaderboard(max_score=1000)
+    for i, score in enumerate((900, 800, 700, 600)):
+        board.update(_farmer(f"f{i}", score))
+    assert [row["id"] for row in json.loads(board.page_json(0, 2))] == ["f0", "f1"]
+    assert [row["id"] for row in json.loads(board.page_json(2, 2))] == ["f2", "f3"]
+
+    board.update(_farmer("f3", 950))
+    assert [row["id"] for row in json.loads(board.page_json(0, 2))] == ["f3", "f0"]
+    assert [row["id"] for row in json.loads(board.page_json(2, 2))] == ["f1", "f2"]
+
+    board.update(_farmer("f1", 800, name="Renamed"))
+    assert json.loads(board.page_json(2, 2))[0]["name"] == "Renamed"
+
+
+def test_merge_keeps_fields_left_out():
+    board = Leaderboard(max_score=1000)
+    board.update(_farmer("a", 500, co2_saved_kg=9100.0, waste_recycled_tons=32.0))
+    merged = board.merge("a", {"green_score": 650})
+    assert merged.green_score == 650
+    assert (merged.co2_saved_kg, merged.waste_recycled_tons) == (9100.0, 32.0)
+    assert board.user_rank("a")["co2_saved"] == "9.1 Tons"
+
+
+def test_merge_new_farmer_needs_name_state_and_score():
+    board = Leaderboard(max_score=1000)
+    with pytest.raises(ValueError, match="name, state"):
+        board.merge("new", {"green_score": 10})
+    farmer = board.merge("new", {"name": "New", "state": "UP", "green_score": 10})
+    assert (farmer.co2_saved_kg, farmer.waste_recycled_tons) == (0.0, 0.0)
+    assert len(board) == 1
+
+
+@pytest.mark.parametrize("score", [-1, 1001])
+def test_rejects_scores_out_of_range(score):
+    board = Leaderboard(max_score=1000)
+    with pytest.raises(ValueError):
+        board.update(_farmer("a", score))
+    with pytest.raises(ValueError):
+        board.merge("a", {"name": "A", "state": "PB", "green_score": score})
+    assert len(board) == 0
@@ -0,0 +1,51 @@
+import threading
+
+from app.lifecycle import ModelState, load_and_warm, start_background_load
+
+
+class FakeClassifier:
+    model_version = "test-1"
+    backend_name = "fake"
+    load_seconds = 1.25
+
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+
+    def warmup(self, batch_sizes):
+        if self.release is not None:
+            self.release.wait(5)
+        return {size: 1.0 for size in batch_sizes}
+
+
+def test_background_load_is_loading_before_thread_runs():
+    release = threading.Event()
+    classifier = FakeClassifier(release)
+    state = ModelState()
+
+    thread = start_background_load(lambda: classifier, state, (1,))
+    assert state.status == ModelState.LOADING
+    # A request loading the classifier meanwhile must not flip readiness
+    state.mark_loaded(classifier)
+    assert not state.ready
+
+    release.set()
+    thread.join(5)
+    assert state.ready
+    assert state.warmup_ms == {1: 1.0}
+
+
+def test_load_and_warm_reports_the_classifier_load_time():
+    state = ModelState()
+    load_and_warm(FakeClassifier, state, (1, 4))
+    assert state.to_dict()["load_seconds"] == 1.25
+    assert state.backend == "fake"
+
+
+def test_failed_load_is_recorded():
+    def broken():
+        raise RuntimeError("no model")
+
+    state = ModelState()
+    load_and_warm(broken, state)
+    assert state.status == ModelState.FAILED
+    assert state.error == "no model"
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from app import matching
+from app.geo import Industry, IndustryIndex, PincodeDirectory
+from app.matching import AUCTION_EPSILON, _auction, _solve_transportation, match_listings
+from app.pricing import transport_penalty
+
+DIRECTORY = PincodeDirectory({
+    "141001": (30.90, 75.85),  # Ludhiana
+    "141002": (30.91, 75.86),
+    "147001": (30.34, 76.39),  # Patiala
+    "160017": (30.73, 76.78),  # Chandigarh
+})
+
+
+def _buyer(buyer_id, pincode, capacity, accepts=("rice_straw",)):
+    latitude, longitude = DIRECTORY.locate(pincode)
+    return Industry(buyer_id, buyer_id, "biomass_power", pincode, latitude, longitude, accepts, capacity)
+
+
+def _random_problem(rng, num_groups, num_buyers, num_edges):
+    pairs = {(int(g), int(b)) for g, b in zip(rng.integers(0, num_groups, num_edges), rng.integers(0, num_buyers, num_edges))}
+    edge_group, edge_buyer = (np.array(column, dtype=np.intp) for column in zip(*sorted(pairs)))
+    value = rng.uniform(100, 3000, len(edge_group)).round()
+    supply = rng.integers(1, 40, num_groups).astype(np.float64)
+    capacity = rng.integers(1, 60, num_buyers).astype(np.float64)
+    return edge_group, edge_buyer, value, supply, capacity
+
+
+def _check_feasible(flow, edge_group, edge_buyer, supply, capacity):
+    assert np.all(flow >= -1e-9)
+    assert np.all(np.bincount(edge_group, weights=flow, minlength=len(supply)) <= supply + 1e-6)
+    assert np.all(np.bincount(edge_buyer, weights=flow, minlength=len(capacity)) <= capacity + 1e-6)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_auction_is_within_epsilon_of_the_exact_solver(seed):
+    rng = np.random.default_rng(seed)
+    edge_group, edge_buyer, value, supply, capacity = _random_problem(rng, 30, 12, 150)
+
+    exact = _solve_transportation(edge_group, edge_buyer, value, supply, capacity)
+    auction = _auction(edge_group, edge_buyer, value, supply, capacity)
+    for flow in (exact, auction):
+        _check_feasible(flow, edge_group, edge_buyer, supply, capacity)
+
+    best = value @ exact
+    assert value @ auction <= best + 1e-6
+    assert value @ auction >= best - AUCTION_EPSILON * min(supply.sum(), capacity.sum())
+
+
+def test_buyers_closest_to_supply_are_filled_first():
+    index = IndustryIndex([_buyer("near", "141002", 10), _buyer("far", "160017", 100)])
+    result = match_listings(["rice_straw"], [25], ["141001"], index, DIRECTORY, buyer_prices=[2000, 2000])
+
+    assigned = dict(zip((index.industries[b].id for b in result["buyer"]), result["quantity"]))
+    assert assigned == pytest.approx({"near": 10, "far": 15})
+    assert result["matched_quantity"].tolist() == pytest.approx([25])
+
+
+def test_transport_cost_matches_pricing():
+    index = IndustryIndex([_buyer("patiala", "147001", 50)])
+    result = match_listings(["rice_straw"], [5], ["141001"], index, DIRECTORY, buyer_prices=[1500])
+    expected = transport_penalty(result["price_per_ton"], result["distance_km"])
+    np.testing.assert_allclose(result["transport_cost_per_ton"], expected)
+    assert result["distance_km"][0] > 25
+
+
+def test_pooled_listings_are_split_back():
+    index = IndustryIndex([_buyer("near", "141002", 12)])
+    result = match_listings(
+        ["rice_straw"] * 3, [5, 4, 6], ["141001"] * 3, index, DIRECTORY, buyer_prices=[2000]
+    )
+    matched = result["matched_quantity"]
+    assert matched.sum() == pytest.approx(12)
+    assert np.all(matched <= [5, 4, 6])
+    assert result["buyer_assigned"].tolist() == pytest.approx([12])
+
+
+def test_waste_type_nobody_buys_stays_unmatched():
+    index = IndustryIndex([_buyer("near", "141002", 50)])
+    result = match_listings(["corn_husk"], [5], ["141001"], index, DIRECTORY)
+    assert result["matched_quantity"].tolist() == [0]
+    assert len(result["listing"]) == 0
+
+
+def test_auction_path_matches_the_exact_path(monkeypatch):
+    index = IndustryIndex([
+        _buyer("a", "141002", 20), _buyer("b", "147001", 15), _buyer("c", "160017", 30)
+    ])
+    args = (["rice_straw"] * 4, [10, 8, 12, 9], ["141001", "147001", "160017", "141002"], index, DIRECTORY)
+    exact = match_listings(*args)
+    monkeypatch.setattr(matching, "EXACT_SOLVER_MAX_EDGES", 0)
+    auction = match_listings(*args)
+
+    def total_value(result):
+        return float(result["quantity"] @ (result["price_per_ton"] - result["transport_cost_per_ton"]))
+
+    assert total_value(auction) == pytest.approx(total_value(exact), abs=AUCTION_EPSILON * 39)
+
+
+@pytest.mark.parametrize("quantity", [-1.0, float("nan"), float("inf")])
+def test_rejects_bad_quantities(quantity):
+    index = IndustryIndex([_buyer("near", "141002", 10)])
+    with pytest.raises(ValueError):
+        match_listings(["rice_straw"], [quantity], ["141001"], index, DIRECTORY)
+
+
+def test_rejects_infinite_offers():
+    index = IndustryIndex([_buyer("near", "141002", 10)])
+    with pytest.raises(ValueError):
+        match_listings(["rice_straw"], [5], ["141001"], index, DIRECTORY, buyer_prices=[float("inf")])
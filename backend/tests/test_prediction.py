@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.prediction import top_k_indices
+
+
+def test_returns_highest_first():
+    probabilities = np.array([0.1, 0.4, 0.05, 0.3, 0.15])
+    assert top_k_indices(probabilities, 3).tolist() == [1, 3, 4]
+
+
+def test_matches_full_sort_on_random_vectors():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        probabilities = rng.random(rng.integers(1, 20))
+        k = int(rng.integers(1, 25))
+        expected = np.argsort(-probabilities, kind='stable')[:k]
+        assert top_k_indices(probabilities, k).tolist() == expected.tolist()
+
+
+def test_ties_resolve_to_lower_index():
+    probabilities = np.array([0.2, 0.3, 0.2, 0.3, 0.0])
+    assert top_k_indices(probabilities, 3).tolist() == [1, 3, 0]
+    assert top_k_indices(probabilities, 1)[0] == np.argmax(probabilities)
+
+
+def test_k_above_class_count_returns_all():
+    probabilities = np.array([0.5, 0.2, 0.3])
+    assert top_k_indices(probabilities, 10).tolist() == [0, 2, 1]
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_rejects_k_below_one(k):
+    with pytest.raises(ValueError):
+        top_k_indices(np.array([0.5, 0.5]), k)
@@ -0,0 +1,52 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from app.price_model import UNSEEN_CATEGORY_CONFIDENCE, PriceModel
+from app.train_price_model import SCORE_BUDGET_MS, synthetic_sales, time_batch_ms, train_price_model
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    sales = synthetic_sales(20000)
+    path = str(tmp_path_factory.mktemp("price_model") / "price_model.npz")
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = train_price_model(sales, output_path=path)
+    return model, sales, path
+
+
+def test_scores_100_lots_within_budget(trained):
+    model, sales, _ = trained
+    batch = sales.iloc[:100]
+    batch_ms = time_batch_ms(
+        model,
+        batch["waste_type"].tolist(),
+        batch["quantity"].tolist(),
+        batch["location_pincode"].tolist()
+    )
+    assert batch_ms < SCORE_BUDGET_MS, f"{batch_ms:.3f}ms for 100 lots ({model.forest.num_trees} trees)"
+
+
+def test_default_ensemble_stays_accurate(trained):
+    model, _, _ = trained
+    assert model.metadata["validation"]["mape"] < 0.07
+    assert 0.7 < model.metadata["validation"]["interval_coverage"] < 0.9
+
+
+def test_saved_model_predicts_the_same(trained):
+    model, sales, path = trained
+    batch = sales.iloc[:50]
+    args = (batch["waste_type"].tolist(), batch["quantity"].tolist(), batch["location_pincode"].tolist())
+    loaded = PriceModel.load(path)
+    np.testing.assert_array_equal(loaded.predict(*args)["price_per_ton"], model.predict(*args)["price_per_ton"])
+
+
+def test_unseen_categories_are_missing_not_errors(trained):
+    model, _, _ = trained
+    result = model.predict(["rice_straw", "mystery_crop"], [10.0, 10.0], ["141001", "99x"])
+    assert np.all(np.isfinite(result["price_per_ton"]))
+    assert result["confidence_score"][1] <= UNSEEN_CATEGORY_CONFIDENCE
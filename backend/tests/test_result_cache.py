@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from app import result_cache
+from app.result_cache import ResultCache
+
+
+def _vector(value=0.5, size=6):
+    return np.full(size, value, dtype=np.float32)
+
+
+def test_put_then_get_returns_a_read_only_copy():
+    cache = ResultCache()
+    original = _vector()
+    cache.put("k", original)
+    original[0] = 9.0
+
+    cached = cache.get("k")
+    assert cached[0] == 0.5
+    with pytest.raises(ValueError):
+        cached[0] = 1.0
+    assert cache.stats()["hits"] == 1
+
+
+def test_miss_is_counted():
+    cache = ResultCache()
+    assert cache.get("absent") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_keys_depend_on_content_and_model_version():
+    assert ResultCache.make_key(b"img", "v1") == ResultCache.make_key(b"img", "v1")
+    assert ResultCache.make_key(b"img", "v1") != ResultCache.make_key(b"img", "v2")
+    assert ResultCache.make_key(b"img", "v1") != ResultCache.make_key(b"other", "v1")
+
+
+def test_evicts_least_recently_used_within_byte_budget():
+    entry_size = ResultCache._entry_size("a", _vector())
+    cache = ResultCache(max_bytes=2 * entry_size)
+    cache.put("a", _vector())
+    cache.put("b", _vector())
+    cache.get("a")  # b is now least recently used
+    cache.put("c", _vector())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] <= stats["max_bytes"]
+
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    cache = ResultCache(max_bytes=100)
+    cache.put("big", _vector(size=1000))
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_replacing_a_key_keeps_size_accounting():
+    cache = ResultCache()
+    cache.put("k", _vector(size=4))
+    cache.put("k", _vector(size=8))
+    assert cache.stats()["size_bytes"] == ResultCache._entry_size("k", _vector(size=8))
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl_seconds=10)
+    cache.put("k", _vector())
+    now[0] += 9
+    assert cache.get("k") is not None
+    now[0] += 2
+    assert cache.get("k") is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+    assert stats["size_bytes"] == 0
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from app.simple_classifier import SimpleWasteClassifier
+
+
+def test_batch_scores_match_single_images():
+    classifier = SimpleWasteClassifier()
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 256, (4, 32, 24, 3), dtype=np.uint8)
+    scores = classifier.analyze_color_batch(batch)
+    assert scores.shape == (4, len(SimpleWasteClassifier.CLASS_LABELS))
+    for image, row in zip(batch, scores):
+        assert list(classifier.analyze_color(image).values()) == pytest.approx(row.tolist())
+
+
+def test_grayscale_image_is_expanded_to_rgb():
+    classifier = SimpleWasteClassifier()
+    gray = np.full((16, 16), 200, dtype=np.uint8)
+    assert classifier.analyze_color(gray) == classifier.analyze_color(np.stack([gray] * 3, axis=-1))
+
+
+@pytest.mark.parametrize("batch", [
+    np.zeros((2, 8, 8, 3), dtype=np.float32),
+    np.zeros((2, 8, 8, 3), dtype=np.uint16),
+    np.zeros((2, 8, 8, 4), dtype=np.uint8),
+    np.zeros((8, 8, 3), dtype=np.uint8),
+])
+def test_rejects_batches_that_are_not_uint8_rgb(batch):
+    with pytest.raises(ValueError, match="uint8"):
+        SimpleWasteClassifier().analyze_color_batch(batch)
@@ -0,0 +1,71 @@
+import io
+import struct
+
+import pytest
+
+from PIL import Image
+
+from app.upload import ImageInfo, UploadRejected, sniff_image, validate_image_bytes
+
+
+def _encode(fmt, size=(40, 30), **options):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (120, 160, 60)).save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG", "GIF", "BMP", "WEBP"])
+def test_reads_format_and_size_from_the_header(fmt):
+    assert sniff_image(_encode(fmt)) == ImageInfo(fmt, 40, 30)
+
+
+def test_progressive_jpeg_with_exif_segment():
+    data = _encode("JPEG", size=(64, 48), progressive=True, exif=b"Exif\x00\x00" + b"\x00" * 64)
+    assert sniff_image(data) == ImageInfo("JPEG", 64, 48)
+
+
+@pytest.mark.parametrize("lossless", [False, True])
+def test_webp_variants(lossless):
+    assert sniff_image(_encode("WEBP", size=(33, 17), lossless=lossless)) == ImageInfo("WEBP", 33, 17)
+
+
+def test_header_alone_is_enough():
+    data = _encode("PNG", size=(500, 400))
+    assert sniff_image(data[:64]) == ImageInfo("PNG", 500, 400)
+
+
+def test_unknown_format_is_rejected_with_400():
+    with pytest.raises(UploadRejected) as excinfo:
+        sniff_image(b"%PDF-1.7 not an image")
+    assert excinfo.value.status_code == 400
+    assert "Unsupported image format" in excinfo.value.detail
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG", "GIF"])
+def test_truncated_header_is_rejected_with_400(fmt):
+    with pytest.raises(UploadRejected) as excinfo:
+        sniff_image(_encode(fmt)[:8])
+    assert excinfo.value.status_code == 400
+
+
+def test_zero_sized_image_is_rejected():
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 0, 10)
+    with pytest.raises(UploadRejected) as excinfo:
+        sniff_image(header)
+    assert excinfo.value.status_code == 400
+
+
+def test_decompression_bomb_is_rejected_with_413():
+    # A 20000x20000 PNG header; nothing is decoded
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 20000, 20000)
+    with pytest.raises(UploadRejected) as excinfo:
+        sniff_image(header, max_pixels=50_000_000)
+    assert excinfo.value.status_code == 413
+
+
+def test_validate_image_bytes_applies_the_byte_limit():
+    data = _encode("PNG")
+    assert validate_image_bytes(data, max_bytes=len(data)).format == "PNG"
+    with pytest.raises(UploadRejected) as excinfo:
+        validate_image_bytes(data, max_bytes=len(data) - 1)
+    assert excinfo.value.status_code == 413